@@ -1,59 +1,18 @@
 
-import os, re, json, uuid, shutil, tempfile
-from datetime import datetime, timedelta, date
-from typing import Any, Dict, List, Optional, Tuple
-import requests, streamlit as st
-
-# # Optional whisper import (installed via requirements)
-try:
-    from faster_whisper import WhisperModel
-except Exception:
-    WhisperModel = None
-
-# # Ensure ffmpeg for A/V
-try:
-    import imageio_ffmpeg
-    _FFMPEG = imageio_ffmpeg.get_ffmpeg_exe()
-    os.environ["PATH"] = str(os.path.dirname(_FFMPEG)) + os.pathsep + os.environ.get("PATH", "")
-except Exception:
-    _FFMPEG = shutil.which("ffmpeg")
-
-# # Natural-language date parsing helper
-try:
-    import dateparser
-except Exception:
-    dateparser = None
-
-# # Timezone (KZ)
-try:
-    from zoneinfo import ZoneInfo
-    KZ_TZ = ZoneInfo("Asia/Almaty")
-except Exception:
-    ZoneInfo = None
-    KZ_TZ = None
+import uuid
+from datetime import datetime
+import streamlit as st
+from pipeline import (SUPPORTED, PRIORITIES, LLAMA_STREAM, whisper_available,
+                      llama_extract_blocks, normalize_tasks_after_extraction, prepare_due)
+from jira_client import JIRA_ISSUE_TYPE, jira_meta, jira_submit, project_link
+from dedup import DUP_THRESHOLD, find_duplicates
+from jobs import ACTIVE, JOBS_POLL_S, job_queue, job_state, job_result
+from store import store
+import metrics
 
 # # App config
 st.set_page_config(page_title="Whisper → LLaMA → Jira", page_icon="🌀", layout="wide")
-
-# # LLaMA endpoint defaults (override via env if нужно)
-LLAMA_BASE   = os.getenv("LLAMA_BASE", "https://vsjz8fv63q4oju-8000.proxy.runpod.net")
-LLAMA_URL    = os.getenv("LLAMA_URL", "")            # if set — используется напрямую
-LLAMA_MODEL  = os.getenv("LLAMA_MODEL", "")          # желаемая модель
-LLAMA_KEY    = os.getenv("LLAMA_API_KEY", "YOUR API KEY")
-LLAMA_AUTH_HEADER  = os.getenv("LLAMA_AUTH_HEADER", "Authorization")
-LLAMA_AUTH_SCHEME  = os.getenv("LLAMA_AUTH_SCHEME", "Bearer")
-
-# # Inference config
-DEVICE       = "cuda" if os.system("nvidia-smi >/dev/null 2>&1")==0 else "cpu"
-WHISPER_SIZE = "medium"
-COMPUTE_TYPE = "int8_float16" if DEVICE=="cuda" else "int8"
-SUPPORTED    = ["wav","mp3","m4a","ogg","flac","mp4","mov","mkv","webm"]
-PRIORITIES   = ["Highest","High","Medium","Low","Lowest"]
-MAX_SUMMARY  = 160
-
-# # kz_now: текущее время в Asia/Almaty
-def kz_now():
-    return datetime.now(KZ_TZ) if KZ_TZ else datetime.now()
+metrics.serve()   # /metrics на METRICS_PORT (если задан), один раз на процесс
 
 # # css: неоновый тёмный UI
 def css():
@@ -94,363 +53,70 @@ def css():
 # # init_state: инициализация session_state
 def init_state():
     st.session_state.setdefault("file_name","")
-    st.session_state.setdefault("file_bytes",b"")
+    st.session_state.setdefault("upload",None)
     st.session_state.setdefault("transcript","")
     st.session_state.setdefault("transcript_area","")
     st.session_state.setdefault("tasks",[])
+    st.session_state.setdefault("blocks",[])   # хэши блоков текста последнего извлечения (инкрементальное извлечение)
     st.session_state.setdefault("lang","auto")
     st.session_state.setdefault("llama_mode","")
     st.session_state.setdefault("llama_url","")
     st.session_state.setdefault("llama_model","")
-
-# # sid: короткий id
-def sid(n:int=10)->str:
-    return uuid.uuid4().hex[:n]
-
-# # to_iso: вернуть YYYY-MM-DD если валидно
-def to_iso(d:Any)->str:
-    if not d: return ""
-    if isinstance(d,date): return d.isoformat()
-    s=str(d).strip()
-    if re.match(r"^\\d{4}-\\d{2}-\\d{2}$",s): return s
-    return ""
-
-# # weekday_ru_to_idx: день недели → индекс
-def weekday_ru_to_idx(word:str)->Optional[int]:
-    w=word.lower().strip()
-    names={"понедельник":0,"вторник":1,"среда":2,"четверг":3,"пятница":4,"суббота":5,"воскресенье":6,
-           "monday":0,"tuesday":1,"wednesday":2,"thursday":3,"friday":4,"saturday":5,"sunday":6}
-    return names.get(w)
-
-# # next_weekday: следующая дата указанного дня недели
-def next_weekday(base:date, idx:int)->date:
-    delta=(idx - base.weekday()) % 7
-    delta = 7 if delta==0 else delta
-    return base + timedelta(days=delta)
-
-# # parse_due_kz: парсинг относительных сроков → ISO
-def parse_due_kz(s:str)->str:
-    s=(s or "").strip().lower()
-    if not s: return ""
-    today = (kz_now().date())
-    if s in ("сегодня","today"): return today.isoformat()
-    if s in ("завтра","tomorrow"): return (today+timedelta(days=1)).isoformat()
-    if s in ("послезавтра","day after tomorrow"): return (today+timedelta(days=2)).isoformat()
-    m=re.match(r"^через\\s+(\\d+)\\s*(дн(я|ей|ь)?|day|days)$",s)
-    if m: return (today+timedelta(days=int(m.group(1)))).isoformat()
-    m=re.match(r"^через\\s+(\\d+)\\s*(недел(ю|и|ь|и)|week|weeks)$",s)
-    if m: return (today+timedelta(days=int(m.group(1))*7)).isoformat()
-    m=re.match(r"^в\\s+([а-яa-z]+)$",s)
-    if m:
-        idx=weekday_ru_to_idx(m.group(1))
-        if idx is not None: return next_weekday(today,idx).isoformat()
-    m=re.match(r"^к\\s+([а-яa-z]+)$",s)
-    if m:
-        idx=weekday_ru_to_idx(m.group(1))
-        if idx is not None: return next_weekday(today,idx).isoformat()
-    m=re.match(r"^(\\d{2})[./-](\\d{2})[./-](\\d{4})$",s)
-    if m:
-        try: return date(int(m.group(3)),int(m.group(2)),int(m.group(1))).isoformat()
-        except Exception: pass
-    m=re.match(r"^(\\d{4})[./-](\\d{2})[./-](\\d{2})$",s)
-    if m:
-        try: return date(int(m.group(1)),int(m.group(2)),int(m.group(3))).isoformat()
-        except Exception: pass
-    if dateparser:
-        try:
-            dt=dateparser.parse(s,languages=["ru","en"],settings={"TIMEZONE":"Asia/Almaty","RETURN_AS_TIMEZONE_AWARE":True,"PREFER_DATES_FROM":"future"})
-            if dt: return dt.astimezone(KZ_TZ).date().isoformat() if KZ_TZ else dt.date().isoformat()
-        except Exception: pass
-    return ""
-
-# # infer_due_from_text: дедлайн из текстовой фразы
-def infer_due_from_text(text:str)->str:
-    s=(text or "").lower()
-    t=kz_now().date()
-    if "послезавтра" in s: return (t+timedelta(days=2)).isoformat()
-    if "завтра" in s: return (t+timedelta(days=1)).isoformat()
-    m=re.search(r"через\\s+(\\d+)\\s*дн", s)
-    if m: return (t+timedelta(days=int(m.group(1)))).isoformat()
-    m=re.search(r"через\\s+(\\d+)\\s*нед", s)
-    if m: return (t+timedelta(days=int(m.group(1))*7)).isoformat()
-    for w in ["понедельник","вторник","среду","четверг","пятницу","субботу","воскресенье","среда"]:
-        if w in s:
-            base={"понедельник":"понедельник","вторник":"вторник","среду":"среда","среда":"среда","четверг":"четверг","пятницу":"пятница","субботу":"суббота","воскресенье":"воскресенье"}[w]
-            idx=weekday_ru_to_idx(base)
-            if idx is not None: return next_weekday(t,idx).isoformat()
-    if "на этой неделе" in s or "в течение недели" in s: return (t+timedelta(days=7)).isoformat()
-    if dateparser:
-        try:
-            dt=dateparser.parse(s,languages=["ru","en"],settings={"TIMEZONE":"Asia/Almaty","RETURN_AS_TIMEZONE_AWARE":True,"PREFER_DATES_FROM":"future"})
-            if dt: return dt.astimezone(KZ_TZ).date().isoformat() if KZ_TZ else dt.date().isoformat()
-        except Exception: pass
-    return (t+timedelta(days=3)).isoformat()
-
-# # ffmpeg_extract: вытащить аудио из видео → wav 16k mono
-def ffmpeg_extract(src:str)->str:
-    out=tempfile.NamedTemporaryFile(delete=False,suffix=".wav").name
-    exe=_FFMPEG or shutil.which("ffmpeg")
-    if not exe: raise RuntimeError("ffmpeg not found")
-    cmd=f'"{exe}" -y -i "{src}" -vn -ac 1 -ar 16000 -c:a pcm_s16le "{out}"'
-    rc=os.system(cmd)
-    if rc!=0 or not os.path.exists(out): raise RuntimeError("ffmpeg failed")
-    return out
-
-# # llama_headers: заголовки с токеном
-def llama_headers()->Dict[str,str]:
-    h={"Content-Type":"application/json"}
-    if LLAMA_KEY: h[LLAMA_AUTH_HEADER]=f"{LLAMA_AUTH_SCHEME} {LLAMA_KEY}"
-    return h
-
-# # llama_models: список моделей с сервера
-def llama_models(base:str)->List[str]:
-    try:
-        r=requests.get(base.rstrip("/")+"/v1/models",headers=llama_headers(),timeout=30)
-        if not r.ok: return []
-        arr=r.json().get("data",[])
-        out=[]
-        for x in arr:
-            mid=x.get("id") if isinstance(x,dict) else None
-            if isinstance(mid,str): out.append(mid)
-        return out
-    except Exception:
-        return []
-
-# # model_pick: выбрать «лучшую» модель по названию
-def model_pick(models:List[str], prefer:str)->str:
-    if prefer and prefer in models: return prefer
-    if prefer:
-        low=prefer.lower()
-        for m in models:
-            if m.lower()==low: return m
-    ranked=[]
-    for m in models:
-        ml=m.lower();score=0
-        if "instruct" in ml or "chat" in ml: score+=3
-        if "llama" in ml: score+=2
-        if "scout" in ml: score+=1
-        if "fp8" in ml: score+=1
-        ranked.append((score,m))
-    ranked.sort(key=lambda x:(-x[0],x[1]))
-    return ranked[0][1] if ranked else ""
-
-# # try_mode: определить рабочий endpoint (chat/responses)
-def try_mode(base:str, model:str)->Tuple[str,str]:
-    urlc=base.rstrip("/")+"/v1/chat/completions"
-    urlr=base.rstrip("/")+"/v1/responses"
-    m={"model":model or "llama","temperature":0.1}
-    try:
-        rc=requests.post(urlc,headers=llama_headers(),json={**m,"messages":[{"role":"user","content":"ping"}]},timeout=25)
-        if rc.status_code==200: return "chat",urlc
-    except Exception: pass
-    try:
-        rr=requests.post(urlr,headers=llama_headers(),json={**m,"input":[{"role":"user","content":"ping"}]},timeout=25)
-        if rr.status_code==200: return "responses",urlr
-    except Exception: pass
-    return "",""
-
-# # autodiscover: автоконфиг LLaMA (base → model → mode/url)
-def autodiscover()->Tuple[str,str,str]:
-    base=LLAMA_BASE.strip().rstrip("/")
-    if LLAMA_URL.strip():
-        u=LLAMA_URL.strip()
-        mode="chat" if "/chat/completions" in u else ("responses" if "/responses" in u else "")
-        return mode,u,LLAMA_MODEL or ""
-    models=llama_models(base)
-    model=model_pick(models,LLAMA_MODEL)
-    mode,url=try_mode(base, model or (models[0] if models else "llama"))
-    return mode,url,model or (models[0] if models else "llama")
-
-# # llama_call: единая обёртка под /chat и /responses
-def llama_call(mode:str,url:str,model:str,msgs:List[Dict[str,str]])->str:
-    if mode=="chat":
-        payload={"model":model,"messages":msgs,"temperature":0.15,"max_tokens":4000}
-    else:
-        payload={"model":model,"input":msgs,"temperature":0.15,"max_tokens":4000}
-    r=requests.post(url,headers=llama_headers(),json=payload,timeout=180)
-    r.raise_for_status()
-    data=r.json()
-    if mode=="chat":
-        return data["choices"][0]["message"]["content"]
-    txt=data.get("output_text")
-    if isinstance(txt,str) and txt.strip(): return txt
-    out=data.get("output",[]) or data.get("choices",[])
-    if out and isinstance(out,list):
-        first=out[0]
-        return first.get("content") or first.get("message",{}).get("content") or ""
-    return ""
-
-# # llama_clean: лёгкая правка текста (опечатки) перед задачами
-def llama_clean(s:str)->Tuple[str,Dict[str,str]]:
-    mode,url,model=autodiscover()
-    if not mode or not url: raise RuntimeError("LLM endpoint not found")
-    sys="Ты редактор текста. Исправь опечатки, регистр и пунктуацию, не меняй смысл. Верни только исправленный текст."
-    out=llama_call(mode,url,model,[{"role":"system","content":sys},{"role":"user","content":s}]).strip()
-    return (out or s), {"mode":mode,"url":url,"model":model}
-
-# # autolabels_from_summary: авто-лейблы из заголовка
-def autolabels_from_summary(s:str)->str:
-    w=[x.lower() for x in re.findall(r"[\\w\\-А-Яа-яЁё]{3,}", s)]
-    seen=set(); out=[]
-    for x in w:
-        if x in seen: continue
-        seen.add(x); out.append(x)
-        if len(out)>=5: break
-    return ", ".join(out)
-
-# # parse_tasks_json: строгое чтение JSON списка задач из LLaMA
-def parse_tasks_json(txt:str)->List[Dict[str,Any]]:
-    m=re.search(r"\\[[\\s\\S]*\\]",txt)
-    blob=m.group(0) if m else txt
-    data=json.loads(blob)
-    if not isinstance(data,list): raise ValueError("not list")
-    out=[]
-    for it in data:
-        if not isinstance(it,dict): continue
-        summary=str(it.get("summary","")).strip()[:MAX_SUMMARY]
-        desc=str(it.get("description","")).strip()
-        labels_raw=str(it.get("labels","")).strip()
-        if not labels_raw and summary: labels_raw=autolabels_from_summary(summary)
-        parts=[p.strip() for p in labels_raw.split(",") if p.strip()]
-        due_raw=str(it.get("due","")).strip()
-        due_iso=to_iso(due_raw) or parse_due_kz(due_raw) if due_raw else ""
-        comment=str(it.get("comment","")).strip()
-        pr=str(it.get("priority","") or "Medium").title()
-        if pr not in PRIORITIES: pr="Medium"
-        out.append({"id":uuid.uuid4().hex[:8],"summary":summary,"description":desc,"labels":", ".join(parts),"due":due_iso,"comment":comment,"priority":pr})
-    return out
-
-# # heuristic_split_one_task: если LLaMA вернула 1 задачу, а действий несколько — аккуратно сплитим
-def heuristic_split_one_task(task:Dict[str,Any])->List[Dict[str,Any]]:
-    text=(task.get("summary","")+" . "+task.get("description","")).lower()
-    # ищем соединители
-    if not any(k in text for k in [" и ", " а также ", " затем ", " после этого ", " потом "]):
-        return [task]
-    # грубый сплит по «и/затем/после этого»
-    pieces=re.split(r"\\s+(?:и|а также|затем|после этого|потом)\\s+", (task.get("description") or task.get("summary") or ""))
-    pieces=[p.strip(" .,!?:;") for p in pieces if p and len(p.strip())>2]
-    if len(pieces)<2: 
-        return [task]
-    results=[]
-    for p in pieces:
-        # отдельная тема — первое слово-глагол + оставшееся
-        sumr=p.capitalize()
-        due=parse_due_kz(p) or infer_due_from_text(p)
-        results.append({
-            "id":uuid.uuid4().hex[:8],
-            "summary":sumr[:MAX_SUMMARY],
-            "description":p,
-            "labels":autolabels_from_summary(sumr),
-            "due":due,
-            "comment":task.get("comment",""),
-            "priority":task.get("priority","Medium")
-        })
-    return results if results else [task]
-
-# # llama_extract: строгий промпт — КАЖДОЕ ДЕЙСТВИЕ = ОТДЕЛЬНАЯ ЗАДАЧА + due = YYYY-MM-DD
-def llama_extract(transcript:str)->Tuple[List[Dict[str,Any]],Dict[str,str]]:
-    mode,url,model=autodiscover()
-    if not mode or not url: raise RuntimeError("LLM endpoint not found")
-    today=kz_now().date().isoformat()
-    tz="Asia/Almaty"
-    sys=(
-        "Ты аналитик задач. Разбей текст на отдельные действия и верни строго JSON-массив задач. "
-        "Правила: 1) каждое отдельное действие — отдельная задача (если есть 'и', 'а также', 'затем', 'после этого', разделяй); "
-        "2) поля каждой задачи: {summary, description, labels, due, comment, priority}; "
-        "summary — до 160 символов; labels — 3–6 ключевых слов через запятую; priority — одно из Highest, High, Medium, Low, Lowest; "
-        "3) сегодняшняя дата: "+today+"; часовой пояс: "+tz+"; "
-        "4) относительные выражения ('завтра', 'послезавтра', 'через N дней/недель', 'в пятницу'...) пересчитай в абсолютный due формата YYYY-MM-DD; "
-        "5) если явной даты нет — поставь разумный due (обычно +3 дня). "
-        "Верни ТОЛЬКО JSON без пояснений."
-    )
-    txt=llama_call(mode,url,model,[{"role":"system","content":sys},{"role":"user","content":transcript}])
-    tasks=parse_tasks_json(txt)
-    # если LLaMA всё равно вернула одну «комбинированную» задачу — мягко сплитим
-    if len(tasks)==1:
-        tasks = heuristic_split_one_task(tasks[0])
-    return tasks, {"mode":mode,"url":url,"model":model}
-
-# # normalize_tasks_after_extraction: добить пустые due/labels
-def normalize_tasks_after_extraction(tasks:List[Dict[str,Any]], source_text:str)->List[Dict[str,Any]]:
-    out=[]
-    for t in tasks:
-        due=t.get("due","").strip()
-        if not to_iso(due):
-            iso=parse_due_kz(due) if due else ""
-            if not iso:
-                iso=infer_due_from_text((t.get("description","") or "")+" "+source_text)
-            t["due"]=iso
-        if not t.get("labels"):
-            t["labels"]=autolabels_from_summary(t.get("summary",""))
-        out.append(t)
-    return out
-
-# # jira_priority_id: имя приоритета → id
-def jira_priority_id(base:str,email:str,token:str,name:str)->Optional[str]:
-    try:
-        r=requests.get(base.rstrip("/")+"/rest/api/3/priority",auth=(email,token),timeout=40)
-        if r.status_code>=300: return None
-        for it in r.json():
-            if str(it.get("name","")).lower()==name.lower():
-                return it.get("id")
-    except Exception: return None
-    return None
-
-# # jira_create_issue: создать задачу
-def jira_create_issue(base:str,email:str,token:str,project:str,t:Dict[str,Any])->Dict[str,Any]:
-    url=base.rstrip("/")+"/rest/api/3/issue"
-    hdr={"Accept":"application/json","Content-Type":"application/json"}
-    fields={"project":{"key":project},"summary":(t.get("summary") or "Задача")[:MAX_SUMMARY],"issuetype":{"name":"Task"}}
-    raw=t.get("labels","") or ""
-    labels=[x.strip() for x in raw.split(",") if x.strip()]
-    if labels: fields["labels"]=labels
-    if t.get("due"):
-        iso = to_iso(t.get("due")) or parse_due_kz(t.get("due")) or infer_due_from_text(t.get("description",""))
-        if iso: fields["duedate"]=iso
-    pr=t.get("priority") or "Medium"
-    pid=jira_priority_id(base,email,token,pr)
-    fields["priority"]={"id":pid} if pid else {"name":pr}
-    desc=str(t.get("description","")).strip()
-    if desc: fields["description"]={"type":"doc","version":1,"content":[{"type":"paragraph","content":[{"type":"text","text":desc}]}]}
-    body={"fields":fields}
-    r=requests.post(url,auth=(email,token),headers=hdr,json=body,timeout=60)
-    if r.status_code>=300: return {"ok":False,"error":r.text}
-    return {"ok":True,**r.json()}
-
-# # jira_comment: доп. комментарий после создания
-def jira_comment(base:str,email:str,token:str,key:str,text:str)->Dict[str,Any]:
-    if not (text or "").strip(): return {"ok":True,"skipped":True}
-    url=base.rstrip("/")+f"/rest/api/3/issue/{key}/comment"
-    hdr={"Accept":"application/json","Content-Type":"application/json"}
-    payload={"body":{"type":"doc","version":1,"content":[{"type":"paragraph","content":[{"type":"text","text":text}]}]}}
-    r=requests.post(url,auth=(email,token),headers=hdr,json=payload,timeout=60)
-    if r.status_code>=300: return {"ok":False,"error":r.text}
-    return {"ok":True,**r.json()}
-
-# # issue_link / project_link: ссылки
-def issue_link(base:str,key:str)->str:
-    return base.rstrip("/")+"/browse/"+key
-def project_link(base:str,key:str)->str:
-    return base.rstrip("/")+f"/jira/core/projects/{key}/list"
-
-# # Whisper loader (скрыто, без спиннера)
-@st.cache_resource(show_spinner=False)
-def load_whisper()->WhisperModel:
-    return WhisperModel(WHISPER_SIZE, device=DEVICE, compute_type=COMPUTE_TYPE)
+    # задание распознавания и владелец (для честной очереди) — из URL: обновление страницы не теряет результат
+    st.session_state.setdefault("owner",st.query_params.get("u") or uuid.uuid4().hex[:10])
+    st.session_state.setdefault("job_id",st.query_params.get("job",""))
+    st.session_state.setdefault("meeting_id",st.session_state["job_id"])   # запись в истории (store.py): id задания или своя
 
 # ===== UI =====
 css(); init_state()
 st.markdown('<div class="title-strip"></div>', unsafe_allow_html=True)
 st.markdown('<div class="hdr">Whisper → LLaMA → Jira</div>', unsafe_allow_html=True)
 
+# # open_meeting: встреча из истории → текст и задачи (callback: до создания виджетов текста и таблицы)
+def open_meeting(mid):
+    m=store().meeting(mid)
+    if not m: return
+    st.session_state.update({"transcript":m["transcript"],"transcript_area":m["transcript"],"file_name":m["name"],"meeting_id":mid,
+                             "job_id":"","job_seen":"","ed_key":None,"tasks":[{"id":t["id"],**{c:t[c] for c in ("summary","description","labels","due","comment")},
+                                                                          "priority":t["priority"] or "Medium","jira_key":t["jira_key"],"block":t["block"]} for t in m["tasks"]],
+                             "blocks":[h for h in m["blocks"].split(",") if h]})
+    st.query_params.pop("job",None)
+    st.session_state["history_open"]=True
+
+# # history_panel: прошлые встречи — поиск по расшифровкам и задачам (FTS), фильтр по проекту Jira; fragment — ввод не перезапускает страницу
+@st.fragment
+def history_panel():
+    with st.expander("История встреч"):
+        c1,c2=st.columns([3,1])
+        q=c1.text_input("Поиск",key="hist_q",placeholder="слова из расшифровки, темы или описания задачи")
+        proj=c2.text_input("Проект Jira",key="hist_proj",placeholder="PRJ")
+        rows=store().history(q,proj,limit=50)
+        if not rows:
+            st.caption("Ничего не найдено" if q or proj else "История пуста: здесь появятся распознанные записи и извлечённые задачи"); return
+        st.dataframe([{"дата":datetime.fromtimestamp(r["created"]).strftime("%Y-%m-%d %H:%M"),"запись":r["name"],"длит.":mmss(r["duration"]),
+                       "задач":r["tasks"],"в Jira":r["jira"],**({"фрагмент":r.get("snippet","")} if q else {})} for r in rows],
+                     hide_index=True,use_container_width=True)
+        h1,h2=st.columns([3,1])
+        mid=h1.selectbox("Встреча",[r["id"] for r in rows],key="hist_pick",label_visibility="collapsed",
+                         format_func=lambda i:next(f"{datetime.fromtimestamp(r['created']).strftime('%Y-%m-%d %H:%M')} · {r['name']}" for r in rows if r["id"]==i))
+        h2.button("Открыть",key="hist_go",on_click=open_meeting,args=(mid,))
+    if st.session_state.pop("history_open",False): st.rerun()   # текст и задачи — вне fragment
+
+# # mmss: секунды → м:сс
+def mmss(x:float)->str:
+    return f"{int(x)//60}:{int(x)%60:02d}"
+
+history_panel()
+
 # # Загрузка
 st.markdown('<div class="subhdr">Загрузка и распознавание</div>', unsafe_allow_html=True)
 up=st.file_uploader("Форматы: wav, mp3, m4a, ogg, flac, mp4, mov, mkv, webm", type=SUPPORTED)
 if up is not None:
+    # сам объект загрузки (BytesIO Streamlit), без getvalue() — вторая копия файла в памяти не нужна
     st.session_state["file_name"]=up.name
-    st.session_state["file_bytes"]=up.getvalue()
-if st.session_state.get("file_bytes"):
-    st.audio(st.session_state["file_bytes"])
+    st.session_state["upload"]=up
+if st.session_state.get("upload") is not None:
+    st.audio(st.session_state["upload"])
 
 # # Распознать (язык рядом, без кривого выравнивания)
 with st.container():
@@ -463,42 +129,62 @@ with st.container():
                             index=["auto","ru","en","kk","tr"].index(st.session_state.get("lang","auto")),
                             label_visibility="collapsed")
         st.session_state["lang"]=lang
+    st.checkbox("Заново спросить LLM (не брать ответы из кэша)", key="llm_refresh")
 
 if go_rec:
-    if not st.session_state.get("file_bytes"):
+    if st.session_state.get("upload") is None:
         st.warning("Сначала загрузите файл")
     else:
-        if WhisperModel is None:
+        if not whisper_available():
             st.error("faster-whisper не установлен")
         else:
-            tmp=tempfile.NamedTemporaryFile(delete=False,suffix=f"_{st.session_state['file_name']}")
-            tmp.write(st.session_state["file_bytes"]); tmp.flush(); tmp.close()
-            src=tmp.name
-            ext=(st.session_state["file_name"].split(".")[-1] or "").lower()
-            wav_path=src
-            if ext in ["mp4","mov","mkv","webm"]: wav_path=ffmpeg_extract(src)
-            try:
-                whisper=load_whisper()  # грузится тихо, без отображения
-                kw={}; lng=st.session_state.get("lang","auto")
-                if lng and lng!="auto": kw["language"]=lng
-                parts=[]
-                segs, info = whisper.transcribe(wav_path, vad_filter=True, vad_parameters={"min_silence_duration_ms":500}, **kw)
-                for s in segs: parts.append(s.text)
-                raw="".join(parts).strip()
-                cleaned, meta = llama_clean(raw) if raw else ("",{})
-                final=cleaned or raw
-                st.session_state["transcript"]=final
-                st.session_state["transcript_area"]=final
-                st.session_state["llama_mode"]=meta.get("mode","")
-                st.session_state["llama_url"]=meta.get("url","")
-                st.session_state["llama_model"]=meta.get("model","")
-                st.success("Готово")
-            finally:
-                try: os.unlink(src)
-                except Exception: pass
-                try:
-                    if wav_path!=src: os.unlink(wav_path)
-                except Exception: pass
+            # распознавание и правка — в фоновой очереди (общий пул Whisper); страницу можно обновить, результат дождётся
+            jid=job_queue().submit(st.session_state["upload"],name=st.session_state["file_name"],owner=st.session_state["owner"],
+                                   lang=st.session_state.get("lang","auto"),refresh=st.session_state.get("llm_refresh",False))
+            st.session_state["job_id"]=jid
+            st.query_params.update({"job":jid,"u":st.session_state["owner"]})
+
+# # job_panel: прогресс задания распознавания (fragment, опрос раз в JOBS_POLL_S); готово — текст в поле ниже
+def job_panel():
+    jid=st.session_state.get("job_id")
+    j=job_state(jid) if jid else None
+    if not j: return
+    if j["status"] in ACTIVE:
+        dur=j.get("duration") or 0.0
+        what={"queued":"в очереди","running":"распознаётся","cleaning":"правка текста LLM"}[j["status"]]
+        st.progress(min(1.0,j["done_s"]/dur) if dur else 0.0,
+                    text=f"{j['name']}: {what} · сегментов: {j['segments']} · {mmss(j['done_s'])} из {mmss(dur) if dur else '—'}")
+        q=job_queue().stats()
+        st.caption(f"Whisper занят: {q['busy']} из {q['workers']} · кусков в очереди: {q['queued']}")
+        if st.button("Отменить распознавание"): job_queue().cancel(jid); st.rerun()
+        return
+    if st.session_state.get("job_seen")!=jid:
+        # результат — в сессию один раз (после обновления страницы — снова, из файла задания)
+        st.session_state["job_seen"]=jid; st.session_state["meeting_id"]=jid
+        res=job_result(jid) or {}
+        if res:
+            meta=res.get("meta") or {}
+            st.session_state["transcript"]=res["transcript"]; st.session_state["transcript_area"]=res["transcript"]; st.session_state["blocks"]=[]
+            st.session_state["llama_mode"]=meta.get("mode",""); st.session_state["llama_url"]=meta.get("url",""); st.session_state["llama_model"]=meta.get("model","")
+            tm=j.get("timings") or {}
+            st.session_state["perf"]={"trace":jid,"dropped":0,"summary":[],**(res.get("perf") or {}),
+                                      "name":"Распознавание","wall_s":tm.get("wall_s",0.0),"timings":tm}
+        st.rerun()
+    if j["status"]=="done":
+        st.success("Готово"+(" (расшифровка из кэша)" if j.get("cached") else ""))
+        if j.get("warning"): st.warning(j["warning"])
+        prev=store().by_hash(j.get("digest",""),exclude=jid)
+        if prev and prev["tasks"]:
+            st.info(f"Эта запись уже разбиралась {datetime.fromtimestamp(prev['created']).strftime('%Y-%m-%d %H:%M')}: задач {prev['tasks']}.")
+            st.button("Открыть задачи из истории",key="hist_prev",on_click=open_meeting,args=(prev["id"],))
+            if st.session_state.pop("history_open",False): st.rerun()
+        st.caption(f"Whisper {j.get('model','')} · {mmss(j.get('duration') or 0)} аудио"+(f" · кусков: {j['slices']}" if j.get("slices",0)>1 else "")+
+                   "".join(f" · {k[:-2]} {v} с" for k,v in (j.get("timings") or {}).items()))
+    elif j["status"]=="cancelled": st.info("Распознавание отменено")
+    else: st.error(j.get("error") or "Ошибка распознавания")
+
+_j=job_state(st.session_state["job_id"]) if st.session_state.get("job_id") else None
+st.fragment(job_panel,run_every=JOBS_POLL_S if _j and _j["status"] in ACTIVE else None)()
 
 # # Текст
 st.markdown('<div class="subhdr">Распознанный текст</div>', unsafe_allow_html=True)
@@ -513,42 +199,146 @@ if go_ext:
     if not body.strip():
         st.warning("Нет текста для извлечения")
     else:
+        tr=metrics.Trace("extract")
         try:
-            tasks,meta=llama_extract(body)
-            tasks=normalize_tasks_after_extraction(tasks, body)
-            st.session_state["tasks"]=tasks
+            refresh=st.session_state.get("llm_refresh",False)
+            # в LLM — только изменённые блоки текста; задачи остальных блоков (с правками в таблице) остаются
+            prev=st.session_state.get("blocks") or []
+            with metrics.use(tr), metrics.span("extract"):
+                # новые задачи появляются по мере готовности блоков (LLAMA_STREAM — и внутри блока); итоговый список — info["tasks"]
+                info={}; box=st.empty(); shown=[]
+                for t in llama_extract_blocks(body, st.session_state["tasks"] if prev else [], prev, refresh=refresh, stream=LLAMA_STREAM, info=info):
+                    shown.append(t)
+                    if LLAMA_STREAM: box.markdown("\n".join(f"{i}. {x.get('summary','')} — {x.get('due','')}" for i,x in enumerate(shown,1)))
+                box.empty()
+                tasks,meta=info["tasks"],info["meta"]
+            with metrics.use(tr), metrics.span("normalize"):
+                old={t["id"] for t in st.session_state["tasks"]} if prev else set()
+                normalize_tasks_after_extraction([t for t in tasks if t["id"] not in old], body)
+            st.session_state["tasks"]=tasks; st.session_state["blocks"]=info["blocks"]
+            st.session_state["ed_key"]=None   # правки прежней таблицы к новым задачам не относятся
+            mid=st.session_state.get("meeting_id") or uuid.uuid4().hex[:12]; st.session_state["meeting_id"]=mid
+            store().put_meeting(mid,name=st.session_state.get("file_name") or "Текст без записи",source="ui",owner=st.session_state["owner"],
+                                transcript=body,blocks=",".join(info["blocks"]))
+            store().put_tasks(mid,tasks)
             st.session_state["llama_mode"]=meta.get("mode","")
             st.session_state["llama_url"]=meta.get("url","")
             st.session_state["llama_model"]=meta.get("model","")
-            st.success(f"Извлечено задач: {len(tasks)}")
+            if info["kept"] or info["sent"]<info["total"]:
+                st.success(f"Задач: {len(tasks)} · заново разобрано блоков: {info['sent']} из {info['total']} · сохранено задач: {info['kept']}")
+            else:
+                st.success(f"Извлечено задач: {len(tasks)}")
+            if meta.get("failed","0")!="0": st.warning(f"Не обработано блоков: {meta['failed']} из {meta['chunks']}")
+            ft=info.get("first_task_s")
+            st.caption(("Первая задача: "+(f"{ft:.1f} с" if ft is not None else "—"))+f" · всего: {info['total_s']:.1f} с"+
+                       f" · ≈ токенов запроса: {info['tokens_in']} из {info['tokens_full']}")
         except Exception as e:
             st.error(str(e))
-
-# # Список задач
-st.markdown('<div class="subhdr">Список задач</div>', unsafe_allow_html=True)
-new=[]
-if st.session_state.get("tasks"):
-    idx=1
+        st.session_state["perf"]={**tr.to_dict(),"name":"Извлечение задач"}
+
+# # Список задач: одна таблица (st.data_editor) со страницами, фильтром, сортировкой и массовой правкой.
+# # Всё внутри st.fragment: правка ячейки перезапускает только этот блок, а не CSS, распознавание и форму Jira.
+TASK_COLS=["summary","description","labels","due","priority","comment","merge_into"]
+PAGE_SIZES=[25,50,100,200]
+SORTS={"как извлечено":None,"срок":lambda t:(t.get("due") or "9999"),"приоритет":lambda t:PRIORITIES.index(t["priority"]) if t.get("priority") in PRIORITIES else 99,
+       "тема":lambda t:(t.get("summary") or "").lower()}
+
+# # task_match: задача подходит под фильтр (подстрока в теме/описании/метках, приоритеты)
+def task_match(t, q, prios):
+    if prios and t.get("priority") not in prios: return False
+    q=(q or "").strip().lower()
+    return not q or any(q in str(t.get(c) or "").lower() for c in ("summary","description","labels"))
+
+# # task_rows: строки таблицы по задачам ids (порядок строк = порядок ids)
+def task_rows(ids):
+    by={t["id"]:t for t in st.session_state.get("tasks",[])}
+    return [{"sel":False,**{c:str(by[i].get(c) or "") for c in TASK_COLS},
+             "dup":"; ".join(f"{d['key']} ({d['score']:.0%}) {d['summary'][:60]}" for d in by[i].get("dups") or [])} for i in ids]
+
+# # apply_edits: изменения таблицы (состояние data_editor: edited/added/deleted rows) → задачи; повтор безопасен
+def apply_edits(ids, key, state):
+    tasks=st.session_state.get("tasks",[]); by={t["id"]:t for t in tasks}
+    for pos,ch in (state.get("edited_rows") or {}).items():
+        t=by.get(ids[int(pos)]) if int(pos)<len(ids) else None
+        if t: t.update({c:("" if v is None else str(v)) for c,v in ch.items() if c in TASK_COLS})
+    for n,row in enumerate(state.get("added_rows") or []):
+        tid=f"{key[-8:]}{n}"
+        t=by.get(tid)
+        if t is None:
+            t={"id":tid,"summary":"","description":"","labels":"","due":"","comment":"","priority":"Medium"}; tasks.append(t); by[tid]=t
+        t.update({c:("" if v is None else str(v)) for c,v in row.items() if c in TASK_COLS})
+    gone={ids[int(p)] for p in state.get("deleted_rows") or [] if int(p)<len(ids)}
+    if gone: st.session_state["tasks"]=[t for t in tasks if t["id"] not in gone]
+
+# # bulk_apply: приоритет/срок/метки — разом для задач ids
+def bulk_apply(ids, prio, due, labels):
+    ids=set(ids)
     for t in st.session_state.get("tasks",[]):
-        with st.expander(f"Задача {idx}: {t.get('summary') or ''}", expanded=False):
-            t["summary"]=st.text_input("Тема", t.get("summary",""), key=f"s_{t['id']}")
-            t["description"]=st.text_area("Описание", t.get("description",""), key=f"d_{t['id']}")
-            t["labels"]=st.text_input("Метки (через запятую)", t.get("labels",""), key=f"l_{t['id']}")
-            t["due"]=st.text_input("Дата дедлайна", value=t.get("due",""), placeholder="YYYY-MM-DD пример: 2025-09-21", key=f"due_{t['id']}")
-            pr_default=t.get("priority","Medium")
-            try: pr_idx=PRIORITIES.index(pr_default) if pr_default in PRIORITIES else PRIORITIES.index("Medium")
-            except Exception: pr_idx=PRIORITIES.index("Medium")
-            t["priority"]=st.selectbox("Приоритет", PRIORITIES, index=pr_idx, key=f"p_{t['id']}")
-            t["comment"]=st.text_area("Комментарий", t.get("comment",""), key=f"c_{t['id']}")
-            if st.button("Удалить", key=f"del_{t['id']}"):
-                pass
-            else:
-                new.append(t)
-        idx+=1
-st.session_state["tasks"]=new
+        if t["id"] not in ids: continue
+        if prio: t["priority"]=prio
+        if due.strip(): t["due"]=due.strip()
+        if labels.strip():
+            cur=[x.strip() for x in (t.get("labels") or "").split(",") if x.strip()]
+            t["labels"]=", ".join(cur+[x.strip() for x in labels.split(",") if x.strip() and x.strip() not in cur])
+    st.session_state["ed_ver"]=st.session_state.get("ed_ver",0)+1   # таблица перестроится из задач
+
+# # add_task: пустая задача в конец списка (callback кнопки — выполняется до перезапуска, отдельный rerun не нужен)
+def add_task():
+    st.session_state.setdefault("tasks",[]).append({"id":uuid.uuid4().hex[:8],"summary":"","description":"","labels":"","due":"","comment":"","priority":"Medium"})
+    st.session_state["task_goto_new"]=True
+
+# # task_editor: таблица задач (fragment; время каждого запуска — спан ui_tasks)
+@st.fragment
+def task_editor():
+    with metrics.span("ui_tasks"): task_table()
+
+# # task_table: фильтр, страницы, массовая правка и сама таблица
+def task_table():
+    # сначала — правки, сделанные в таблице с прошлого запуска (фильтр и страницы должны их видеть)
+    ekey=st.session_state.get("ed_key")
+    if ekey and ekey in st.session_state: apply_edits(st.session_state.get("ed_ids",[]),ekey,st.session_state[ekey])
+    tasks=st.session_state.get("tasks",[])
+    if st.session_state.pop("task_goto_new",False):
+        # новая задача пустая — сбросить фильтр и открыть последнюю страницу (до создания виджетов)
+        st.session_state.update({"task_q":"","task_prio":[],"task_sort":"как извлечено","task_page":10**6})
+    c1,c2,c3,c4,c5=st.columns([2.2,1.6,1.1,0.8,0.8])
+    q=c1.text_input("Фильтр",key="task_q",placeholder="слово из темы, описания или меток")
+    pf=c2.multiselect("Приоритет",PRIORITIES,key="task_prio")
+    sort=c3.selectbox("Сортировка",list(SORTS),key="task_sort")
+    size=c4.selectbox("На странице",PAGE_SIZES,key="task_size")
+    ids=[t["id"] for t in (sorted(tasks,key=SORTS[sort]) if SORTS[sort] else tasks) if task_match(t,q,pf)]
+    pages=max(1,-(-len(ids)//size))
+    if st.session_state.get("task_page",1)>pages: st.session_state["task_page"]=pages
+    page=c5.number_input("Страница",min_value=1,max_value=pages,step=1,key="task_page")
+    shown=ids[(page-1)*size:page*size]
+    sel=[st.session_state.get("ed_ids",[])[int(p)] for p,ch in ((st.session_state.get(ekey) or {}).get("edited_rows") or {}).items()
+         if ch.get("sel") and int(p)<len(st.session_state.get("ed_ids",[]))] if ekey else []
+    with st.expander(f"Массовая правка: {'выбрано '+str(len(sel)) if sel else 'все по фильтру ('+str(len(ids))+')'}"):
+        b1,b2,b3,b4=st.columns([1,1,1.4,0.9])
+        bp=b1.selectbox("Приоритет",["— не менять —"]+PRIORITIES,key="bulk_prio")
+        bd=b2.text_input("Срок",key="bulk_due",placeholder="2025-09-21 или «к пятнице»")
+        bl=b3.text_input("Добавить метки",key="bulk_labels",placeholder="через запятую")
+        if b4.button("Применить",key="bulk_go"): bulk_apply(sel or ids,"" if bp.startswith("—") else bp,bd,bl)
+    st.button("Добавить задачу вручную",on_click=add_task)
+    # данные таблицы неизменны, пока та же страница: иначе data_editor сбросил бы несохранённые правки
+    sig=(tuple(shown),st.session_state.get("ed_ver",0))
+    if st.session_state.get("ed_sig")!=sig:
+        st.session_state.update({"ed_sig":sig,"ed_rows":task_rows(shown),"ed_ids":list(shown),"ed_key":"ed_"+uuid.uuid4().hex[:8]})
+    dupkeys=sorted({d["key"] for t in tasks for d in t.get("dups") or []})
+    cfg={"sel":st.column_config.CheckboxColumn("✓",help="для массовой правки",width="small"),
+         "summary":st.column_config.TextColumn("Тема",width="medium"),"description":st.column_config.TextColumn("Описание",width="large"),
+         "labels":st.column_config.TextColumn("Метки"),"due":st.column_config.TextColumn("Срок",help="YYYY-MM-DD или «завтра», «к пятнице»"),
+         "priority":st.column_config.SelectboxColumn("Приоритет",options=PRIORITIES,required=True),
+         "comment":st.column_config.TextColumn("Комментарий"),"dup":st.column_config.TextColumn("Похожа на (Jira)",disabled=True),
+         "merge_into":st.column_config.SelectboxColumn("Комментарием в",options=[""]+dupkeys,help="вместо новой задачи — комментарий в существующую")}
+    order=["sel","summary","description","labels","due","priority","comment"]+(["dup","merge_into"] if dupkeys else [])
+    st.data_editor(st.session_state["ed_rows"],key=st.session_state["ed_key"],num_rows="dynamic",hide_index=True,
+                   use_container_width=True,column_config=cfg,column_order=order)
+    st.caption(f"Задач: {len(tasks)} · по фильтру: {len(ids)} · страница {page} из {pages}")
 
-if st.button("Добавить задачу вручную"):
-    st.session_state["tasks"].append({"id":uuid.uuid4().hex[:8],"summary":"","description":"","labels":"","due":"","comment":"","priority":"Medium"})
+st.markdown('<div class="subhdr">Список задач</div>', unsafe_allow_html=True)
+if st.session_state.get("tasks"): task_editor()
+else: st.button("Добавить задачу вручную",on_click=add_task)
 
 # # Jira форма
 st.markdown('<div class="subhdr">Отправка в Jira</div>', unsafe_allow_html=True)
@@ -557,7 +347,10 @@ with st.form("jira_form"):
     jira_email=st.text_input("Jira Email", key="jira_email")
     jira_token=st.text_input("Jira API Token", type="password", key="jira_token")
     jira_project=st.text_input("Project Key", placeholder="PRJ", key="jira_project")
+    jira_issuetype=st.text_input("Issue Type", value=JIRA_ISSUE_TYPE, key="jira_issuetype")
+    jira_meta_refresh=st.checkbox("Обновить метаданные Jira (приоритеты, типы, поля экрана)", key="jira_meta_refresh")
     submit=st.form_submit_button("Создать задачи", type="primary")
+    check_dups=st.form_submit_button("Проверить дубликаты в Jira")
 
 # # Enter-навигация по форме
 st.markdown("""
@@ -585,8 +378,8 @@ st.markdown("""
 </script>
 """, unsafe_allow_html=True)
 
-# # jira_bulk_create: массовое создание + ссылки
-def jira_bulk_create():
+# # jira_creds: URL, email, токен, проект из формы; None — что-то не заполнено (с предупреждением)
+def jira_creds():
     base=st.session_state.get("jira_url","").strip()
     em=st.session_state.get("jira_email","").strip()
     tok=st.session_state.get("jira_token","").strip()
@@ -594,32 +387,85 @@ def jira_bulk_create():
     need=[("URL",base),("Email",em),("API token",tok),("Project Key",proj)]
     miss=[x for x,v in need if not v]
     if miss:
-        st.warning("Заполните поля: "+", ".join(miss)); return
+        st.warning("Заполните поля: "+", ".join(miss)); return None
+    return base,em,tok,proj
+
+# # jira_check_dups: сверить задачи с открытыми задачами проекта (индекс dedup) и показать выбор у похожих
+def jira_check_dups():
+    creds=jira_creds()
+    if not creds: return
+    tlist=st.session_state.get("tasks",[])
+    if not tlist:
+        st.error("Нет задач для проверки"); return
+    tr=metrics.Trace("dedup")
+    try:
+        with metrics.use(tr), metrics.span("dedup",tasks=len(tlist)):
+            r=find_duplicates(*creds,tlist)
+    except Exception as e:
+        st.error(f"Проверка дубликатов: {e}"); return
+    st.session_state["perf"]={**tr.to_dict(),"name":"Проверка дубликатов"}
+    st.session_state["dup_msg"]=(f"Похожие задачи (≥ {DUP_THRESHOLD:.0%}) у {r['found']} из {len(tlist)}; в индексе {r['issues']} открытых задач"+
+                                 (f", синхронизировано: {r['put']}" if r["put"] or r["dropped"] else "")+". Выбор — в столбце «Комментарием в» таблицы задач.")
+    st.session_state["ed_ver"]=st.session_state.get("ed_ver",0)+1   # таблица перестроится со столбцами дубликатов
+    st.rerun()   # таблица задач — выше формы
+
+# # jira_bulk_create: массовое создание + ссылки
+def jira_bulk_create():
+    creds=jira_creds()
+    if not creds: return
+    base,em,tok,proj=creds
     tlist=list(st.session_state.get("tasks",[]))
     if not tlist:
         st.error("Нет задач для отправки"); return
-    ok=[]; err=[]; links=[]
-    for t in tlist:
-        if t.get("due") and not re.match(r"^\\d{4}-\\d{2}-\\d{2}$", t["due"]):
-            iso=parse_due_kz(t["due"])
-            if not iso:
-                iso=infer_due_from_text((t.get("description","") or ""))
-            t["due"]=iso
-        if not t.get("due"):
-            t["due"]=infer_due_from_text((t.get("description","") or ""))
-        res=jira_create_issue(base,em,tok,proj,t)
+    prepare_due(tlist)
+    itype=st.session_state.get("jira_issuetype","").strip() or JIRA_ISSUE_TYPE
+    refresh=bool(st.session_state.get("jira_meta_refresh"))
+    tr=metrics.Trace("jira")
+    with metrics.use(tr), metrics.span("jira_meta"):
+        meta=jira_meta(base,em,tok,proj,itype,refresh=refresh)
+    if meta.get("fields") is not None:
+        skip=[f for f in ("priority","duedate","labels","description") if f not in meta["fields"]]
+        if skip: st.info("Нет на экране создания — не отправляются: "+", ".join(skip))
+    ok=[]; err=[]; links=[]; old=[]; merged=[]
+    with metrics.use(tr), metrics.span("jira_submit",tasks=len(tlist)):
+        results=jira_submit(base,em,tok,proj,tlist,issuetype=itype)
+    st.session_state["perf"]={**tr.to_dict(),"name":"Отправка в Jira"}
+    # в историю — задачи в том виде, в каком ушли, и их ключи
+    mid=st.session_state.get("meeting_id") or uuid.uuid4().hex[:12]; st.session_state["meeting_id"]=mid
+    store().put_tasks(mid,tlist)
+    store().put_jira(mid,proj,[(t["id"],r["key"]) for t,r in zip(tlist,results) if r.get("ok") and r.get("key")])
+    for res in results:
         if not res.get("ok"):
             err.append(res.get("error","")); continue
         key=res.get("key") or res.get("id") or "?"
-        if (t.get("comment") or "").strip():
-            _c=jira_comment(base,em,tok,key,t["comment"].strip())
-            if not _c.get("ok"): err.append(_c.get("error",""))
-        ok.append(key); links.append(base.rstrip('/')+'/browse/'+key)
+        if res.get("comment_error"): err.append(res["comment_error"])
+        (merged if res.get("merged") else old if res.get("existing") else ok).append(key); links.append(base.rstrip('/')+'/browse/'+key)
     if ok:
         st.success("Создано: "+", ".join(ok))
+    if old: st.info("Уже были в Jira (повторная отправка), не создавались заново: "+", ".join(old))
+    if merged: st.info("Добавлено комментарием в существующие: "+", ".join(merged))
+    if ok or old or merged:
         st.write("Проект "+proj+": "+project_link(base,proj))
         for u in links: st.write(u)
     if err: st.error("Ошибки: "+" | ".join([e[:200] for e in err]))
 
+if check_dups:
+    jira_check_dups()
+if st.session_state.get("dup_msg"):
+    st.info(st.session_state.pop("dup_msg"))
 if submit:
     jira_bulk_create()
+
+# # perf_panel: разбивка времени последнего задания (спаны metrics: ffmpeg, Whisper, LLM, HTTP, Jira)
+def perf_panel():
+    perf=st.session_state.get("perf")
+    if not perf: return
+    with st.expander(f"Производительность: {perf['name']} · {perf['wall_s']:.2f} с", expanded=False):
+        rows=[{"этап":r["span"],"вызовов":r["calls"],"всего, с":r["total_s"],"макс., с":r["max_s"],
+               "отправлено, КБ":round(r["bytes_out"]/1024,1),"получено, КБ":round(r["bytes_in"]/1024,1),
+               "ошибок":r["errors"],"статусы":", ".join(f"{k}×{v}" for k,v in sorted(r["status"].items()))} for r in perf["summary"]]
+        if rows: st.table(rows)
+        if perf.get("timings"): st.caption("Этапы конвейера, с: "+", ".join(f"{k[:-2]} {v}" for k,v in perf["timings"].items()))
+        if perf.get("dropped"): st.caption(f"Спанов сверх лимита (не показаны): {perf['dropped']}")
+
+perf_panel()
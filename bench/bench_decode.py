@@ -0,0 +1,55 @@
+# # bench_decode: декодирование для Whisper — временный WAV (как раньше) vs канал ffmpeg → PCM в памяти / memmap
+# # Каждый вариант — в отдельном процессе, чтобы пик RSS и счётчики диска не смешивались.
+# # Запуск: python bench/bench_decode.py [--minutes 20] [--out bench_decode.json]
+import os, sys, json, time, argparse, subprocess, tempfile
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# # run_variant: один вариант в этом процессе → метрики (вызывается из дочернего процесса)
+def run_variant(variant:str, path:str)->dict:
+    import pipeline as pl
+    io0=pl.io_bytes(); t0=time.perf_counter(); st={}
+    if variant=="tempwav":
+        # прежний путь: ffmpeg → WAV на диск → faster-whisper читает WAV целиком
+        from faster_whisper.audio import decode_audio
+        wav=tempfile.NamedTemporaryFile(delete=False,suffix=".wav").name
+        subprocess.run([pl.ffmpeg_exe() or "ffmpeg","-y","-loglevel","error","-i",path,"-vn","-ac","1","-ar","16000","-c:a","pcm_s16le",wav],check=True)
+        audio=decode_audio(wav,sampling_rate=16000); os.unlink(wav)
+    elif variant=="pipe":
+        with open(path,"rb") as f: audio=pl.decode_pcm(f,st)
+    else:
+        audio=pl.decode_pcm(path,st,spill_mb=1)
+    n=len(audio); wall=time.perf_counter()-t0; io1=pl.io_bytes()
+    out={"variant":variant,"samples":n,"wall_s":round(wall,3),**pl.rss_peak_mb()}
+    if io0 and io1: out.update({"disk_read_mb":round((io1[0]-io0[0])/1048576,1),"disk_write_mb":round((io1[1]-io0[1])/1048576,1)})
+    return out
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--minutes",type=float,default=20.0,help="длина тестовой записи, минут")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    ap.add_argument("--variant",default="",help=argparse.SUPPRESS)
+    ap.add_argument("--path",default="",help=argparse.SUPPRESS)
+    a=ap.parse_args()
+    if a.variant:
+        print(json.dumps(run_variant(a.variant,a.path))); return
+
+    import pipeline as pl
+    src=os.path.join(tempfile.mkdtemp(prefix="bench_decode_"),"meeting.mp4")
+    sec=str(int(a.minutes*60))
+    subprocess.run([pl.ffmpeg_exe() or "ffmpeg","-y","-loglevel","error","-f","lavfi","-i",f"testsrc=d={sec}:s=160x120:r=5",
+                    "-f","lavfi","-i",f"sine=f=440:d={sec}","-shortest","-movflags","+faststart",src],check=True)
+    print(f"файл: {os.path.getsize(src)/1048576:.1f} МБ, {a.minutes:g} мин")
+    rows=[]
+    print(f"{'variant':>8} {'wall, s':>8} {'RSS, MB':>8} {'ffmpeg RSS':>10} {'disk w, MB':>10}")
+    for v in ("tempwav","pipe","memmap"):
+        r=json.loads(subprocess.run([sys.executable,os.path.abspath(__file__),"--variant",v,"--path",src],
+                                    check=True,capture_output=True,text=True).stdout.strip().splitlines()[-1])
+        rows.append(r)
+        print(f"{v:>8} {r['wall_s']:>8.2f} {r.get('rss_peak_mb',0):>8.1f} {r.get('ffmpeg_rss_peak_mb',0):>10.1f} {r.get('disk_write_mb','—'):>10}")
+    os.unlink(src)
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":{"minutes":a.minutes},"results":rows},f,ensure_ascii=False,indent=2)
+
+if __name__=="__main__":
+    main()
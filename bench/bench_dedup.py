@@ -0,0 +1,96 @@
+# # bench_dedup: поиск дубликатов в проекте на 50k задач — полная и инкрементальная синхронизация индекса через fake_jira,
+# # загрузка индекса с диска, запрос: LSH vs перебор всех задач (время, полнота LSH относительно перебора)
+# # Запуск: python bench/bench_dedup.py [--issues 50000] [--tasks 200] [--changes 200] [--latency-ms 2] [--out bench_dedup.json]
+import os, sys, json, time, random, argparse, tempfile, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_jira import FakeJira
+
+SYL=["ка","ро","на","ти","по","ст","ве","ло","ми","де","ра","ко","за","пе","ли","то","сы","ба","ну","же"]
+
+# # vocab: n псевдослов (русские слоги) — словарь тем задач
+def vocab(n:int, rnd:random.Random)->list:
+    out=set()
+    while len(out)<n: out.add("".join(rnd.choice(SYL) for _ in range(rnd.randint(3,5))))
+    return sorted(out)
+
+# # summary: тема из 4–7 слов; частые слова встречаются чаще (как «подготовить», «отчёт» в живых проектах)
+def summary(words:list, rnd:random.Random)->str:
+    return " ".join(words[min(len(words)-1,int(rnd.paretovariate(1.2))-1)] if rnd.random()<0.3 else rnd.choice(words)
+                    for _ in range(rnd.randint(4,7)))
+
+# # perturb: та же задача другими словами — одно слово убрать, одно добавить
+def perturb(s:str, words:list, rnd:random.Random)->str:
+    ws=s.split(); ws.pop(rnd.randrange(len(ws))); ws.insert(rnd.randrange(len(ws)+1),rnd.choice(words))
+    return " ".join(ws)
+
+# # timed: время каждого вызова fn(x), мкс
+def timed(fn, xs:list)->tuple:
+    out=[]; res=[]
+    for x in xs:
+        t=time.perf_counter(); res.append(fn(x)); out.append((time.perf_counter()-t)*1e6)
+    return out,res
+
+def row(name:str, us:list, extra:dict)->dict:
+    q=statistics.quantiles(us,n=100) if len(us)>1 else us*99
+    return {"case":name,"n":len(us),"total_s":round(sum(us)/1e6,3),"p50_us":round(q[49],1),"p95_us":round(q[94],1),**extra}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--issues",type=int,default=50000,help="открытых задач в проекте")
+    ap.add_argument("--vocab",type=int,default=5000,help="слов в словаре тем")
+    ap.add_argument("--tasks",type=int,default=200,help="извлечённых задач для проверки (половина — перефразированные существующие)")
+    ap.add_argument("--changes",type=int,default=200,help="задач, изменённых в Jira перед инкрементальной синхронизацией (половина закрыта)")
+    ap.add_argument("--latency-ms",type=float,default=2.0,help="fake Jira: задержка на запрос")
+    ap.add_argument("--min-recall",type=float,default=0.9,help="код выхода 1, если LSH находит меньше этой доли пар перебора")
+    ap.add_argument("--seed",type=int,default=1)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_dedup_"))
+    import dedup
+
+    rnd=random.Random(a.seed); words=vocab(a.vocab,rnd)
+    sums=[summary(words,rnd) for _ in range(a.issues)]
+    jira=FakeJira(latency_ms=a.latency_ms,issue_ms=0.0,seed=a.seed); jira.preload(sums); jira.start()
+    args=(jira.base,"bench@example.com","token",jira.project)
+    rows=[]
+
+    t=time.perf_counter(); st=dedup.sync(*args,force=True)
+    rows.append(row("full sync",[(time.perf_counter()-t)*1e6],{"issues":st["issues"],"requests":jira.stats["requests"]}))
+    # свежий процесс: индекс с диска, без запросов к Jira
+    dedup._INDEX["items"].clear()
+    t=time.perf_counter(); ix=dedup.index_for(jira.base,jira.project)
+    rows.append(row("load from disk",[(time.perf_counter()-t)*1e6],{"issues":len(ix),
+                    "lsh_mb":round((ix.bands.nbytes+ix.fkeys.nbytes+ix.frows.nbytes)/2**20,1)}))
+
+    keys=[f"{jira.project}-{i}" for i in rnd.sample(range(1,a.issues+1),a.changes)]
+    for i,k in enumerate(keys): jira.touch(k,summary=summary(words,rnd)) if i%2 else jira.touch(k,done=True)
+    req=jira.stats["requests"]; t=time.perf_counter(); st=dedup.sync(*args,force=True)
+    inc_ok=st["put"]==a.changes//2 and st["dropped"]==a.changes-a.changes//2 and len(ix)==a.issues-st["dropped"]
+    rows.append(row("incremental sync",[(time.perf_counter()-t)*1e6],{"put":st["put"],"dropped":st["dropped"],"requests":jira.stats["requests"]-req}))
+
+    live=[ix.summaries[r] for r in ix.rows.values()]
+    tasks=[perturb(rnd.choice(live),words,rnd) if i%2==0 else summary(words,rnd) for i in range(a.tasks)]
+    us,lsh=timed(lambda s: ix.query(s,k=1000),tasks)
+    rows.append(row("query, LSH",us,{"found":sum(1 for r in lsh if r)}))
+    # перебор: точная оценка с каждой задачей индекса — эталон для полноты LSH
+    items=[(k,ix.toks[r]) for k,r in ix.rows.items()]
+    def brute(s):
+        toks=dedup.tokens(s)
+        return {k for k,tk in items if dedup.jaccard(toks,tk)>=dedup.DUP_THRESHOLD}
+    us,ref=timed(brute,tasks)
+    rows.append(row("query, brute force",us,{"found":sum(1 for r in ref if r)}))
+    pairs=sum(len(r) for r in ref); got=sum(len(r & {x["key"] for x in l}) for r,l in zip(ref,lsh))
+    recall=round(got/pairs,3) if pairs else 1.0
+    jira.stop()
+
+    print(f"{'case':>20} {'n':>5} {'total, s':>9} {'p50, us':>10} {'p95, us':>10}  extra")
+    for r in rows: print(f"{r['case']:>20} {r['n']:>5} {r['total_s']:>9.3f} {r['p50_us']:>10.1f} {r['p95_us']:>10.1f}  "+
+                         json.dumps({k:v for k,v in r.items() if k not in ('case','n','total_s','p50_us','p95_us')}))
+    print(f"полнота LSH относительно перебора: {recall} ({got} из {pairs} пар ≥ {dedup.DUP_THRESHOLD}); "
+          f"инкрементальная синхронизация {'сошлась' if inc_ok else 'НЕ сошлась'} с изменениями в Jira")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows,"recall":recall,"incremental_ok":inc_ok},f,ensure_ascii=False,indent=2)
+    return 0 if recall>=a.min_recall and inc_ok else 1
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# # bench_due: разбор сроков — 10k фраз без кэша vs LRU; сроки задач: скан расшифровки на каждую задачу vs resolve_due_batch
+# # Запуск: python bench/bench_due.py [--phrases 10000] [--distinct 400] [--tasks 50] [--transcript-tokens 20000] [--out bench_due.json]
+import os, sys, json, time, random, argparse, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_llm import synth_transcript
+
+TEMPLATES=["завтра","послезавтра","сегодня","через {n} дней","через {n} дня","через {n} недели","в {wd}","к {wd_d}","by {en}","in {n} days",
+           "{d:02d}.{m:02d}.2026","2026-{m:02d}-{d:02d}","{d} ноября","до конца недели","next {en}","как можно скорее"]
+WD=["понедельник","вторник","среду","четверг","пятницу","субботу","воскресенье"]
+WD_D=["понедельнику","вторнику","среде","четвергу","пятнице","субботе","воскресенью"]
+EN=["monday","tuesday","wednesday","thursday","friday","saturday","sunday"]
+
+# # phrases: n фраз-сроков, выбранных из distinct уникальных (как поле due от LLM по многим встречам)
+def phrases(n:int, distinct:int, rnd:random.Random)->list:
+    pool=set()
+    while len(pool)<distinct:
+        k=rnd.randrange(7)
+        pool.add(rnd.choice(TEMPLATES).format(n=rnd.randint(1,9),wd=WD[k],wd_d=WD_D[k],en=EN[k],d=rnd.randint(1,28),m=rnd.randint(1,12)))
+    pool=sorted(pool)
+    return [rnd.choice(pool) for _ in range(n)]
+
+# # timed: время каждого вызова fn(x), мкс
+def timed(fn, xs:list)->list:
+    out=[]
+    for x in xs:
+        t=time.perf_counter(); fn(x); out.append((time.perf_counter()-t)*1e6)
+    return out
+
+def row(name:str, us:list, extra:dict)->dict:
+    q=statistics.quantiles(us,n=100) if len(us)>1 else us*99
+    return {"case":name,"n":len(us),"total_s":round(sum(us)/1e6,3),"p50_us":round(q[49],1),"p95_us":round(q[94],1),**extra}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--phrases",type=int,default=10000,help="сколько фраз-сроков разобрать")
+    ap.add_argument("--distinct",type=int,default=400,help="из скольких уникальных фраз они выбраны")
+    ap.add_argument("--tasks",type=int,default=50,help="задач на одну расшифровку")
+    ap.add_argument("--transcript-tokens",type=int,default=20000,help="длина расшифровки, ~токенов")
+    ap.add_argument("--seed",type=int,default=1)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    import pipeline as pl
+
+    rnd=random.Random(a.seed); today=pl.due_today()
+    xs=[pl.due_norm(x) for x in phrases(a.phrases,a.distinct,rnd)]
+    rows=[]; tz="Asia/Almaty"
+    pl.parse_due_kz("завтра")   # импорт dateparser и правила — вне замера
+
+    # без кэша: правила + dateparser на каждую фразу (как раньше)
+    cold=pl.due_phrase_cached.__wrapped__
+    ref=[cold(x,today,tz) for x in xs[:a.distinct]]
+    rows.append(row("phrase, no cache",timed(lambda x: cold(x,today,tz),xs),{}))
+    pl.due_phrase_cached.cache_clear()
+    rows.append(row("phrase, LRU",timed(lambda x: pl.parse_due_kz(x,today),xs),{"hit_rate":round(pl.due_cache_info()["phrase"]["hits"]/len(xs),3)}))
+    bad=sum(1 for x,r in zip(xs[:a.distinct],ref) if pl.parse_due_kz(x,today)!=r)
+
+    # сроки задач одной расшифровки: раньше — скан описания вместе со всей расшифровкой на каждую задачу
+    text=synth_transcript(a.transcript_tokens)+" Финальный отчёт сдать через 2 недели."
+    descs=[f"Подготовить отчёт по модулю {i}"+(" к пятнице" if i%3==0 else "") for i in range(a.tasks)]
+    def per_task(_):
+        for d in descs: pl.due_pick(pl.due_scan_text(pl.due_norm(d+" "+text),today)) or today.isoformat()
+    def batch(_):
+        pl.resolve_due_batch([{"due":"","description":d} for d in descs],text,today)
+    reps=[0]*5
+    rows.append(row(f"{a.tasks} tasks, scan per task",timed(per_task,reps),{"transcript_chars":len(text)}))
+    rows.append(row(f"{a.tasks} tasks, batch",timed(batch,reps),{"transcript_chars":len(text)}))
+
+    print(f"{'case':>26} {'n':>6} {'total, s':>9} {'p50, us':>10} {'p95, us':>10}")
+    for r in rows: print(f"{r['case']:>26} {r['n']:>6} {r['total_s']:>9.3f} {r['p50_us']:>10.1f} {r['p95_us']:>10.1f}")
+    print(f"LRU: {json.dumps(pl.due_cache_info()['phrase'])}; расхождений с разбором без кэша: {bad}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows,"mismatches":bad},f,ensure_ascii=False,indent=2)
+    return 1 if bad else 0
+
+if __name__=="__main__":
+    sys.exit(main())
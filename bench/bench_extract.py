@@ -0,0 +1,45 @@
+# # bench_extract: время извлечения задач vs длина расшифровки — single-shot и map-reduce
+# # Запуск: python bench/bench_extract.py [--lengths 1000,4000,16000,48000] [--out bench_extract.json]
+import os, sys, json, time, argparse, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_llm import FakeLLM, synth_transcript
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lengths",default="1000,4000,16000,48000",help="длины расшифровок, ~токенов")
+    ap.add_argument("--token-ms",type=float,default=1.0,help="мс на сгенерированный токен")
+    ap.add_argument("--prompt-ms",type=float,default=0.02,help="мс на входной токен")
+    ap.add_argument("--ctx",type=int,default=16384,help="контекст модели, токенов")
+    ap.add_argument("--parallel",type=int,default=4)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+
+    fake=FakeLLM(token_ms=a.token_ms,prompt_ms=a.prompt_ms,ctx=a.ctx).start()
+    os.environ["LLAMA_URL"]=fake.base+"/v1/chat/completions"
+    os.environ["LLAMA_MODEL"]=fake.model
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    import pipeline as app
+
+    rows=[]
+    print(f"{'tokens':>8} {'mode':>10} {'wall, s':>8} {'norm, s':>8} {'tasks':>6} {'expect':>6}  status")
+    for n in [int(x) for x in a.lengths.split(",") if x.strip()]:
+        text=synth_transcript(n)
+        expect=len(set(m.group(1) for m in __import__("fake_llm").ACTION_RE.finditer(text)))
+        for mode in ("single","mapreduce"):
+            t0=time.perf_counter(); status="ok"; got=0; norm=0.0
+            try:
+                tasks,_=app.llama_extract(text,mode=mode,parallel=a.parallel)
+                wall=time.perf_counter()-t0
+                # normalize_tasks_after_extraction — отдельно: это локальный CPU, не LLM
+                t1=time.perf_counter(); got=len(app.normalize_tasks_after_extraction(tasks,text)); norm=time.perf_counter()-t1
+            except Exception as e:
+                wall=time.perf_counter()-t0
+                status=type(e).__name__+": "+str(e)[:60]
+            rows.append({"tokens":n,"mode":mode,"wall_s":round(wall,3),"normalize_s":round(norm,3),"tasks":got,"expected":expect,"status":status})
+            print(f"{n:>8} {mode:>10} {wall:>8.2f} {norm:>8.2f} {got:>6} {expect:>6}  {status}")
+    fake.stop()
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows},f,ensure_ascii=False,indent=2)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,79 @@
+# # bench_incremental: повторное извлечение после правки текста — всё заново (llama_extract) vs только изменённые блоки
+# # (llama_extract_blocks). Правки: одно слово, новая задача в одном месте, в трёх местах, ~10% предложений. Для каждой —
+# # блоков отправлено, время, токены запросов/ответов (по счётчикам fake LLM), сколько задач сохранили правку пользователя.
+# # Кэш ответов LLM перед каждым прогоном новый — иначе неизменённые окна полного извлечения брались бы из него.
+# # Запуск: python bench/bench_incremental.py [--tokens 16000] [--block 800] [--out bench_incremental.json]
+import os, sys, json, time, argparse, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm import FakeLLM, synth_transcript, ACTION_RE
+
+MARK="правка пользователя"
+
+# # edit: k мест, равномерно по тексту; word — слово в предложении без задачи, task — новая задача, sentence — переписать предложение
+def edit(text:str, k:int, how:str)->str:
+    sents=text.split(". "); free=[i for i,s in enumerate(sents) if "Задача" not in s]
+    for j,i in enumerate(free[len(free)//(2*k)::max(1,len(free)//k)][:k]):
+        if how=="word": sents[i]=sents[i].replace("вопросов","замечаний",1)
+        elif how=="task": sents[i]+=f". Задача {1000+j}: заказать оборудование для отдела {j} и отправить его команде"
+        else: sents[i]=f"Решили перенести обсуждение направления {i} на следующую неделю"
+    return ". ".join(sents)
+
+# # run: fn() на новом кэше LLM → (результат, время, токены запроса, токены ответа, запросов)
+def run(fake, fn)->tuple:
+    import pipeline as pl
+    pl.CACHE_DIR=tempfile.mkdtemp(prefix="bench_inc_llm_")
+    s0=dict(fake.stats); t=time.perf_counter(); res=fn(); wall=time.perf_counter()-t
+    return res,wall,fake.stats["prompt_tokens"]-s0["prompt_tokens"],fake.stats["completion_tokens"]-s0["completion_tokens"],fake.stats["requests"]-s0["requests"]
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--tokens",type=int,default=16000,help="длина расшифровки, ~токенов")
+    ap.add_argument("--block",type=int,default=800,help="EXTRACT_BLOCK_TOKENS")
+    ap.add_argument("--token-ms",type=float,default=1.0,help="fake LLM: мс на сгенерированный токен")
+    ap.add_argument("--prompt-ms",type=float,default=0.02,help="fake LLM: мс на входной токен")
+    ap.add_argument("--parallel",type=int,default=4)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    fake=FakeLLM(token_ms=a.token_ms,prompt_ms=a.prompt_ms).start()
+    os.environ["LLAMA_URL"]=fake.base+"/v1/chat/completions"; os.environ["LLAMA_MODEL"]=fake.model
+    os.environ["EXTRACT_BLOCK_TOKENS"]=str(a.block)
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    import pipeline as pl
+
+    text=synth_transcript(a.tokens)
+    expect=len({m.group(1) for m in ACTION_RE.finditer(text)})
+    tasks,wf,pf,cf,rf=run(fake,lambda: pl.llama_extract(text,parallel=a.parallel)[0])
+    info={}; _,wi,pi,ci,ri=run(fake,lambda: list(pl.llama_extract_blocks(text,parallel=a.parallel,info=info)))
+    base=info["tasks"]; blocks=info["blocks"]
+    # первое извлечение: блоки мельче окон map-reduce — запросов больше, промпт повторяется в каждом
+    rows=[{"edit":"first","mode":"full","blocks":"","wall_s":round(wf,3),"prompt_tokens":pf,"completion_tokens":cf,"requests":rf,
+           "tasks":len(tasks),"expected":expect,"kept_edits":0},
+          {"edit":"first","mode":"incremental","blocks":f"{info['sent']}/{info['total']}","wall_s":round(wi,3),"prompt_tokens":pi,
+           "completion_tokens":ci,"requests":ri,"tasks":len(base),"expected":expect,"kept_edits":0}]
+    for t in base: t["comment"]=MARK   # пользователь поправил каждую задачу
+    for name,k,how in (("1 word",1,"word"),("1 new task",1,"task"),("3 new tasks",3,"task"),("10% sentences",max(1,len(text.split(". "))//10),"sentence")):
+        new=edit(text,k,how)
+        expect=len({m.group(1) for m in ACTION_RE.finditer(new)})
+        tasks,wf,pf,cf,rf=run(fake,lambda: pl.llama_extract(new,parallel=a.parallel)[0])
+        rows.append({"edit":name,"mode":"full","blocks":"","wall_s":round(wf,3),"prompt_tokens":pf,"completion_tokens":cf,"requests":rf,
+                     "tasks":len(tasks),"expected":expect,"kept_edits":0})
+        prev=[dict(t) for t in base]; inc={}
+        _,wi,pi,ci,ri=run(fake,lambda: list(pl.llama_extract_blocks(new,prev,blocks,parallel=a.parallel,info=inc)))
+        rows.append({"edit":name,"mode":"incremental","blocks":f"{inc['sent']}/{inc['total']}","wall_s":round(wi,3),"prompt_tokens":pi,
+                     "completion_tokens":ci,"requests":ri,"tasks":len(inc["tasks"]),"expected":expect,
+                     "kept_edits":sum(1 for t in inc["tasks"] if t.get("comment")==MARK)})
+    fake.stop()
+
+    print(f"{'edit':>14} {'mode':>12} {'blocks':>7} {'wall, s':>8} {'prompt tok':>11} {'compl tok':>10} {'req':>4} {'tasks':>6} {'expect':>7} {'kept edits':>11}")
+    for r in rows:
+        print(f"{r['edit']:>14} {r['mode']:>12} {r['blocks']:>7} {r['wall_s']:>8.2f} {r['prompt_tokens']:>11} {r['completion_tokens']:>10} "
+              f"{r['requests']:>4} {r['tasks']:>6} {r['expected']:>7} {r['kept_edits']:>11}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows},f,ensure_ascii=False,indent=2)
+    # инкрементально — те же задачи, что и при полном извлечении, и правки пользователя в неизменённых блоках на месте
+    bad=[r["edit"] for r in rows if r["mode"]=="incremental" and (r["tasks"]!=r["expected"] or (r["edit"]!="first" and not r["kept_edits"]))]
+    return 1 if bad else 0
+
+if __name__=="__main__":
+    sys.exit(main())
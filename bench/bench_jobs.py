@@ -0,0 +1,73 @@
+# # bench_jobs: фоновая очередь распознавания — одна длинная запись одного пользователя и короткие от других, отправленные следом.
+# # fifo (запись целиком, JOBS_SLICE_S=0) vs fair (куски по --slice-s, владельцы по очереди): сколько ждут короткие,
+# # сколько длинная, пик одновременных распознаваний на устройство (не больше --slots) и что результаты читаются с диска.
+# # Whisper — bench/fake_whisper.py в процессах-воркерах (время ∝ длине записи: --seg-ms на каждые 3 с аудио).
+# # Запуск: python bench/bench_jobs.py [--long-s 2400] [--short-s 60] [--shorts 3] [--slots cpu=1] [--out bench_jobs.json]
+import os, sys, json, time, wave, argparse, tempfile, functools, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# # synth: WAV sec секунд — тон с паузой 1 с каждые 20 с (куски режутся по паузам, как в живой речи)
+def synth(path:str, sec:float, hz:float)->str:
+    import numpy as np
+    t=np.arange(int(sec*16000))/16000.0
+    x=0.2*np.sin(2*np.pi*hz*t)*((t%20)<19)
+    with wave.open(path,"wb") as w: w.setnchannels(1); w.setsampwidth(2); w.setframerate(16000); w.writeframes((x*32767).astype("<i2").tobytes())
+    return path
+
+# # scenario: длинная запись (владелец big), через --gap-s короткие (владельцы u1..uN); время до готовности каждого задания
+def scenario(name:str, slice_s:float, a, d:str, k:int)->dict:
+    import jobs
+    from fake_whisper import fake_model
+    q=jobs.JobQueue(jobs.slots(a.slots),functools.partial(fake_model,seg_s=a.seg_ms/1000.0),slice_s=slice_s,root=os.path.join(d,name))
+    # пул прогрет: модели в процессах загружены (иначе первая запись платит за старт процессов)
+    w=q.submit(synth(os.path.join(d,f"{name}_warm.wav"),6,100+k),owner="warm",clean=False)
+    while q.get(w)["status"] in jobs.ACTIVE: time.sleep(0.02)
+    t0=time.perf_counter()
+    ids={"big":q.submit(synth(os.path.join(d,f"{name}_long.wav"),a.long_s,200+k),owner="big",clean=False)}
+    time.sleep(a.gap_s)
+    for i in range(a.shorts): ids[f"u{i+1}"]=q.submit(synth(os.path.join(d,f"{name}_s{i}.wav"),a.short_s,300+10*i+k),owner=f"u{i+1}",clean=False)
+    done={}
+    while len(done)<len(ids):
+        for o,jid in ids.items():
+            if o not in done and q.get(jid)["status"] not in jobs.ACTIVE: done[o]=time.perf_counter()-t0
+        time.sleep(0.02)
+    st=q.stats()
+    # как после обновления страницы / перезапуска: только диск
+    disk=[jobs._load(jobs._path(q.root,jid,".json")) for jid in ids.values()]
+    res=[jobs.job_result(jid,q.root) for jid in ids.values()]
+    ok=all(x and x["status"]=="done" for x in disk) and all(r and r["segments"] for r in res)
+    segs=[len(r["segments"]) for r in res if r]
+    shorts=[v for o,v in done.items() if o!="big"]
+    return {"mode":name,"slice_s":slice_s,"long_s":round(done["big"],2),"short_p50_s":round(statistics.median(shorts),2) if shorts else 0.0,
+            "short_max_s":round(max(shorts),2) if shorts else 0.0,"wall_s":round(max(done.values()),2),"segments":segs,
+            "peak":st["peak"],"slots":st["devices"],"disk_ok":ok}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--long-s",type=float,default=2400,help="длинная запись, сек аудио")
+    ap.add_argument("--short-s",type=float,default=60,help="короткие записи, сек аудио")
+    ap.add_argument("--shorts",type=int,default=3,help="коротких записей (каждая — свой пользователь)")
+    ap.add_argument("--gap-s",type=float,default=0.5,help="короткие отправляются через N с после длинной")
+    ap.add_argument("--slice-s",type=float,default=300,help="кусок в режиме fair, сек аудио")
+    ap.add_argument("--slots",default="cpu=1",help="процессов Whisper на устройство (JOBS_SLOTS)")
+    ap.add_argument("--seg-ms",type=float,default=50,help="fake Whisper: мс на сегмент (3 с аудио)")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    d=tempfile.mkdtemp(prefix="bench_jobs_")
+    os.environ.setdefault("APP_CACHE_DIR",d)
+    rows=[scenario("fifo",0,a,d,0),scenario("fair",a.slice_s,a,d,1)]
+
+    print(f"{'mode':>5} {'slice, s':>9} {'long, s':>8} {'short p50, s':>13} {'short max, s':>13} {'wall, s':>8}  peak/slots  disk")
+    for r in rows:
+        print(f"{r['mode']:>5} {r['slice_s']:>9.0f} {r['long_s']:>8.2f} {r['short_p50_s']:>13.2f} {r['short_max_s']:>13.2f} {r['wall_s']:>8.2f}  "
+              f"{r['peak']}/{r['slots']}  {r['disk_ok']}")
+    bad=[r["mode"] for r in rows if not r["disk_ok"] or any(r["peak"].get(k,0)>v for k,v in r["slots"].items())]
+    # fake-сегменты не привязаны к звуку: на каждом стыке кусков допускаем расхождение на один сегмент
+    if abs(rows[0]["segments"][0]-rows[1]["segments"][0])>int(a.long_s//a.slice_s)+1: bad.append("segments")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows},f,ensure_ascii=False,indent=2)
+    return 1 if bad else 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+# # bench_llm_pool: пул серверов LLM на пакете окон правки (как llama_clean длинной записи) — один сервер vs пул
+# # (без хеджа и с хеджем). Серверы — bench/fake_llm.py: healthy, tail (доля ответов на --tail-ms дольше),
+# # cold (каждый запрос висит --hang-s), down (порт закрыт), r429 (доля --rate-429 ответов 429 с Retry-After). Один сервер
+# # r429 — как по умолчанию с LLAMA_BASE: запросы ждут конца паузы и повторяются, а не падают с LLMDown. Доля успешных, p50/p95/p99 запроса, время пакета,
+# # сколько запросов получил каждый сервер, хеджи и срабатывания предохранителя. Кэш ответов: пакет, уже отвеченный сервером
+# # с моделью A, на другом сервере с моделью A берётся из кэша, на сервере с моделью B — спрашивается заново.
+# # Запуск: python bench/bench_llm_pool.py [--windows 60] [--tail-rate 0.1] [--hang-s 20] [--rate-429 0.1] [--out bench_llm_pool.json]
+import os, sys, json, time, socket, argparse, tempfile, statistics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm import FakeLLM, synth_transcript
+
+# # closed_port: адрес, на котором никто не слушает (сервер «лежит»)
+def closed_port()->str:
+    s=socket.socket(); s.bind(("127.0.0.1",0)); port=s.getsockname()[1]; s.close()
+    return f"http://127.0.0.1:{port}"
+
+# # scenario: окна через llama_ask (мимо кэша) при --parallel на сервер; время каждого запроса и итог по серверам
+def scenario(name:str, bases:dict, hedge:bool, wins:list, a)->dict:
+    import pipeline as pl
+    pl.LLAMA_HEDGE=hedge
+    pool=pl.LLMPool([{"base":b,"url":"","model":"","key":""} for b in bases.values()])
+    pl._LLM["pool"]=pool
+    from concurrent.futures import ThreadPoolExecutor
+    def one(w):
+        msgs=[{"role":"system","content":"Ты редактор текста."},{"role":"user","content":w}]
+        t=time.perf_counter()
+        try: pl.llama_ask(msgs,max_tokens=pl.approx_tokens(w)*2+64,cache=False); return time.perf_counter()-t,None
+        except Exception as e: return time.perf_counter()-t,e
+    t0=time.perf_counter()
+    with ThreadPoolExecutor(max_workers=pl.llm_parallel()) as ex: res=list(ex.map(one,wins))
+    wall=time.perf_counter()-t0
+    ok=[d for d,e in res if e is None]
+    q=statistics.quantiles(ok,n=100) if len(ok)>1 else ok*99 or [0.0]*99
+    st=pool.stats(); names={pl.urlsplit(b).netloc:k for k,b in bases.items()}
+    pool.ex.shutdown(wait=False)
+    return {"case":name,"requests":len(res),"ok":len(ok),"success":round(len(ok)/len(res),3),"wall_s":round(wall,2),
+            "p50_s":round(q[49],2),"p95_s":round(q[94],2),"p99_s":round(q[98],2),"hedges":st["hedges"],
+            "split":{names[e["endpoint"]]:e["ok"] for e in st["endpoints"]},
+            "breaker":{names[e["endpoint"]]:e["opened"] for e in st["endpoints"] if e["opened"]},
+            "error":next((f"{type(e).__name__}: {e}" for _,e in res if e is not None),"")}
+
+# # cache_reuse: пакет с кэшем через сервер first, затем через пул servers → сколько запросов дошло до servers; должно быть
+# # столько, сколько ответов пришло от модели не как у first (из кэша берутся только ответы той же модели)
+def cache_reuse(name:str, first, servers:list, wins:list)->dict:
+    import pipeline as pl
+    pl.CACHE_DIR=tempfile.mkdtemp(prefix="bench_llm_pool_cache_")
+    for srvs in ([first],servers):
+        pool=pl.LLMPool([{"base":s.base,"url":"","model":"","key":""} for s in srvs]); pl._LLM["pool"]=pool
+        for e in pool.eps: e.config()
+        n0=sum(s.stats["requests"] for s in srvs)
+        models=[pl.llama_ask([{"role":"user","content":w}],max_tokens=pl.approx_tokens(w)*2+64)[1]["model"] for w in wins]
+        sent=sum(s.stats["requests"] for s in srvs)-n0; pool.ex.shutdown(wait=False)
+    expect=sum(1 for m in models if m!=first.model)
+    return {"case":name,"requests":len(wins),"sent":sent,"expect":expect,"models":{m:models.count(m) for m in sorted(set(models))},
+            "ok":sent==expect}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--windows",type=int,default=60,help="окон в пакете (запросов к LLM)")
+    ap.add_argument("--parallel",type=int,default=4,help="LLAMA_PARALLEL — одновременных запросов на сервер")
+    ap.add_argument("--token-ms",type=float,default=0.5,help="fake LLM: мс на сгенерированный токен")
+    ap.add_argument("--slots",type=int,default=4,help="fake LLM: одновременных генераций на сервер")
+    ap.add_argument("--tail-rate",type=float,default=0.1,help="сервер tail: доля медленных ответов")
+    ap.add_argument("--tail-ms",type=float,default=4000,help="сервер tail: на сколько дольше медленный ответ")
+    ap.add_argument("--hang-s",type=float,default=20,help="сервер cold: сколько висит каждый запрос")
+    ap.add_argument("--rate-429",type=float,default=0.1,help="сервер r429: доля ответов 429")
+    ap.add_argument("--retry-after",type=float,default=1.0,help="сервер r429: Retry-After, сек")
+    ap.add_argument("--seed",type=int,default=1)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_llm_pool_"))
+    os.environ["LLAMA_PARALLEL"]=str(a.parallel)
+    import pipeline as pl
+
+    mk=lambda **kw: FakeLLM(token_ms=a.token_ms,slots=a.slots,seed=a.seed,**kw).start()
+    srv={"healthy":mk(),"tail":mk(tail_rate=a.tail_rate,tail_ms=a.tail_ms),"cold":mk(hang_s=a.hang_s)}
+    r429=mk(rate_429=a.rate_429,retry_after=a.retry_after)
+    bases={k:s.base for k,s in srv.items()}; bases["down"]=closed_port()
+    wins=[b for _,b in pl.token_windows(pl.split_units(synth_transcript(a.windows*pl.CLEAN_CHUNK_TOKENS)))][:a.windows]
+    rows=[scenario("single (tail)",{"tail":bases["tail"]},True,wins,a),
+          scenario("single (429)",{"r429":r429.base},True,wins,a),
+          scenario("pool, no hedge",bases,False,wins,a),
+          scenario("pool",bases,True,wins,a)]
+    a1,a2,b1=mk(model="model-a"),mk(model="model-a"),mk(model="model-b"); few=wins[:10]
+    cache=[cache_reuse("same model",a1,[a2],few),cache_reuse("other model",a1,[b1],few),cache_reuse("mixed pool",a1,[a2,b1],few)]
+    for s in [*srv.values(),r429,a1,a2,b1]: s.stop()
+
+    print(f"{'case':>15} {'ok':>7} {'wall, s':>8} {'p50, s':>7} {'p95, s':>7} {'p99, s':>7} {'hedges':>7}  split / breaker")
+    for r in rows:
+        print(f"{r['case']:>15} {r['ok']:>3}/{r['requests']:<3} {r['wall_s']:>8.2f} {r['p50_s']:>7.2f} {r['p95_s']:>7.2f} {r['p99_s']:>7.2f} "
+              f"{r['hedges']:>7}  {json.dumps(r['split'])} {json.dumps(r['breaker'])}")
+        if r["error"]: print(f"{'':>15} {r['error']}")
+    print(f"\n{'cache':>15} {'sent':>7} {'expect':>7}  answers by model")
+    for r in cache:
+        print(f"{r['case']:>15} {r['sent']:>3}/{r['requests']:<3} {r['expect']:>7}  {json.dumps(r['models'])}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows,"cache":cache},f,ensure_ascii=False,indent=2)
+    return 0 if all(r["success"]==1.0 for r in rows) and all(r["ok"] for r in cache) else 1
+
+if __name__=="__main__":
+    sys.exit(main())
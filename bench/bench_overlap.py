@@ -0,0 +1,62 @@
+# # bench_overlap: пакет файлов последовательно (по файлу целиком) vs конвейером stages.Pipeline
+# # Запуск: python bench/bench_overlap.py [--files 4 --tokens 4000 --seg-ms 30] [--out bench_overlap.json]
+import os, sys, json, time, wave, argparse, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_llm import FakeLLM
+from fake_whisper import FakeWhisper
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--files",type=int,default=4,help="файлов в пакете")
+    ap.add_argument("--tokens",type=int,default=4000,help="~токенов расшифровки на файл")
+    ap.add_argument("--seg-ms",type=float,default=30.0,help="мс Whisper на сегмент")
+    ap.add_argument("--token-ms",type=float,default=1.0,help="мс LLM на сгенерированный токен")
+    ap.add_argument("--prompt-ms",type=float,default=0.02,help="мс LLM на входной токен")
+    ap.add_argument("--llm-workers",type=int,default=2)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+
+    fake=FakeLLM(token_ms=a.token_ms,prompt_ms=a.prompt_ms).start()
+    os.environ["LLAMA_URL"]=fake.base+"/v1/chat/completions"
+    os.environ["LLAMA_MODEL"]=fake.model
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    import pipeline as pl
+    import stages
+    pl.load_whisper=lambda size="": FakeWhisper(a.seg_ms/1000.0,a.tokens)
+
+    tmp=tempfile.mkdtemp(prefix="bench_media_"); files=[]
+    for i in range(a.files):
+        p=os.path.join(tmp,f"m{i}.wav")
+        with wave.open(p,"wb") as w:   # 0.1 с шума: разное содержимое → разные ключи кэша
+            w.setnchannels(1); w.setsampwidth(2); w.setframerate(16000); w.writeframes(os.urandom(3200))
+        files.append(p)
+    cache=os.path.join(pl.CACHE_DIR,"transcripts")
+    def drop_cache():
+        for x in os.listdir(cache) if os.path.isdir(cache) else []: os.unlink(os.path.join(cache,x))
+
+    # последовательно: расшифровка целиком → правка → извлечение, файл за файлом
+    drop_cache(); t0=time.perf_counter(); n_serial=0
+    for p in files:
+        res,_=pl.transcribe_path_cached(p,"auto"); parts=[x["text"] for x in res["segments"]]
+        text,_=pl.llama_clean("".join(parts),parts,parallel=a.llm_workers,refresh=True)
+        tasks,_=pl.llama_extract(text,parallel=a.llm_workers,refresh=True)
+        n_serial+=len(pl.normalize_tasks_after_extraction(tasks,text))
+    serial=time.perf_counter()-t0
+
+    drop_cache(); t0=time.perf_counter()
+    jobs,rep=stages.run_files(files,refresh=True,transcribe_workers=1,llm_workers=a.llm_workers)
+    piped=time.perf_counter()-t0
+    n_piped=sum(len(j.tasks) for j in jobs)
+    fake.stop()
+
+    print(f"{'mode':>10} {'wall, s':>8} {'tasks':>6}")
+    print(f"{'serial':>10} {serial:>8.2f} {n_serial:>6}")
+    print(f"{'pipelined':>10} {piped:>8.2f} {n_piped:>6}")
+    print(f"ускорение: {serial/max(piped,1e-9):.2f}x; этапы одновременно: {rep['stages_overlap_s']} с; занятость этапов, с: {json.dumps(rep['busy_s'])}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f:
+            json.dump({"params":vars(a),"serial_s":round(serial,3),"pipelined_s":round(piped,3),
+                       "tasks":{"serial":n_serial,"pipelined":n_piped},"report":rep},f,ensure_ascii=False,indent=2)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,81 @@
+# # bench_rerun: цена правки в списке задач в зависимости от числа задач — время rerun после правки одной задачи,
+# # число элементов и объём отрисовки (сумма protobuf элементов). --before REV — то же для app.py из ревизии REV (было/стало).
+# # В новой таблице правка перезапускает только fragment: его время — спан ui_tasks (AppTest всегда гоняет скрипт целиком).
+# # Запуск: python bench/bench_rerun.py [--counts 10,50,100,200] [--reps 3] [--before a593b73] [--out bench_rerun.json]
+import os, sys, json, time, argparse, statistics, subprocess
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+# # walk: все узлы дерева AppTest
+def walk(n):
+    yield n
+    for c in getattr(n,"children",{}).values(): yield from walk(c)
+
+# # payload: (элементов, байт protobuf) — то, что уходит в браузер за один rerun
+def payload(at)->tuple:
+    els=[n for n in walk(at._tree) if not getattr(n,"children",None) and getattr(n,"proto",None) is not None]
+    return len(els),sum(n.proto.ByteSize() for n in els)
+
+# # edit_grid: правка ячейки data_editor так, как её присылает браузер (JSON-состояние виджета)
+def edit_grid(at, value:str):
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+    df=[n for n in walk(at.main) if type(n).__name__=="Dataframe" and n.proto.editing_mode][0]   # не таблица истории
+    orig=at._tree.get_widget_states
+    def states():
+        ws=orig(); w=WidgetState(); w.id=df.proto.id
+        w.string_value=json.dumps({"edited_rows":{"0":{"summary":value}},"added_rows":[],"deleted_rows":[]}); ws.widgets.append(w)
+        return ws
+    at._tree.get_widget_states=states
+
+# # measure: app с n задачами — reps правок темы первой задачи, время каждого rerun
+def measure(path:str, n:int, reps:int)->dict:
+    import metrics
+    from streamlit.testing.v1 import AppTest
+    at=AppTest.from_file(path,default_timeout=300); at.run()
+    at.session_state["tasks"]=[{"id":f"t{i:04d}","summary":f"Задача {i}: подготовить отчёт по продажам","description":"Описание задачи "*4,
+                                "labels":"отчёт","due":"","comment":"","priority":"Medium"} for i in range(n)]
+    at.run()
+    grid=any(type(x).__name__=="Dataframe" and x.proto.editing_mode for x in walk(at.main))
+    metrics._M["spans"].clear(); ts=[]
+    for r in range(reps):
+        if grid: edit_grid(at,f"правка {r}")
+        else: at.text_input(key="s_t0000").set_value(f"правка {r}")
+        t=time.perf_counter(); at.run(); ts.append(time.perf_counter()-t)
+    ok=not at.exception and at.session_state["tasks"][0]["summary"]==f"правка {reps-1}"
+    els,size=payload(at)
+    sp=metrics._M["spans"].get(metrics._key("ui_tasks",{}),{})
+    return {"tasks":n,"rerun_ms":round(statistics.median(ts)*1000,1),
+            "fragment_ms":round(sp["sum"]/sp["count"]*1000,1) if sp.get("count") else None,
+            "elements":els,"payload_kb":round(size/1024,1),"ok":ok}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--counts",default="10,50,100,200",help="число задач в списке, через запятую")
+    ap.add_argument("--reps",type=int,default=3,help="правок на замер (берём медиану)")
+    ap.add_argument("--before",default="",help="git-ревизия app.py «до» для сравнения (например, a593b73)")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    counts=[int(x) for x in a.counts.split(",") if x.strip()]
+    apps=[("после",os.path.join(ROOT,"app.py"))]
+    tmp=os.path.join(ROOT,"_bench_app_before.py")
+    if a.before:
+        src=subprocess.run(["git","show",f"{a.before}:app.py"],cwd=ROOT,capture_output=True,text=True,check=True).stdout
+        with open(tmp,"w",encoding="utf-8") as f: f.write(src)
+        apps.insert(0,("до",tmp))
+    rows=[]
+    try:
+        for name,path in apps:
+            for n in counts: rows.append({"app":name,**measure(path,n,a.reps)})
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+
+    print(f"{'app':>6} {'tasks':>6} {'rerun, ms':>10} {'fragment, ms':>13} {'elements':>9} {'payload, KB':>12}  ok")
+    for r in rows:
+        fr=f"{r['fragment_ms']:.1f}" if r["fragment_ms"] is not None else "—"
+        print(f"{r['app']:>6} {r['tasks']:>6} {r['rerun_ms']:>10.1f} {fr:>13} {r['elements']:>9} {r['payload_kb']:>12.1f}  {r['ok']}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows},f,ensure_ascii=False,indent=2)
+    return 0 if all(r["ok"] for r in rows) else 1
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+# # bench_schema: извлечение задач до/после JSON-схемы и адаптивного max_tokens. pipeline.py из ревизии --before (по умолчанию
+# # HEAD) и из рабочего дерева прогоняются на одном fake LLM: сервер со схемой (response_format) и без неё; в ответах без схемы
+# # доля --prose обёрнута в текст и ```json. Для каждой длины и режима — сколько прогонов упали на разборе (JSONDecodeError/
+# # ValueError или окно map-reduce «failed»), задач найдено из ожидаемых, токенов ответа на задачу, max_tokens на запрос, догрузок.
+# # Запуск: python bench/bench_schema.py [--tokens 300,1500,3000,6000,12000] [--reps 3] [--prose 0.3] [--before HEAD] [--out bench_schema.json]
+import os, sys, json, argparse, tempfile, subprocess, importlib.util
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm import FakeLLM, synth_transcript, ACTION_RE
+
+# # load: модуль pipeline из файла path под именем name
+def load(name:str, path:str):
+    spec=importlib.util.spec_from_file_location(name,path); mod=importlib.util.module_from_spec(spec); spec.loader.exec_module(mod)
+    return mod
+
+# # run: reps прогонов llama_extract на fake → строка таблицы
+def run(pl, fake, text:str, mode:str, reps:int)->dict:
+    import metrics
+    expect=len({m.group(1) for m in ACTION_RE.finditer(text)})
+    pl._LLM["pool"]=pl.LLMPool([{"base":"","url":fake.base+"/v1/chat/completions","model":fake.model,"key":""}])
+    cont=lambda: sum(metrics.counters("app_llm_continue_total").values())
+    s0=dict(fake.stats); c0=cont()
+    fails=0; found=0; windows=0; failed_windows=0
+    for _ in range(reps):
+        pl.CACHE_DIR=tempfile.mkdtemp(prefix="bench_schema_llm_")
+        try: tasks,meta=pl.llama_extract(text,mode=mode)
+        except (ValueError,RuntimeError) as e:
+            fails+=1; failed_windows+=1; windows+=1; print(f"  {pl.__name__} {mode}: {type(e).__name__}: {str(e)[:80]}",file=sys.stderr); continue
+        k=int(meta.get("failed") or 0); windows+=int(meta.get("chunks") or 1); failed_windows+=k
+        if k: fails+=1
+        else: found+=len(tasks)
+    d={k:fake.stats[k]-s0[k] for k in ("requests","completion_tokens","max_tokens","schema_requests","prose")}
+    return {"mode":mode,"expected":expect,"reps":reps,"failed_runs":fails,"failed_windows":f"{failed_windows}/{windows}",
+            "tasks_avg":round(found/(reps-fails),1) if reps>fails else 0,
+            "completion_per_task":round(d["completion_tokens"]/found,1) if found else None,"max_tokens_per_req":round(d["max_tokens"]/max(1,d["requests"])),
+            "requests":d["requests"],"schema_requests":d["schema_requests"],"prose":d["prose"],
+            "continued":int(cont()-c0)}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--tokens",default="300,1500,3000,6000,12000",help="длины расшифровок, ~токенов")
+    ap.add_argument("--modes",default="single,auto",help="режимы llama_extract")
+    ap.add_argument("--reps",type=int,default=3)
+    ap.add_argument("--prose",type=float,default=0.3,help="доля ответов без схемы с текстом вокруг JSON")
+    ap.add_argument("--token-ms",type=float,default=0.05,help="fake LLM: мс на сгенерированный токен")
+    ap.add_argument("--before",default="HEAD",help="git-ревизия pipeline.py «до»")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    tmp=os.path.join(tempfile.mkdtemp(prefix="bench_schema_"),"pipeline_before.py")
+    src=subprocess.run(["git","show",f"{a.before}:pipeline.py"],cwd=ROOT,capture_output=True,text=True,check=True).stdout
+    with open(tmp,"w",encoding="utf-8") as f: f.write(src)
+    versions=[("до",load("pipeline_before",tmp)),("после",load("pipeline",os.path.join(ROOT,"pipeline.py")))]
+    rows=[]
+    for server in ("schema","no schema"):
+        for name,pl in versions:
+            fake=FakeLLM(token_ms=a.token_ms,schema=server=="schema",prose_rate=a.prose).start()
+            for n in [int(x) for x in a.tokens.split(",") if x.strip()]:
+                text=synth_transcript(n)
+                for mode in [m.strip() for m in a.modes.split(",") if m.strip()]:
+                    rows.append({"server":server,"pipeline":name,"tokens":n,**run(pl,fake,text,mode,a.reps)})
+            fake.stop()
+
+    print(f"{'server':>9} {'pipeline':>8} {'tokens':>6} {'mode':>6} {'failed':>6} {'fail win':>8} {'tasks':>6} {'expect':>6} "
+          f"{'compl/task':>10} {'max_tok/req':>11} {'req':>4} {'schema':>6} {'prose':>5} {'cont':>4}")
+    for r in rows:
+        print(f"{r['server']:>9} {r['pipeline']:>8} {r['tokens']:>6} {r['mode']:>6} {r['failed_runs']:>6} {r['failed_windows']:>8} "
+              f"{r['tasks_avg']:>6} {r['expected']:>6} {str(r['completion_per_task'] or '—'):>10} {r['max_tokens_per_req']:>11} {r['requests']:>4} "
+              f"{r['schema_requests']:>6} {r['prose']:>5} {r['continued']:>4}")
+    for name in ("до","после"):
+        rs=[r for r in rows if r["pipeline"]==name]
+        print(f"{name}: упало прогонов {sum(r['failed_runs'] for r in rs)} из {sum(r['reps'] for r in rs)}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"results":rows},f,ensure_ascii=False,indent=2)
+    # после — ни одного упавшего прогона и все задачи найдены
+    bad=[r for r in rows if r["pipeline"]=="после" and (r["failed_runs"] or r["tasks_avg"]!=r["expected"])]
+    return 1 if bad else 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# # bench_shards: одна длинная запись на CPU — один процесс vs шарды по паузам на пуле процессов
+# # Проверяет и скорость, и что склеенный текст совпадает с обычным прогоном (--min-similarity; ниже — код выхода 1).
+# # --fake N — без записи и без скачивания модели: синтетическая запись на N сек из тонов и ToneWhisper (bench/fake_whisper.py)
+# # в процессах-шардах; разрез, сдвиг таймкодов и склейка shard_bounds/transcribe_sharded/merge_shard_segments обязаны дать
+# # те же сегменты (текст и таймкоды), что и один прогон модели по всей записи.
+# # Запуск: python bench/bench_shards.py --audio meeting.mp3 --shards 2,4 [--size small] [--out bench_shards.json]
+# #         python bench/bench_shards.py --fake 900 --shards 2,4
+import os, sys, json, time, difflib, argparse, tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# # similarity: доля совпадающих слов двух расшифровок (difflib по словам, без регистра)
+def similarity(a:str, b:str)->float:
+    wa=a.lower().split(); wb=b.lower().split()
+    return difflib.SequenceMatcher(None,wa,wb,autojunk=False).ratio() if (wa or wb) else 1.0
+
+# # run: распознать запись с заданным числом шардов (1 — обычный путь; model — вместо whisper_runner) → (сек, сегменты, info)
+def run(pl, audio, lang:str, n:int, model=None):
+    info={}
+    t0=time.perf_counter()
+    if n>1: segs=list(pl.transcribe_sharded(audio,lang,pl.WHISPER_SIZE,n,info))
+    else:
+        if model is None: model,_=pl.whisper_runner(pl.WHISPER_SIZE)
+        kw={"beam_size":pl.WHISPER_BEAM}
+        if lang and lang!="auto": kw["language"]=lang
+        it,_=model.transcribe(audio,vad_filter=True,vad_parameters=dict(pl.VAD_PARAMS),**kw)
+        segs=[{"start":round(s.start,2),"end":round(s.end,2),"text":s.text} for s in it]
+    return time.perf_counter()-t0, segs, info
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--audio",default="",help="длинная запись (лучше 30+ минут)")
+    ap.add_argument("--fake",type=float,default=0,help="вместо --audio: синтетическая запись на N сек и ToneWhisper")
+    ap.add_argument("--shards",default="2,4",help="число процессов через запятую")
+    ap.add_argument("--size",default="",help="модель Whisper (по умолчанию WHISPER_SIZE)")
+    ap.add_argument("--lang",default="ru")
+    ap.add_argument("--min-similarity",type=float,default=0.97,help="минимальное совпадение слов с одним процессом")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    if not a.audio and not a.fake: ap.error("нужен --audio или --fake")
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    os.environ["WHISPER_DEVICE"]="cpu"; os.environ.setdefault("WHISPER_COMPUTE","int8")
+    import pipeline as pl
+    if a.size: pl.WHISPER_SIZE=a.size
+    shards=[int(x) for x in a.shards.split(",") if x.strip()]; model=None
+    if a.fake:
+        from fake_whisper import ToneWhisper, tone_audio, tone_init
+        audio,_=tone_audio(a.fake); model=ToneWhisper()
+        # пулы шардов с ToneWhisper вместо WhisperModel — под тем же ключом, под которым их ищет shard_pool
+        for n in shards:
+            pl._SHARD_POOLS["pools"][f"{pl.WHISPER_SIZE}|{pl.compute_type()}|{n}"]=ProcessPoolExecutor(
+                max_workers=n,mp_context=mp.get_context("spawn"),initializer=tone_init)
+    else:
+        audio=pl.decode_pcm(a.audio)
+    dur=len(audio)/pl.SAMPLE_RATE
+    print(f"запись: {dur/60:.1f} мин, CPU: {os.cpu_count()}, модель: {'ToneWhisper' if a.fake else pl.WHISPER_SIZE}")
+
+    base_s,base,_=run(pl,audio,a.lang,1,model)
+    ref=" ".join(s["text"] for s in base)
+    rows=[{"shards":1,"wall_s":round(base_s,2),"rtf":round(base_s/dur,3),"speedup":1.0,"segments":len(base),"similarity":1.0}]
+    print(f"{'shards':>6} {'wall, s':>8} {'RTF':>6} {'speedup':>8} {'segs':>5} {'similar':>8}")
+    print(f"{1:>6} {base_s:>8.2f} {base_s/dur:>6.3f} {1.0:>8.2f} {len(base):>5} {1.0:>8.3f}")
+    ok=True
+    for n in shards:
+        run(pl,audio[:min(len(audio),pl.SAMPLE_RATE*60)],a.lang,n)   # прогрев: процессы и модели грузятся один раз на пул
+        wall,segs,info=run(pl,audio,a.lang,n)
+        sim=similarity(ref," ".join(s["text"] for s in segs)); ok=ok and sim>=a.min_similarity
+        if a.fake:
+            # у ToneWhisper результат не зависит от разреза — склейка обязана совпасть точно, с таймкодами и числом шардов
+            same=segs==base and info.get("shards")==n; ok=ok and same
+            if not same: print(f"шардов {n}: {info.get('shards')}, первое расхождение: "
+                               f"{next(((x,y) for x,y in zip(base,segs) if x!=y),(len(base),len(segs)))}")
+        rows.append({"shards":info.get("shards",n),"wall_s":round(wall,2),"rtf":round(wall/dur,3),"speedup":round(base_s/wall,2),
+                     "segments":len(segs),"similarity":round(sim,4)})
+        print(f"{n:>6} {wall:>8.2f} {wall/dur:>6.3f} {base_s/wall:>8.2f} {len(segs):>5} {sim:>8.3f}")
+    print("совпадение с одним процессом: "+("OK" if ok else ("РАСХОЖДЕНИЕ" if a.fake else f"НИЖЕ {a.min_similarity}")))
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f:
+            json.dump({"params":vars(a),"duration_s":round(dur,1),"cpu":os.cpu_count(),"results":rows},f,ensure_ascii=False,indent=2)
+    return 0 if ok else 1
+
+if __name__=="__main__":
+    sys.exit(main())
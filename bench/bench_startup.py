@@ -0,0 +1,75 @@
+# # bench_startup: холодный старт — время импорта модулей приложения (-X importtime) и первого рендера страницы
+# # Каждый замер — в свежем процессе. --baseline прошлый JSON: код выхода 1, если стало медленнее больше --tolerance.
+# # Запуск: python bench/bench_startup.py [--repeat 5] [--out bench_startup.json] [--baseline bench_startup.json]
+import os, sys, json, argparse, subprocess
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES="pipeline, jira_client, stages"
+HEAVY=["numpy","requests","dateparser","faster_whisper","ctranslate2","imageio_ffmpeg","av"]
+
+# # importtime: (-X importtime по модулям приложения) → общее время, топ по cumulative, какие тяжёлые модули подтянулись
+def importtime(top:int)->dict:
+    code=f"import sys; import {MODULES}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    r=subprocess.run([sys.executable,"-X","importtime","-c",code],cwd=ROOT,capture_output=True,text=True,check=True)
+    rows=[]
+    for line in r.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        self_us,cum_us,name=line.split(":",1)[1].split("|",2)
+        rows.append({"module":name.strip(),"depth":(len(name)-len(name.lstrip()))//2,"self_ms":int(self_us)/1000,"cumulative_ms":int(cum_us)/1000})
+    ours=[x for x in rows if x["module"] in [m.strip() for m in MODULES.split(",")]]
+    return {"total_ms":round(sum(x["cumulative_ms"] for x in ours),1),
+            "modules":{x["module"]:round(x["cumulative_ms"],1) for x in ours},
+            "top":sorted(rows,key=lambda x:-x["cumulative_ms"])[:top],
+            "heavy_loaded":[m for m in r.stdout.strip().split(",") if m]}
+
+# # wall: время «python -c import …» целиком (лучшее из repeat) — то, что видит пользователь при старте
+def wall(repeat:int)->float:
+    code=f"import time; t=time.perf_counter(); import {MODULES}; print(time.perf_counter()-t)"
+    return min(float(subprocess.run([sys.executable,"-c",code],cwd=ROOT,capture_output=True,text=True,check=True).stdout) for _ in range(repeat))
+
+# # render: первый рендер app.py (AppTest, в процессе импорт streamlit уже сделан) и повторный rerun
+def render()->dict:
+    code=("import time, os; from streamlit.testing.v1 import AppTest\n"
+          "at=AppTest.from_file(os.path.join(os.getcwd(),'app.py'),default_timeout=120)\n"
+          "t=time.perf_counter(); at.run(); a=time.perf_counter()-t\n"
+          "t=time.perf_counter(); at.run(); b=time.perf_counter()-t\n"
+          "print(a, b, len(at.exception))")
+    env=dict(os.environ,PYTHONPATH=ROOT+os.pathsep+os.environ.get("PYTHONPATH",""))
+    out=subprocess.run([sys.executable,"-c",code],cwd=ROOT,capture_output=True,text=True,check=True,env=env).stdout.split()
+    return {"first_render_s":round(float(out[0]),3),"rerun_s":round(float(out[1]),3),"exceptions":int(out[2])}
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat",type=int,default=5,help="повторов замера импорта (берём лучший)")
+    ap.add_argument("--top",type=int,default=15,help="сколько самых дорогих импортов показать")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    ap.add_argument("--baseline",default="",help="JSON прошлого замера для сравнения")
+    ap.add_argument("--tolerance",type=float,default=0.25,help="допустимое замедление относительно baseline (доля)")
+    a=ap.parse_args()
+
+    it=importtime(a.top)
+    res={"python":sys.version.split()[0],"import_s":round(wall(a.repeat),3),"importtime":it}
+    try: res.update(render())
+    except Exception as e: res["render_error"]=str(e)[:200]
+
+    print(f"импорт {MODULES}: {res['import_s']*1000:.0f} мс (-X importtime: {it['total_ms']} мс)")
+    print("тяжёлые модули при старте: "+(", ".join(it["heavy_loaded"]) or "нет"))
+    print(f"{'cumulative, ms':>15} {'self, ms':>9}  module")
+    for x in it["top"]: print(f"{x['cumulative_ms']:>15.1f} {x['self_ms']:>9.1f}  {'  '*x['depth']}{x['module']}")
+    if "first_render_s" in res:
+        print(f"первый рендер app.py: {res['first_render_s']:.2f} с, rerun: {res['rerun_s']:.2f} с, исключений: {res['exceptions']}")
+    else:
+        print("рендер не замерен: "+res.get("render_error",""))
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump(res,f,ensure_ascii=False,indent=2)
+    if a.baseline:
+        with open(a.baseline,"r",encoding="utf-8") as f: base=json.load(f)
+        bad=[]
+        for k in ("import_s","first_render_s","rerun_s"):
+            if k in base and k in res and res[k]>base[k]*(1+a.tolerance):
+                bad.append(f"{k}: {base[k]} → {res[k]}")
+        print("регрессия: "+"; ".join(bad) if bad else "относительно baseline — без регрессий")
+        return 1 if bad else 0
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# # bench_store: история встреч (store.py) на тысячах встреч — запись каждой операции своей транзакцией в потоке вызывающего
+# # vs очередь и фоновая запись пачками (сколько ждёт вызывающий, сколько встреч в секунду), затем чтение: список истории,
+# # полнотекстовый поиск FTS5 vs LIKE-скан расшифровок, поиск по хэшу файла. Одна встреча содержит редкое слово «звездолёт»:
+# # поиск «звездолет» (без ё) обязан найти ровно её.
+# # Запуск: python bench/bench_store.py [--meetings 2000] [--tokens 1500] [--tasks 5] [--out bench_store.json]
+import os, sys, json, time, uuid, random, hashlib, argparse, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm import synth_transcript
+
+WORD="звездолёт"
+
+# # q: p50/p95/max в мс
+def q(xs:list)->dict:
+    xs=sorted(xs); k=lambda p: xs[min(len(xs)-1,int(p*len(xs)))]
+    return {"p50_ms":round(k(0.5)*1000,3),"p95_ms":round(k(0.95)*1000,3),"max_ms":round(xs[-1]*1000,3)}
+
+# # meetings: n синтетических встреч (расшифровка, задачи); в встрече n//2 — редкое слово
+def meetings(n:int, tokens:int, tasks:int, seed:int)->list:
+    rnd=random.Random(seed); base=synth_transcript(tokens); out=[]
+    for i in range(n):
+        words=base.split(); rnd.shuffle(words)
+        if i==n//2: words.insert(len(words)//2,WORD)
+        out.append({"id":f"m{i:05d}","name":f"встреча_{i}.mp3","file_hash":hashlib.sha256(str(i).encode()).hexdigest(),"transcript":" ".join(words),
+                    "tasks":[{"id":uuid.uuid4().hex[:8],"summary":f"Подготовить отчёт по модулю {i}-{k}","description":"Собрать данные и отправить команде.",
+                              "labels":"отчёт, модуль","priority":"Medium"} for k in range(tasks)]})
+    return out
+
+# # write_direct: каждая операция — своя транзакция в потоке вызывающего (как без очереди)
+def write_direct(path:str, ms:list)->dict:
+    import store
+    s=store.Store(path); con=s._open(); lat=[]; t0=time.perf_counter()
+    for m in ms:
+        for op,args in (("meeting",(m["id"],{k:m[k] for k in ("name","file_hash","transcript")},time.time())),
+                        ("tasks",(m["id"],[{"id":t["id"],**{c:str(t.get(c) or "") for c in store.TASK_FIELDS}} for t in m["tasks"]],time.time()))):
+            t=time.perf_counter()
+            with con: getattr(s,"_w_"+op)(con,*args)
+            lat.append(time.perf_counter()-t)
+    wall=time.perf_counter()-t0; con.close()
+    return {"mode":"direct","wall_s":round(wall,2),"meetings_per_s":round(len(ms)/wall,1),**q(lat),"batches":len(lat)}
+
+# # write_queued: put_meeting/put_tasks — в очередь, фоновый поток пишет пачками; wall — до flush()
+def write_queued(path:str, ms:list)->dict:
+    import store
+    s=store.Store(path); lat=[]; t0=time.perf_counter()
+    for m in ms:
+        t=time.perf_counter(); s.put_meeting(m["id"],name=m["name"],file_hash=m["file_hash"],transcript=m["transcript"]); lat.append(time.perf_counter()-t)
+        t=time.perf_counter(); s.put_tasks(m["id"],m["tasks"]); lat.append(time.perf_counter()-t)
+    s.flush(timeout=600); wall=time.perf_counter()-t0
+    return {"mode":"queued","wall_s":round(wall,2),"meetings_per_s":round(len(ms)/wall,1),**q(lat),"batches":s.stats["batches"],"errors":s.stats["errors"]}
+
+# # timed: время каждого из n вызовов fn
+def timed(fn, n:int)->list:
+    out=[]
+    for _ in range(n):
+        t=time.perf_counter(); fn(); out.append(time.perf_counter()-t)
+    return out
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--meetings",type=int,default=2000,help="встреч в истории")
+    ap.add_argument("--tokens",type=int,default=1500,help="токенов в расшифровке встречи")
+    ap.add_argument("--tasks",type=int,default=5,help="задач на встречу")
+    ap.add_argument("--reads",type=int,default=50,help="повторов каждого запроса чтения")
+    ap.add_argument("--seed",type=int,default=1)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    d=tempfile.mkdtemp(prefix="bench_store_")
+    os.environ.setdefault("APP_CACHE_DIR",d)
+    import store
+    ms=meetings(a.meetings,a.tokens,a.tasks,a.seed)
+    writes=[write_direct(os.path.join(d,"direct.db"),ms),write_queued(os.path.join(d,"queued.db"),ms)]
+
+    s=store.Store(os.path.join(d,"queued.db")); con=s._open(read=True); probe=ms[a.meetings//3]["file_hash"]
+    like="%"+WORD.replace("ё","е")+"%"
+    found={"fts":[r["id"] for r in s.history(q=WORD.replace("ё","е"),limit=100)],
+           "like":[r[0] for r in con.execute("SELECT id FROM meetings WHERE replace(transcript,'ё','е') LIKE ?",(like,))]}
+    reads=[{"query":"history (50 new)",**q(timed(lambda: s.history(limit=50),a.reads))},
+           {"query":"search fts",**q(timed(lambda: s.history(q="звездолет"),a.reads))},
+           {"query":"search like",**q(timed(lambda: con.execute("SELECT id FROM meetings WHERE replace(transcript,'ё','е') LIKE ? "
+                                                               "ORDER BY created DESC LIMIT 50",(like,)).fetchall(),a.reads))},
+           {"query":"search fts, common",**q(timed(lambda: s.history(q="отчет модулю"),a.reads))},
+           {"query":"by_hash",**q(timed(lambda: s.by_hash(probe),a.reads))}]
+    size=sum(os.path.getsize(os.path.join(d,f)) for f in os.listdir(d) if f.startswith("queued.db"))
+
+    print(f"{'write':>7} {'wall, s':>8} {'meet/s':>8} {'call p50, ms':>13} {'call p95, ms':>13} {'call max, ms':>13} {'commits':>8}")
+    for r in writes:
+        print(f"{r['mode']:>7} {r['wall_s']:>8.2f} {r['meetings_per_s']:>8.1f} {r['p50_ms']:>13.3f} {r['p95_ms']:>13.3f} {r['max_ms']:>13.3f} {r['batches']:>8}")
+    print(f"\n{'read':>19} {'p50, ms':>9} {'p95, ms':>9} {'max, ms':>9}")
+    for r in reads: print(f"{r['query']:>19} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['max_ms']:>9.3f}")
+    want=[ms[a.meetings//2]["id"]]
+    print(f"\nбаза: {size/2**20:.1f} МБ; «звездолет» — fts: {found['fts']}, like: {found['like']}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump({"params":vars(a),"writes":writes,"reads":reads,"found":found,"db_mb":round(size/2**20,1)},f,ensure_ascii=False,indent=2)
+    return 0 if found["fts"]==want==found["like"] and not writes[1]["errors"] else 1
+
+if __name__=="__main__":
+    sys.exit(main())
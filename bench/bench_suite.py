@@ -0,0 +1,168 @@
+# # bench_suite: сквозной офлайн-бенчмарк — локальные LLM (fake_llm) и Jira (fake_jira), синтетическое или своё аудио
+# # Сценарии: discover (autodiscover), extract (llama_extract), jira (jira_submit — то, что вызывает кнопка «Создать задачи»),
+# # transcribe (ffmpeg + Whisper), e2e (конвейер stages + Jira), resubmit (повторная отправка тех же задач — ни одной новой).
+# # По каждому — p50/p95, пропускная способность, ошибки; дубликаты задач и комментариев в Jira считаются ошибкой.
+# # Запуск: python bench/bench_suite.py [--scenarios discover,extract,jira,transcribe,e2e] [--llm-429 0.05] [--out suite.json]
+# #         python bench/bench_suite.py --baseline suite.json    # код выхода 1, если p95 или пропускная способность хуже > --tolerance
+import os, sys, json, math, time, wave, argparse, platform, tempfile, subprocess
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_llm import FakeLLM, synth_transcript
+from fake_jira import FakeJira
+from fake_whisper import FakeWhisper
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS=["discover","extract","jira","resubmit","transcribe","e2e"]
+
+# # pct: перцентиль q (0..100) по ближайшему рангу
+def pct(xs:list, q:float)->float:
+    if not xs: return 0.0
+    s=sorted(xs); return s[max(0,min(len(s)-1,math.ceil(q/100*len(s))-1))]
+
+# # run: повторить fn reps раз → строка результата; fn возвращает число единиц работы (задач, файлов)
+def run(name:str, fn, reps:int, unit:str)->dict:
+    lat=[]; errors={}; units=0; t0=time.perf_counter()
+    for i in range(reps):
+        t=time.perf_counter()
+        try: units+=fn(i); lat.append(time.perf_counter()-t)
+        except Exception as e:
+            k=type(e).__name__+": "+str(e).splitlines()[0][:80] if str(e) else type(e).__name__
+            errors[k]=errors.get(k,0)+1
+    wall=time.perf_counter()-t0
+    return {"scenario":name,"runs":reps,"ok":len(lat),"errors":sum(errors.values()),"error_kinds":errors,
+            "p50_s":round(pct(lat,50),4),"p95_s":round(pct(lat,95),4),"mean_s":round(sum(lat)/len(lat),4) if lat else 0.0,
+            "wall_s":round(wall,3),"unit":unit,"units":units,"per_s":round(units/wall,2) if wall else 0.0}
+
+# # synth_audio: n WAV-файлов по sec секунд (тон; разное содержимое → разные ключи кэша расшифровок)
+def synth_audio(n:int, sec:float)->list:
+    import numpy as np
+    d=tempfile.mkdtemp(prefix="bench_suite_"); out=[]
+    for i in range(n):
+        t=np.arange(int(sec*16000))/16000.0
+        x=(0.2*np.sin(2*np.pi*(220+20*i)*t)*32767).astype("<i2")
+        p=os.path.join(d,f"a{i}.wav")
+        with wave.open(p,"wb") as w: w.setnchannels(1); w.setsampwidth(2); w.setframerate(16000); w.writeframes(x.tobytes())
+        out.append(p)
+    return out
+
+# # git_rev: коммит, на котором сделан замер (для сравнения прогонов во времени)
+def git_rev()->str:
+    try: return subprocess.run(["git","rev-parse","--short","HEAD"],cwd=ROOT,capture_output=True,text=True,timeout=5).stdout.strip()
+    except Exception: return ""
+
+# # compare: регрессии относительно baseline — p95 выше или пропускная способность ниже больше чем на tol
+def compare(rows:list, base:dict, tol:float)->list:
+    prev={r["scenario"]:r for r in base.get("results",[])}; bad=[]
+    for r in rows:
+        b=prev.get(r["scenario"])
+        if not b: continue
+        if b["p95_s"] and r["p95_s"]>b["p95_s"]*(1+tol): bad.append(f"{r['scenario']}: p95 {b['p95_s']} → {r['p95_s']} с")
+        if b["per_s"] and r["per_s"]<b["per_s"]*(1-tol): bad.append(f"{r['scenario']}: {b['per_s']} → {r['per_s']} {r['unit']}/с")
+        if r["errors"]>b["errors"]: bad.append(f"{r['scenario']}: ошибок {b['errors']} → {r['errors']}")
+    return bad
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--scenarios",default=",".join(SCENARIOS),help="какие сценарии запускать")
+    ap.add_argument("--reps",type=int,default=10,help="повторов каждого сценария")
+    ap.add_argument("--tokens",type=int,default=4000,help="~токенов расшифровки (extract, e2e)")
+    ap.add_argument("--tasks",type=int,default=60,help="задач на одну отправку в Jira")
+    ap.add_argument("--files",type=int,default=3,help="файлов в сценарии e2e")
+    ap.add_argument("--audio",nargs="*",default=[],help="свои аудиофайлы (фикстуры); по умолчанию — синтетические WAV")
+    ap.add_argument("--audio-s",type=float,default=30.0,help="длина синтетического аудио, сек")
+    ap.add_argument("--whisper",choices=["fake","real"],default="fake",help="fake — bench/fake_whisper.py; real — faster-whisper (WHISPER_SIZE)")
+    ap.add_argument("--seg-ms",type=float,default=5.0,help="fake Whisper: мс на сегмент")
+    ap.add_argument("--llm-token-ms",type=float,default=0.5,help="fake LLM: мс на сгенерированный токен")
+    ap.add_argument("--llm-latency-ms",type=float,default=5.0,help="fake LLM: сетевая задержка на запрос")
+    ap.add_argument("--llm-errors",type=float,default=0.0,help="fake LLM: доля ответов 500")
+    ap.add_argument("--llm-429",type=float,default=0.0,help="fake LLM: доля ответов 429")
+    ap.add_argument("--jira-latency-ms",type=float,default=20.0,help="fake Jira: задержка на запрос")
+    ap.add_argument("--jira-issue-ms",type=float,default=2.0,help="fake Jira: мс на создаваемую задачу")
+    ap.add_argument("--jira-errors",type=float,default=0.0,help="fake Jira: доля ответов 500")
+    ap.add_argument("--jira-429",type=float,default=0.0,help="fake Jira: доля ответов 429")
+    ap.add_argument("--jira-lost",type=float,default=0.0,help="fake Jira: доля созданных задач/комментариев с потерянным ответом (500)")
+    ap.add_argument("--retry-after",type=float,default=1.0,help="Retry-After в ответах 429, сек")
+    ap.add_argument("--no-bulk",action="store_true",help="fake Jira без /issue/bulk (по одной задаче)")
+    ap.add_argument("--seed",type=int,default=0)
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    ap.add_argument("--baseline",default="",help="JSON прошлого прогона для сравнения")
+    ap.add_argument("--tolerance",type=float,default=0.25,help="допустимое ухудшение относительно baseline (доля)")
+    a=ap.parse_args()
+
+    llm=FakeLLM(token_ms=a.llm_token_ms,latency_ms=a.llm_latency_ms,error_rate=a.llm_errors,rate_429=a.llm_429,
+                retry_after=a.retry_after,seed=a.seed).start()
+    jira=FakeJira(latency_ms=a.jira_latency_ms,issue_ms=a.jira_issue_ms,error_rate=a.jira_errors,rate_429=a.jira_429,
+                  retry_after=a.retry_after,bulk=not a.no_bulk,seed=a.seed,lost_rate=a.jira_lost).start()
+    # сервер LLM ищется через autodiscover (LLAMA_BASE), а не задаётся LLAMA_URL
+    os.environ.pop("LLAMA_URL",None); os.environ["LLAMA_BASE"]=llm.base; os.environ["LLAMA_MODEL"]=""
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    import pipeline as pl
+    import jira_client as jc
+    import stages, metrics
+    if a.whisper=="fake": pl.load_whisper=lambda size="": FakeWhisper(a.seg_ms/1000.0,a.tokens)
+
+    text=synth_transcript(a.tokens)
+    tasks=[{"id":f"b{i:07d}","summary":f"Задача {i}","description":f"Подготовить отчёт {i} к пятнице","labels":"отчёт","due":"",
+            "comment":"проверить" if i%5==0 else "","priority":"Medium"} for i in range(a.tasks)]
+    audio=a.audio or synth_audio(max(a.files,1),a.audio_s)
+    cache=os.path.join(pl.CACHE_DIR,"transcripts")
+    def drop_cache():
+        for x in os.listdir(cache) if os.path.isdir(cache) else []: os.unlink(os.path.join(cache,x))
+    def submit(ts):
+        dup=jira.stats["duplicates"]+jira.stats["dup_comments"]
+        res=jc.jira_submit(jira.base,"bench@example.com","token",jira.project,[dict(t) for t in ts])
+        bad=[r.get("error","") or r.get("comment_error","") for r in res if not r.get("ok") or r.get("comment_error")]
+        if bad: raise RuntimeError(f"Jira: {len(bad)} из {len(res)} с ошибкой: {bad[0][:60]}")
+        if jira.stats["duplicates"]+jira.stats["dup_comments"]>dup: raise RuntimeError("Jira: дубликаты задач или комментариев")
+        return len(res)
+    def jira_run(i):
+        return submit([{**t,"id":f"r{i}-{t['id']}"} for t in tasks])   # новые id — новые задачи на каждом повторе
+    first=[True]   # первая отправка создаёт задачи, все следующие — ни одной
+    def resubmit(_):
+        n=jira.stats["issues"]; k=submit(tasks)
+        if jira.stats["issues"]>n and not first[0]: raise RuntimeError(f"Jira: повторная отправка создала {jira.stats['issues']-n} задач")
+        first[0]=False
+        return k
+    def discover(_):
+        pl.discovery_invalidate(); mode,url,_m=pl.autodiscover(force=True)
+        if not url: raise RuntimeError("LLM endpoint not found")
+        return 1
+    def extract(_):
+        return len(pl.llama_extract(text,refresh=True)[0])
+    def transcribe(i):
+        drop_cache(); info={}
+        list(pl.transcribe_iter(audio[i%len(audio)],"auto",info))
+        return 1
+    def e2e(_):
+        drop_cache()
+        jobs,_r=stages.run_files(audio[:a.files],refresh=True)
+        err=[j.error for j in jobs if j.error]
+        if err: raise RuntimeError(err[0])
+        return sum(submit(j.tasks) for j in jobs if j.tasks)
+
+    fns={"discover":(discover,"discoveries"),"extract":(extract,"tasks"),"jira":(jira_run,"tasks"),"resubmit":(resubmit,"tasks"),
+         "transcribe":(transcribe,"files"),"e2e":(e2e,"tasks")}
+    rows=[]
+    print(f"{'scenario':>10} {'ok':>4} {'err':>4} {'p50, s':>8} {'p95, s':>8} {'mean, s':>8} {'throughput':>18}")
+    for name in [x.strip() for x in a.scenarios.split(",") if x.strip()]:
+        fn,unit=fns[name]
+        r=run(name,fn,a.reps,unit); rows.append(r)
+        print(f"{name:>10} {r['ok']:>4} {r['errors']:>4} {r['p50_s']:>8.3f} {r['p95_s']:>8.3f} {r['mean_s']:>8.3f} {r['per_s']:>10.2f} {unit+'/s':<8}")
+        for k,v in r["error_kinds"].items(): print(f"{'':>10} {v}× {k}")
+    llm.stop(); jira.stop()
+    retries:dict={}
+    for lb,v in metrics.counters("app_retries_total").items(): t=dict(lb).get("target",""); retries[t]=retries.get(t,0)+v
+    print(f"fake LLM: {json.dumps(llm.stats)}\nfake Jira: {json.dumps(jira.stats)}\nповторы клиента: {json.dumps(retries)}"
+          f"\nлимит Jira (AIMD): {json.dumps(jc.jira_limits())}")
+
+    res={"started_at":time.strftime("%Y-%m-%dT%H:%M:%S"),"git":git_rev(),"python":platform.python_version(),"host":platform.node(),
+         "params":vars(a),"results":rows,"servers":{"llm":llm.stats,"jira":jira.stats},"client_retries":retries}
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f: json.dump(res,f,ensure_ascii=False,indent=2)
+    if a.baseline:
+        with open(a.baseline,"r",encoding="utf-8") as f: bad=compare(rows,json.load(f),a.tolerance)
+        print("регрессия: "+"; ".join(bad) if bad else "относительно baseline — без регрессий")
+        return 1 if bad else 0
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
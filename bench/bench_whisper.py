@@ -0,0 +1,72 @@
+# # bench_whisper: real-time factor Whisper на CPU по конфигурациям (размер, compute type, beam, batch, потоки)
+# # RTF = время распознавания / длительность аудио (меньше 1 — быстрее реального времени); декодирование ffmpeg — отдельно.
+# # Запуск: python bench/bench_whisper.py --clips bench/clips \
+# #             --configs "small:int8:5:0:0,small:int8:1:0:0,medium:int8:5:0:0,small:int8:5:8:0" [--out bench_whisper.json]
+# # Конфигурация: size:compute:beam:batch:threads (batch>0 — нужен faster-whisper >= 1.1, threads 0 — по умолчанию).
+import os, sys, json, time, glob, argparse, subprocess, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# # clips_from: файлы из каталогов/шаблонов; пусто — три синтетических клипа (тон + шум), RTF на них лишь ориентир
+def clips_from(inputs, ffmpeg):
+    out=[]
+    for x in inputs:
+        out+=sorted(p for p in (glob.glob(os.path.join(x,"*")) if os.path.isdir(x) else glob.glob(x)) if os.path.isfile(p))
+    if out: return out
+    d=tempfile.mkdtemp(prefix="bench_clips_")
+    for sec in (30,60,120):
+        p=os.path.join(d,f"synth_{sec}s.wav")
+        subprocess.run([ffmpeg,"-y","-loglevel","error","-f","lavfi","-i",f"sine=f=220:d={sec}","-f","lavfi","-i",f"anoisesrc=d={sec}:a=0.05",
+                        "-filter_complex","amix=inputs=2",p],check=True)
+        out.append(p)
+    print("клипы не заданы — синтетические (тон + шум); для честного RTF дайте реальные записи через --clips",file=sys.stderr)
+    return out
+
+def main():
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--clips",nargs="*",default=[os.path.join(os.path.dirname(os.path.abspath(__file__)),"clips")],help="каталоги или шаблоны аудио")
+    ap.add_argument("--configs",default="tiny:int8:5:0:0,small:int8:5:0:0,small:int8:1:0:0,medium:int8:5:0:0")
+    ap.add_argument("--lang",default="ru")
+    ap.add_argument("--no-vad",action="store_true",help="без VAD (синтетические клипы VAD почти целиком вырезает)")
+    ap.add_argument("--out",default="",help="сохранить результаты в JSON")
+    a=ap.parse_args()
+    os.environ.setdefault("APP_CACHE_DIR",tempfile.mkdtemp(prefix="bench_"))
+    import pipeline as pl
+
+    clips=clips_from(a.clips,pl.ffmpeg_exe() or "ffmpeg")
+    audio={}
+    for c in clips:
+        st={}; audio[c]=pl.decode_pcm(c,st)
+        print(f"{os.path.basename(c)}: {len(audio[c])/pl.SAMPLE_RATE:.1f} с, декодирование {st['decode_s']} с",file=sys.stderr)
+    total=sum(len(x) for x in audio.values())/pl.SAMPLE_RATE
+
+    rows=[]
+    print(f"{'config':>24} {'load, s':>8} {'wall, s':>8} {'RTF':>6} {'segs':>5}  status")
+    for cfg in [x.strip() for x in a.configs.split(",") if x.strip()]:
+        size,compute,beam,batch,threads=(cfg.split(":")+["int8","5","0","0"])[:5]
+        os.environ["WHISPER_COMPUTE"]=compute; pl.WHISPER_BEAM=int(beam); pl.WHISPER_BATCH=int(batch); pl.WHISPER_CPU_THREADS=int(threads)
+        pl._WHISPER["models"].clear(); pl._WHISPER["batched"].clear()
+        row={"config":cfg,"size":size,"compute":compute,"beam":int(beam),"batch":int(batch),"threads":int(threads),"clips":{}}
+        try:
+            t0=time.perf_counter(); runner,batched=pl.whisper_runner(size); row["load_s"]=round(time.perf_counter()-t0,2)
+            if int(batch)>0 and not batched: raise RuntimeError("batched недоступен: нужен faster-whisper >= 1.1")
+            kw={"beam_size":int(beam),"vad_filter":not a.no_vad}
+            if not a.no_vad: kw["vad_parameters"]=dict(pl.VAD_PARAMS)
+            if a.lang and a.lang!="auto": kw["language"]=a.lang
+            if batched: kw["batch_size"]=int(batch)
+            wall=0.0; nseg=0
+            for c,x in audio.items():
+                t0=time.perf_counter(); segs,_=runner.transcribe(x,**kw); n=len(list(segs)); dt=time.perf_counter()-t0
+                wall+=dt; nseg+=n
+                row["clips"][os.path.basename(c)]={"wall_s":round(dt,2),"rtf":round(dt/(len(x)/pl.SAMPLE_RATE),3),"segments":n}
+            row.update({"wall_s":round(wall,2),"rtf":round(wall/max(total,1e-9),3),"segments":nseg,"status":"ok"})
+        except Exception as e:
+            row.update({"wall_s":0.0,"rtf":None,"segments":0,"status":f"{type(e).__name__}: {(str(e).splitlines() or [''])[0][:80]}"})
+        rows.append(row)
+        rtf="—" if row["rtf"] is None else f"{row['rtf']:.3f}"
+        print(f"{cfg:>24} {row.get('load_s',0):>8.2f} {row['wall_s']:>8.2f} {rtf:>6} {row['segments']:>5}  {row['status']}")
+    if a.out:
+        with open(a.out,"w",encoding="utf-8") as f:
+            json.dump({"params":vars(a),"audio_s":round(total,1),"cpu":os.cpu_count(),"results":rows},f,ensure_ascii=False,indent=2)
+
+if __name__=="__main__":
+    main()
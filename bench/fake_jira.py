@@ -0,0 +1,166 @@
+# # fake_jira: локальная подмена Jira Cloud REST для бенчмарков (без сайта Atlassian)
+# # /rest/api/3/priority, createmeta (новый и старый API), /issue, /issue/bulk, /issue/{key}/comment, /search/jql (labels in (...)).
+# # Задержка: latency_ms на запрос + issue_ms на каждую создаваемую задачу; сбои — error_rate (500) и rate_429 (429 с Retry-After),
+# # lost_rate — задача/комментарий создаётся, но клиент получает 500 (ответ «потерян»). duplicates — повторно созданные по метке tasker-*.
+# # /search/jql понимает ровно то, что шлют jira_client и dedup: labels in (...), updated >= -Nm, statusCategory != Done и NOT (...).
+import json, random, re, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List
+
+PRIORITIES = ["Highest","High","Medium","Low","Lowest"]
+FIELDS = ["summary","project","issuetype","labels","duedate","description","priority"]
+
+class FakeJira:
+    def __init__(self, latency_ms:float=20.0, issue_ms:float=5.0, error_rate:float=0.0, rate_429:float=0.0,
+                 retry_after:float=1.0, bulk:bool=True, project:str="PRJ", seed:int=0, lost_rate:float=0.0):
+        self.latency_ms=latency_ms; self.issue_ms=issue_ms; self.error_rate=error_rate; self.rate_429=rate_429
+        self.retry_after=retry_after; self.bulk=bulk; self.project=project; self.lost_rate=lost_rate
+        self.stats={"requests":0,"issues":0,"comments":0,"injected_500":0,"injected_429":0,"lost":0,"duplicates":0,"dup_comments":0}
+        self.issues:Dict[str,Dict[str,Any]]={}; self.comments:Dict[str,List[Any]]={}
+        self.labels:set=set(); self.ver=0; self.pages:Dict[str,Any]={}
+        self.lock=threading.Lock(); self.srv=None; self.rnd=random.Random(seed); self.seq=0
+
+    # # fault: случайный сбой → (код, тело, заголовки) или None
+    def fault(self)->Any:
+        with self.lock:
+            self.stats["requests"]+=1
+            x=self.rnd.random()
+            if x<self.rate_429:
+                self.stats["injected_429"]+=1
+                return 429,{"errorMessages":["Rate limit exceeded"]},{"Retry-After":f"{self.retry_after:g}"}
+            if x<self.rate_429+self.error_rate:
+                self.stats["injected_500"]+=1
+                return 500,{"errorMessages":["injected failure"]},{}
+        return None
+
+    # # lost: ответ на выполненный POST потерян (клиент увидит 500)
+    def lost(self)->bool:
+        with self.lock:
+            if self.rnd.random()>=self.lost_rate: return False
+            self.stats["lost"]+=1; return True
+
+    # # create: задача из fields → {"id","key","self"}
+    def create(self, fields:Dict[str,Any])->Dict[str,Any]:
+        time.sleep(self.issue_ms/1000.0)
+        with self.lock:
+            idem={x for x in fields.get("labels") or [] if x.startswith("tasker-")}
+            if idem & self.labels: self.stats["duplicates"]+=1
+            self.labels|=idem; self.seq+=1; self.stats["issues"]+=1; seq=self.seq
+            key=f"{self.project}-{seq}"; self.issues[key]={**fields,"_updated":time.time(),"_done":False}; self.ver+=1
+        return {"id":str(10000+seq),"key":key,"self":f"{self.base}/rest/api/3/issue/{10000+seq}"}
+
+    # # preload: открытые задачи проекта с темами summaries без HTTP (большой проект для bench_dedup)
+    def preload(self, summaries:List[str], age_s:float=86400.0)->None:
+        with self.lock:
+            for s in summaries:
+                self.seq+=1; self.issues[f"{self.project}-{self.seq}"]={"summary":s,"_updated":time.time()-age_s,"_done":False}
+            self.ver+=1
+
+    # # touch: изменить задачу «в Jira» — новая тема и/или закрыть (done)
+    def touch(self, key:str, summary:Any=None, done:Any=None)->None:
+        with self.lock:
+            f=self.issues[key]
+            if summary is not None: f["summary"]=summary
+            if done is not None: f["_done"]=done
+            f["_updated"]=time.time(); self.ver+=1
+
+    # # search: JQL → страница задач (nextPageToken — смещение); отбор по меткам, времени изменения и статусу
+    def search(self, jql:str, fields:List[str], limit:int=100, token:str="")->Dict[str,Any]:
+        with self.lock:
+            if "labels in" in jql:
+                want=set(re.findall(r'"([^"]+)"',jql.split("labels in",1)[-1]))
+                keys=[k for k,f in self.issues.items() if want & set(f.get("labels") or [])]
+            else:
+                # список под запрос считается один раз и листается страницами, пока задачи не менялись
+                m=re.search(r"updated >= -(\d+)m",jql); since=time.time()-60*int(m.group(1)) if m else None
+                neg="NOT (" in jql; open_only="statusCategory != Done" in jql and not neg
+                hit=self.pages.get(jql)
+                if not hit or hit[0]!=self.ver or m:
+                    keys=[k for k,f in self.issues.items() if (since is None or f["_updated"]>=since)
+                          and (f["_done"] if neg else not f["_done"] if open_only else True)]
+                    self.pages[jql]=(self.ver,keys)
+                keys=self.pages[jql][1]
+            start=int(token or 0); page=keys[start:start+limit]
+            found=[{"id":str(10000+int(k.rsplit("-",1)[1])),"key":k,"fields":{x:self.issues[k].get(x) for x in fields}} for k in page]
+        out:Dict[str,Any]={"issues":found,"isLast":start+limit>=len(keys)}
+        if not out["isLast"]: out["nextPageToken"]=str(start+limit)
+        return out
+
+    # # check: ошибки полей как у Jira (summary обязателен) — {} если всё в порядке
+    def check(self, fields:Dict[str,Any])->Dict[str,str]:
+        if not str(fields.get("summary","")).strip(): return {"summary":"You must specify a summary of the issue."}
+        if (fields.get("project") or {}).get("key")!=self.project: return {"project":"valid project is required"}
+        return {}
+
+    def handler(self):
+        fake=self
+        class H(BaseHTTPRequestHandler):
+            def log_message(self,*a): pass
+            def send(self,code,obj,headers=None):
+                b=json.dumps(obj,ensure_ascii=False).encode("utf-8")
+                self.send_response(code); self.send_header("Content-Type","application/json")
+                for k,v in (headers or {}).items(): self.send_header(k,v)
+                self.send_header("Content-Length",str(len(b))); self.end_headers(); self.wfile.write(b)
+            def do_GET(self):
+                time.sleep(fake.latency_ms/1000.0)
+                f=fake.fault()
+                if f: return self.send(*f)
+                path=self.path.split("?")[0]; p=f"/rest/api/3/issue/createmeta/{fake.project}/issuetypes"
+                if path=="/rest/api/3/priority":
+                    return self.send(200,[{"id":str(i),"name":n} for i,n in enumerate(PRIORITIES,1)])
+                if path==p:
+                    return self.send(200,{"issueTypes":[{"id":"10001","name":"Task"},{"id":"10002","name":"Bug"}]})
+                if path.startswith(p+"/"):
+                    return self.send(200,{"fields":[{"fieldId":x,"allowedValues":[{"id":str(i),"name":n} for i,n in enumerate(PRIORITIES,1)]}
+                                                    if x=="priority" else {"fieldId":x} for x in FIELDS]})
+                m=re.match(r"^/rest/api/3/issue/([^/]+)/comment$",path)
+                if m:
+                    with fake.lock: cs=list(fake.comments.get(m.group(1),[]))
+                    return self.send(200,{"comments":[{"id":str(i),"body":b} for i,b in enumerate(cs,1)],"total":len(cs)})
+                self.send(404,{"errorMessages":["not found"]})
+            def do_POST(self):
+                n=int(self.headers.get("Content-Length","0") or 0)
+                try: body=json.loads(self.rfile.read(n) or b"{}")
+                except Exception: return self.send(400,{"errorMessages":["bad json"]})
+                time.sleep(fake.latency_ms/1000.0)
+                f=fake.fault()
+                if f: return self.send(*f)
+                path=self.path.split("?")[0]
+                lost=(500,{"errorMessages":["response lost"]})
+                if path=="/rest/api/3/search/jql":
+                    return self.send(200,fake.search(body.get("jql",""),body.get("fields") or [],int(body.get("maxResults") or 100),body.get("nextPageToken") or ""))
+                if path=="/rest/api/3/issue/bulk":
+                    if not fake.bulk: return self.send(404,{"errorMessages":["not found"]})
+                    issues:List[Dict[str,Any]]=[]; errors=[]
+                    for i,u in enumerate(body.get("issueUpdates") or []):
+                        err=fake.check(u.get("fields") or {})
+                        if err: errors.append({"status":400,"elementErrors":{"errors":err},"failedElementNumber":i})
+                        else: issues.append(fake.create(u["fields"]))
+                    return self.send(*lost) if issues and fake.lost() else self.send(201,{"issues":issues,"errors":errors})
+                if path=="/rest/api/3/issue":
+                    fields=body.get("fields") or {}; err=fake.check(fields)
+                    if err: return self.send(400,{"errors":err})
+                    iss=fake.create(fields)
+                    return self.send(*lost) if fake.lost() else self.send(201,iss)
+                m=re.match(r"^/rest/api/3/issue/([^/]+)/comment$",path)
+                if m:
+                    with fake.lock:
+                        cs=fake.comments.setdefault(m.group(1),[])
+                        if body.get("body") in cs: fake.stats["dup_comments"]+=1
+                        cs.append(body.get("body")); fake.stats["comments"]+=1; n=fake.stats["comments"]
+                    return self.send(*lost) if fake.lost() else self.send(201,{"id":str(n),"body":body.get("body")})
+                self.send(404,{"errorMessages":["not found"]})
+        return H
+
+    def start(self)->"FakeJira":
+        self.srv=ThreadingHTTPServer(("127.0.0.1",0),self.handler())
+        self.srv.daemon_threads=True
+        threading.Thread(target=self.srv.serve_forever,daemon=True).start()
+        return self
+
+    def stop(self)->None:
+        if self.srv: self.srv.shutdown(); self.srv.server_close()
+
+    @property
+    def base(self)->str:
+        return f"http://127.0.0.1:{self.srv.server_address[1]}"
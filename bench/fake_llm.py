@@ -0,0 +1,168 @@
+# # fake_llm: локальный OpenAI-совместимый сервер для бенчмарков (без GPU и RunPod)
+# # Задержка ~ prompt_ms на входной токен + token_ms на сгенерированный (последовательная генерация),
+# # контекст ограничен ctx, ответ обрезается по max_tokens — как у реального vLLM.
+# # Сбои: latency_ms — задержка сети на любой запрос, error_rate — доля ответов 500, rate_429 — доля 429 с Retry-After.
+# # Медленный сервер: hang_s — каждый запрос висит N с (холодный/перегруженный), tail_rate — доля ответов на tail_ms дольше,
+# # slots — одновременных генераций (остальные ждут в очереди, как в батче vLLM); 0 — без лимита.
+import json, re, random, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List
+
+ACTION_RE = re.compile(r"Задача\s+(\d+):\s*([^.]+)\.")
+
+# # tokens: та же грубая оценка, что и approx_tokens в приложении
+def tokens(s:str)->int:
+    return max(1,len(s or "")//3)
+
+# # synth_transcript: синтетическая расшифровка ~n_tokens токенов, одно действие на every предложений
+def synth_transcript(n_tokens:int, every:int=8)->str:
+    out=[]; i=0; n=0
+    while n<n_tokens:
+        if i%every==0:
+            k=i//every+1
+            s=f"Задача {k}: подготовить отчёт по модулю {k} и отправить его команде."
+        else:
+            s=f"Обсудили состояние работ по направлению {i}, вопросов по нему пока нет."
+        out.append(s); n+=tokens(s)+1; i+=1
+    return " ".join(out)
+
+# # fake_tasks: задачи, которые «модель» нашла в тексте
+def fake_tasks(text:str)->List[Dict[str,Any]]:
+    seen=set(); out=[]
+    for m in ACTION_RE.finditer(text):
+        if m.group(1) in seen: continue
+        seen.add(m.group(1))
+        out.append({"summary":f"Подготовить отчёт по модулю {m.group(1)}","description":m.group(2).strip(),
+                    "labels":"отчёт, модуль, команда","due":"","comment":"","priority":"Medium"})
+    return out
+
+class FakeLLM:
+    def __init__(self, token_ms:float=1.0, prompt_ms:float=0.02, ctx:int=16384, model:str="llama-4-scout-fp8",
+                 latency_ms:float=0.0, error_rate:float=0.0, rate_429:float=0.0, retry_after:float=1.0, seed:int=0,
+                 hang_s:float=0.0, tail_rate:float=0.0, tail_ms:float=0.0, slots:int=0, schema:bool=True, prose_rate:float=0.0):
+        self.token_ms=token_ms; self.prompt_ms=prompt_ms; self.ctx=ctx; self.model=model
+        self.latency_ms=latency_ms; self.error_rate=error_rate; self.rate_429=rate_429; self.retry_after=retry_after
+        self.hang_s=hang_s; self.tail_rate=tail_rate; self.tail_ms=tail_ms
+        self.schema=schema; self.prose_rate=prose_rate   # принимает response_format; доля ответов без схемы с текстом вокруг JSON
+        self.sem=threading.Semaphore(slots) if slots>0 else None
+        self.stats={"requests":0,"prompt_tokens":0,"completion_tokens":0,"errors":0,"injected_500":0,"injected_429":0,"tails":0,"max_tokens":0,"schema_requests":0,"prose":0}
+        self.lock=threading.Lock(); self.srv=None; self.rnd=random.Random(seed)
+
+    # # fault: задержка сети, зависание, хвост и случайный сбой → (код, тело, заголовки) или None
+    def fault(self)->Any:
+        if self.latency_ms: time.sleep(self.latency_ms/1000.0)
+        if self.hang_s: time.sleep(self.hang_s)
+        with self.lock:
+            tail=self.rnd.random()<self.tail_rate
+            if tail: self.stats["tails"]+=1
+        if tail: time.sleep(self.tail_ms/1000.0)
+        with self.lock:
+            x=self.rnd.random()
+            if x<self.rate_429:
+                self.stats["injected_429"]+=1
+                return 429,{"error":{"message":"rate limited"}},{"Retry-After":f"{self.retry_after:g}"}
+            if x<self.rate_429+self.error_rate:
+                self.stats["injected_500"]+=1
+                return 500,{"error":{"message":"injected failure"}},{}
+        return None
+
+    # # reply: текст ответа «модели» на список сообщений; fmt — ответ по JSON-схеме ({"tasks": [...]}, без текста вокруг)
+    def reply(self, msgs:List[Dict[str,str]], fmt:bool=False)->str:
+        sys=" ".join(m.get("content","") for m in msgs if m.get("role")=="system")
+        last=msgs[-1].get("content","") if msgs else ""
+        if "JSON" not in sys: return last
+        done=set()
+        if len(msgs)>=3 and msgs[-2].get("role")=="assistant":
+            # продолжение оборванного ответа: текст — последнее сообщение пользователя до ответа, уже отданные задачи — в ответе
+            last=next((m.get("content","") for m in reversed(msgs[:-2]) if m.get("role")=="user"),"")
+            try: done={t.get("summary") for t in json.loads(msgs[-2].get("content",""))["tasks"]}
+            except Exception: pass
+        tasks=[t for t in fake_tasks(last) if t["summary"] not in done]
+        if fmt: return json.dumps({"tasks":tasks},ensure_ascii=False)
+        out=json.dumps(tasks,ensure_ascii=False)
+        with self.lock:
+            prose=self.rnd.random()<self.prose_rate
+            if prose: self.stats["prose"]+=1
+        return f"Вот задачи из текста:\n```json\n{out}\n```\nЕсли нужно, уточню сроки." if prose else out
+
+    # # complete: (status, body) с имитацией задержки генерации
+    def complete(self, body:Dict[str,Any], chat:bool)->Any:
+        msgs=body.get("messages") if chat else body.get("input")
+        msgs=msgs if isinstance(msgs,list) else [{"role":"user","content":str(msgs or "")}]
+        n_in=sum(tokens(m.get("content","")) for m in msgs)
+        if n_in>self.ctx:
+            with self.lock: self.stats["errors"]+=1
+            return 400,{"error":{"message":f"context length {n_in} exceeds {self.ctx}"}}
+        fmt=bool(body.get("response_format") or (body.get("text") or {}).get("format"))
+        if fmt and not self.schema: return 400,{"error":{"message":"response_format is not supported"}}
+        text=self.reply(msgs,fmt)
+        limit=int(body.get("max_tokens") or 4000)
+        with self.lock: self.stats["max_tokens"]+=limit; self.stats["schema_requests"]+=fmt
+        n_out=tokens(text); finish="stop"
+        if n_out>limit: text=text[:limit*3]; n_out=limit; finish="length"
+        if body.get("stream"):
+            time.sleep(n_in*self.prompt_ms/1000.0)
+            return 200,{"stream":text,"chat":chat,"finish":finish,"prompt_tokens":n_in}
+        if self.sem:
+            with self.sem: time.sleep((n_in*self.prompt_ms+n_out*self.token_ms)/1000.0)
+        else:
+            time.sleep((n_in*self.prompt_ms+n_out*self.token_ms)/1000.0)
+        with self.lock:
+            self.stats["requests"]+=1; self.stats["prompt_tokens"]+=n_in; self.stats["completion_tokens"]+=n_out
+        usage={"prompt_tokens":n_in,"completion_tokens":n_out}
+        if chat: return 200,{"choices":[{"message":{"role":"assistant","content":text},"finish_reason":finish}],"usage":usage}
+        return 200,{"output_text":text,"usage":usage}
+
+    def handler(self):
+        fake=self
+        class H(BaseHTTPRequestHandler):
+            def log_message(self,*a): pass
+            def send(self,code,obj,headers=None):
+                b=json.dumps(obj,ensure_ascii=False).encode("utf-8")
+                self.send_response(code); self.send_header("Content-Type","application/json")
+                for k,v in (headers or {}).items(): self.send_header(k,v)
+                self.send_header("Content-Length",str(len(b))); self.end_headers(); self.wfile.write(b)
+            # # sse: отдать текст SSE-событиями по ~4 токена, с задержкой генерации
+            def sse(self,res):
+                text,chat=res["stream"],res["chat"]
+                self.send_response(200); self.send_header("Content-Type","text/event-stream"); self.end_headers()
+                step=12
+                for i in range(0,len(text),step):
+                    piece=text[i:i+step]
+                    time.sleep(tokens(piece)*fake.token_ms/1000.0)
+                    ev={"choices":[{"delta":{"content":piece}}]} if chat else {"type":"response.output_text.delta","delta":piece}
+                    self.wfile.write(("data: "+json.dumps(ev,ensure_ascii=False)+"\n\n").encode("utf-8")); self.wfile.flush()
+                if not chat: self.wfile.write(b'data: {"type":"response.completed"}\n\n')
+                self.wfile.write(b"data: [DONE]\n\n"); self.wfile.flush()
+                with fake.lock:
+                    fake.stats["requests"]+=1; fake.stats["prompt_tokens"]+=res["prompt_tokens"]; fake.stats["completion_tokens"]+=tokens(text)
+            def do_GET(self):
+                f=fake.fault()
+                if f: return self.send(*f)
+                if self.path.rstrip("/").endswith("/v1/models"): return self.send(200,{"data":[{"id":fake.model}]})
+                self.send(404,{"error":"not found"})
+            def do_POST(self):
+                n=int(self.headers.get("Content-Length","0") or 0)
+                try: body=json.loads(self.rfile.read(n) or b"{}")
+                except Exception: return self.send(400,{"error":"bad json"})
+                f=fake.fault()
+                if f: return self.send(*f)
+                for suffix,chat in (("/v1/chat/completions",True),("/v1/responses",False)):
+                    if self.path.endswith(suffix):
+                        code,res=fake.complete(body,chat)
+                        return self.sse(res) if code==200 and "stream" in res else self.send(code,res)
+                self.send(404,{"error":"not found"})
+        return H
+
+    def start(self)->"FakeLLM":
+        self.srv=ThreadingHTTPServer(("127.0.0.1",0),self.handler())
+        self.srv.daemon_threads=True
+        threading.Thread(target=self.srv.serve_forever,daemon=True).start()
+        return self
+
+    def stop(self)->None:
+        if self.srv: self.srv.shutdown(); self.srv.server_close()
+
+    @property
+    def base(self)->str:
+        return f"http://127.0.0.1:{self.srv.server_address[1]}"
@@ -0,0 +1,74 @@
+# # fake_whisper: подмена WhisperModel для бенчмарков — сегменты отдаются лениво, с задержкой как у реального декодера
+import time
+from types import SimpleNamespace
+from typing import Any, Iterator, Tuple
+
+from fake_llm import synth_transcript
+
+class FakeWhisper:
+    # # seg_s — сек на сегмент; каждый сегмент — одно предложение synth_transcript.
+    # # per_audio — если на вход пришёл PCM (массив), сегментов столько, сколько 3-секундных кусков в нём (время ∝ длине записи)
+    def __init__(self, seg_s:float=0.05, tokens:int=4000, per_audio:bool=False):
+        self.seg_s=seg_s; self.tokens=tokens; self.per_audio=per_audio
+
+    def transcribe(self, path:Any, **kw)->Tuple[Iterator[Any],Any]:
+        sents=[x+"." for x in synth_transcript(self.tokens).split(". ") if x]
+        if self.per_audio and hasattr(path,"shape"):
+            n=int(len(path)/16000//3); sents=[sents[i%len(sents)] for i in range(n)]
+        def gen():
+            for i,s in enumerate(sents):
+                time.sleep(self.seg_s)
+                yield SimpleNamespace(start=float(i*3),end=float(i*3+2.5),text=" "+s.rstrip(".")+".")
+        return gen(), SimpleNamespace(language="ru",duration=float(len(sents)*3))
+
+# # fake_model: фабрика для jobs.JobQueue (процессы-воркеры импортируют её сами, поэтому — функция модуля)
+def fake_model(size:str, dev:str, compute:str, threads:int, seg_s:float=0.05)->FakeWhisper:
+    return FakeWhisper(seg_s,per_audio=True)
+
+# # ToneWhisper: «модель» для проверки шардов — слово = тон своей частоты (WORDS[k] ↔ TONE_HZ+TONE_STEP·k), сегмент —
+# # слова, между которыми пауза короче SEG_GAP_S. Результат зависит только от самих сэмплов, не от того, где начинается кусок:
+# # шардированный прогон обязан совпасть с обычным до таймкода.
+WORDS=["задача","отчёт","модуль","команда","срок","пятница","данные","релиз","тест","сервер","клиент","договор",
+       "встреча","бюджет","план","макет","счёт","доступ","ревью","демо"]
+TONE_HZ=300.0; TONE_STEP=40.0; SEG_GAP_S=0.6
+
+# # tone_audio: синтетическая запись ~seconds сек — сегменты по 1–3 слова (0.3 с слово, 0.15 с между словами),
+# # паузы между сегментами 0.7–3 с; начала слов кратны 10 мс → (PCM float32 16 кГц, эталонные сегменты)
+def tone_audio(seconds:float, seed:int=1)->Tuple[Any,list]:
+    import random
+    import numpy as np
+    rnd=random.Random(seed); sr=16000; parts=[]; segs=[]; t=0.5
+    parts.append(np.zeros(int(t*sr),dtype=np.float32))
+    while t<seconds:
+        ws=[rnd.randrange(len(WORDS)) for _ in range(rnd.randint(1,3))]; st=t
+        for j,k in enumerate(ws):
+            n=int(0.3*sr); x=np.arange(n)/sr
+            parts.append((0.5+0.3*np.cos(2*np.pi*(TONE_HZ+TONE_STEP*k)*x)).astype(np.float32)); t+=0.3
+            if j<len(ws)-1: parts.append(np.zeros(int(0.15*sr),dtype=np.float32)); t+=0.15
+        segs.append({"start":round(st,2),"end":round(t,2),"text":" "+" ".join(WORDS[k] for k in ws)})
+        gap=rnd.randrange(70,300)/100.0; parts.append(np.zeros(int(gap*sr),dtype=np.float32)); t+=gap
+    return np.concatenate(parts), segs
+
+class ToneWhisper:
+    # # transcribe: PCM → сегменты (звучащие участки, склеенные через паузы < SEG_GAP_S; слово — по пику спектра)
+    def transcribe(self, audio:Any, **kw)->Tuple[Iterator[Any],Any]:
+        import numpy as np
+        sr=16000; on=np.flatnonzero(np.abs(np.asarray(audio))>0.1)
+        runs=[]
+        if len(on):
+            br=np.flatnonzero(np.diff(on)>1)
+            runs=list(zip(np.r_[on[0],on[br+1]],np.r_[on[br],on[-1]]+1))
+        segs=[]
+        for a,b in runs:
+            x=np.asarray(audio[a:b],dtype=np.float64); x=x-x.mean()
+            hz=np.argmax(np.abs(np.fft.rfft(x)))*sr/len(x)
+            w=WORDS[min(len(WORDS)-1,max(0,int(round((hz-TONE_HZ)/TONE_STEP))))]
+            if segs and (a-segs[-1][1])/sr<SEG_GAP_S: segs[-1][1]=b; segs[-1][2].append(w)
+            else: segs.append([a,b,[w]])
+        out=[SimpleNamespace(start=int(a)/sr,end=int(b)/sr,text=" "+" ".join(ws)) for a,b,ws in segs]
+        return iter(out), SimpleNamespace(language="ru",duration=len(audio)/sr)
+
+# # tone_init: initializer процесса-шарда — ToneWhisper вместо WhisperModel (pipeline._shard_run берёт модель из _SHARD)
+def tone_init()->None:
+    import pipeline
+    pipeline._SHARD["model"]=ToneWhisper()
@@ -0,0 +1,211 @@
+# # cli: пакетная обработка записей без Streamlit (например, из cron по ночным встречам)
+# # Запуск:
+# #   python cli.py /data/meetings "/data/other/*.mp4" --out results.jsonl --lang ru \
+# #       --transcribe-workers 1 --llm-workers 2 [--jira --jira-project PRJ]
+# # Каждый обработанный файл — одна строка JSONL; повторный запуск пропускает файлы, уже записанные с ok=true.
+# # --merge-duplicates: задача, почти совпавшая с открытой задачей проекта (dedup, ≥ DUP_MERGE), уходит туда комментарием.
+# # По умолчанию этапы идут конвейером (stages.py): Whisper, правка и извлечение перекрываются; --serial — по файлу целиком.
+# # Готовые записи попадают и в историю встреч (store.py, встреча cli-<sha256 файла>) — их видно в интерфейсе.
+import os, sys, json, glob, time, signal, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+import pipeline as pl
+import jira_client as jc
+import stages
+import metrics
+import dedup
+from store import store
+
+# # collect_files: каталоги (рекурсивно) и glob-шаблоны → отсортированный список медиафайлов
+def collect_files(inputs:List[str])->List[str]:
+    out=set()
+    for x in inputs:
+        paths=[]
+        if os.path.isdir(x):
+            for root,_,names in os.walk(x):
+                paths.extend(os.path.join(root,n) for n in names)
+        else:
+            paths=glob.glob(x,recursive=True)
+        for p in paths:
+            if os.path.isfile(p) and p.rsplit(".",1)[-1].lower() in pl.SUPPORTED: out.add(os.path.abspath(p))
+    return sorted(out)
+
+# # done_files: файлы, уже успешно записанные в JSONL (для возобновления)
+def done_files(path:str)->Set[str]:
+    done=set()
+    if not os.path.exists(path): return done
+    with open(path,"r",encoding="utf-8") as f:
+        for line in f:
+            try: rec=json.loads(line)
+            except Exception: continue   # недописанная строка после обрыва
+            if rec.get("ok") and rec.get("file"): done.add(rec["file"])
+    return done
+
+# # process_file: расшифровка → правка → задачи → (Jira); число одновременных этапов ограничено семафорами
+def process_file(path:str, a:argparse.Namespace, sem:Dict[str,threading.Semaphore])->Dict[str,Any]:
+    rec:Dict[str,Any]={"file":path,"name":os.path.basename(path),"ok":False,"timings":{}}
+    tm=rec["timings"]
+    try:
+        with sem["transcribe"]:
+            t0=time.perf_counter()
+            info={}; segs=list(pl.transcribe_iter(path,a.lang,info))
+            tm["transcribe_s"]=round(time.perf_counter()-t0,3)
+        parts=[x["text"] for x in segs]
+        raw="".join(parts).strip()
+        rec.update({"digest":info.get("digest",""),"language":info.get("language",""),"duration":info.get("duration",0.0),"transcript_cached":info["cached"],"model":info.get("model",""),"shards":info.get("shards",1),
+                    "segments":segs,"transcript_raw":raw,"resources":{**info.get("pcm",{}),**pl.rss_peak_mb()}})
+        with sem["llm"]:
+            t0=time.perf_counter()
+            text=pl.llama_clean(raw,parts,refresh=a.refresh)[0] if raw and not a.no_clean else raw
+            tm["clean_s"]=round(time.perf_counter()-t0,3)
+            t0=time.perf_counter()
+            tasks=pl.llama_extract(text,refresh=a.refresh)[0] if text.strip() else []
+            tasks=pl.normalize_tasks_after_extraction(tasks,text)
+            tm["extract_s"]=round(time.perf_counter()-t0,3)
+        rec.update({"transcript":text,"tasks":tasks})
+        submit_jira(rec,a,sem)
+    except Exception as e:
+        rec["error"]=f"{type(e).__name__}: {e}"
+    rec["finished_at"]=pl.kz_now().isoformat(timespec="seconds")
+    return rec
+
+# # submit_jira: создать задачи записи в Jira (если --jira); ok — нет ошибок Jira
+def submit_jira(rec:Dict[str,Any], a:argparse.Namespace, sem:Dict[str,threading.Semaphore])->None:
+    rec.update({"created":[],"merged":[],"jira_errors":[],"jira_keys":{}})
+    tasks=rec.get("tasks") or []
+    if a.jira and tasks:
+        with sem["jira"]:
+            t0=time.perf_counter()
+            pl.prepare_due(tasks)
+            if a.merge_duplicates:
+                try: dedup.find_duplicates(a.jira_url,a.jira_email,a.jira_token,a.jira_project,tasks,threshold=dedup.DUP_MERGE,k=1)
+                except Exception as e: rec["jira_errors"].append(f"dedup: {type(e).__name__}: {e}")
+                for t in tasks:
+                    if t.get("dups"): t["merge_into"]=t["dups"][0]["key"]
+            for t,r in zip(tasks,jc.jira_submit(a.jira_url,a.jira_email,a.jira_token,a.jira_project,tasks,issuetype=a.jira_issuetype)):
+                if r.get("ok") and r.get("key"): rec["jira_keys"][t["id"]]=r["key"]
+                if r.get("merged"): rec["merged"].append(r["key"])
+                elif r.get("ok"): rec["created"].append(r.get("key") or r.get("id"))
+                else: rec["jira_errors"].append(r.get("error",""))
+                if r.get("comment_error"): rec["jira_errors"].append(r["comment_error"])
+            rec["timings"]["jira_s"]=round(time.perf_counter()-t0,3)
+    rec["ok"]=not rec["jira_errors"]
+
+# # job_record: запись JSONL по файлу, прошедшему конвейер stages.Pipeline
+def job_record(job:stages.Job)->Dict[str,Any]:
+    segs=job.segments
+    rec:Dict[str,Any]={"file":job.path,"name":os.path.basename(job.path),"ok":False,"timings":dict(job.timings),
+                       "digest":job.info.get("digest",""),"language":job.info.get("language",""),"duration":job.info.get("duration",0.0),
+                       "transcript_cached":job.info.get("cached",False),"model":job.info.get("model",""),"shards":job.info.get("shards",1),"segments":segs,
+                       "transcript_raw":"".join(x["text"] for x in segs).strip(),"transcript":job.transcript,"tasks":job.tasks,
+                       "created":[],"merged":[],"jira_errors":[],"resources":{**job.info.get("pcm",{}),**pl.rss_peak_mb()}}
+    if job.error: rec["error"]=job.error
+    return rec
+
+# # save_history: запись JSONL → история встреч (расшифровка, задачи, ключи Jira); без расшифровки — не сохраняем
+def save_history(rec:Dict[str,Any], project:str)->None:
+    if not rec.get("digest") or not rec.get("transcript"): return
+    mid="cli-"+rec["digest"][:16]; s=store()
+    s.put_meeting(mid,name=rec["name"],file_hash=rec["digest"],source="cli",language=rec.get("language",""),duration=rec.get("duration",0.0),
+                  model=rec.get("model",""),transcript=rec["transcript"])
+    s.put_tasks(mid,rec.get("tasks") or [])
+    s.put_jira(mid,project,list(rec.get("jira_keys",{}).items()))
+
+def main(argv:Optional[List[str]]=None)->int:
+    ap=argparse.ArgumentParser(description="Whisper → LLaMA → Jira: пакетная обработка записей")
+    ap.add_argument("inputs",nargs="+",help="каталоги или glob-шаблоны медиафайлов")
+    ap.add_argument("--out",default="results.jsonl",help="JSONL с результатами (дописывается)")
+    ap.add_argument("--lang",default="auto",help="язык Whisper: auto, ru, en, kk, tr")
+    ap.add_argument("--transcribe-workers",type=int,default=1,help="одновременных расшифровок")
+    ap.add_argument("--llm-workers",type=int,default=2,help="файлов одновременно на этапе LLM")
+    ap.add_argument("--jira-workers",type=int,default=1,help="файлов одновременно на этапе Jira")
+    ap.add_argument("--no-clean",action="store_true",help="не править текст через LLM")
+    ap.add_argument("--refresh",action="store_true",help="не брать ответы LLM из кэша")
+    ap.add_argument("--no-resume",action="store_true",help="обработать и уже готовые файлы")
+    ap.add_argument("--serial",action="store_true",help="без конвейера: каждый файл целиком, этап за этапом")
+    ap.add_argument("--report",default="",help="сохранить отчёт о перекрытии этапов в JSON")
+    ap.add_argument("--jira",action="store_true",help="создавать задачи в Jira")
+    ap.add_argument("--jira-url",default=os.getenv("JIRA_URL",""))
+    ap.add_argument("--jira-email",default=os.getenv("JIRA_EMAIL",""))
+    ap.add_argument("--jira-project",default=os.getenv("JIRA_PROJECT",""))
+    ap.add_argument("--jira-issuetype",default=jc.JIRA_ISSUE_TYPE)
+    ap.add_argument("--merge-duplicates",action="store_true",help="почти совпавшие с открытыми задачами Jira — комментарием в них, а не новой задачей")
+    a=ap.parse_args(argv)
+    a.jira_token=os.getenv("JIRA_API_TOKEN","")   # токен — только из окружения, не из argv
+    if a.jira:
+        miss=[n for n,v in (("--jira-url",a.jira_url),("--jira-email",a.jira_email),("JIRA_API_TOKEN",a.jira_token),("--jira-project",a.jira_project)) if not v]
+        if miss: ap.error("для --jira не заданы: "+", ".join(miss))
+
+    files=collect_files(a.inputs)
+    done=set() if a.no_resume else done_files(a.out)
+    todo=[f for f in files if f not in done]
+    print(f"файлов: {len(files)}, уже готово: {len(files)-len(todo)}, к обработке: {len(todo)}",file=sys.stderr)
+    if not todo: return 0
+
+    sem={"transcribe":threading.Semaphore(max(1,a.transcribe_workers)),"llm":threading.Semaphore(max(1,a.llm_workers)),
+         "jira":threading.Semaphore(max(1,a.jira_workers))}
+    lock=threading.Lock(); stop=threading.Event(); failed=[0]
+    metrics.serve()
+    signal.signal(signal.SIGTERM,lambda *_: stop.set())
+    os.makedirs(os.path.dirname(os.path.abspath(a.out)),exist_ok=True)
+
+    with open(a.out,"a",encoding="utf-8") as out:
+        # строка пишется целиком и сразу на диск — после обрыва продолжаем с этого места
+        def write(rec:Dict[str,Any])->None:
+            save_history(rec,a.jira_project)
+            with lock:
+                out.write(json.dumps(rec,ensure_ascii=False)+"\n"); out.flush(); os.fsync(out.fileno())
+                if not rec["ok"]: failed[0]+=1
+            print(("ok   " if rec["ok"] else "FAIL ")+rec["file"]+("" if rec["ok"] else "  "+rec.get("error","; ".join(rec.get("jira_errors",[]))[:200])),file=sys.stderr)
+        if a.serial: run_serial(todo,a,sem,write,stop)
+        else: run_pipelined(todo,a,sem,write,stop)
+    store().flush(); metrics.flush(force=True)
+    return 1 if failed[0] else 0
+
+# # run_serial: файлы параллельно, но каждый — этап за этапом (process_file)
+def run_serial(todo:List[str], a:argparse.Namespace, sem:Dict[str,threading.Semaphore], write:Any, stop:threading.Event)->None:
+    def run(path:str)->None:
+        if stop.is_set(): return
+        tr=metrics.Trace(path)
+        with metrics.use(tr): rec=process_file(path,a,sem)
+        rec["metrics"]=tr.summary(); write(rec)
+    # потоков хватает, чтобы этапы разных файлов шли одновременно; лимиты — семафоры этапов
+    workers=max(1,a.transcribe_workers)+max(1,a.llm_workers)+(max(1,a.jira_workers) if a.jira else 0)
+    ex=ThreadPoolExecutor(max_workers=workers)
+    try:
+        for f in [ex.submit(run,p) for p in todo]: f.result()
+    except KeyboardInterrupt:
+        stop.set()
+        print("остановка: дожидаемся начатых файлов…",file=sys.stderr)
+    finally:
+        ex.shutdown(wait=True,cancel_futures=True)
+
+# # run_pipelined: конвейер stages.Pipeline; Jira — отдельным пулом по мере готовности файлов
+def run_pipelined(todo:List[str], a:argparse.Namespace, sem:Dict[str,threading.Semaphore], write:Any, stop:threading.Event)->None:
+    p=stages.Pipeline(a.transcribe_workers,a.llm_workers).start(todo,a.lang,not a.no_clean,True,a.refresh)
+    # SIGTERM приходит в главный поток — достаточно остановить конвейер
+    signal.signal(signal.SIGTERM,lambda *_: (stop.set(),p.cancel()))
+    def finish(job:stages.Job)->None:
+        rec=job_record(job)
+        if not job.error:
+            with metrics.use(job.trace): submit_jira(rec,a,sem)
+        rec["metrics"]=job.trace.summary()
+        rec["finished_at"]=pl.kz_now().isoformat(timespec="seconds")
+        write(rec)
+    ex=ThreadPoolExecutor(max_workers=max(1,a.jira_workers))
+    try:
+        for job in p.results(): ex.submit(finish,job)
+    except KeyboardInterrupt:
+        p.cancel()
+        print("остановка: дописываем готовые файлы…",file=sys.stderr)
+    finally:
+        ex.shutdown(wait=True); p.join()
+    rep=p.report()
+    print("конвейер: "+", ".join(f"{k}={v}" for k,v in rep.items() if k in ("wall_s","serial_s","speedup","stages_overlap_s"))+
+          "; занятость этапов, с: "+json.dumps(rep["busy_s"]),file=sys.stderr)
+    if a.report:
+        with open(a.report,"w",encoding="utf-8") as f: json.dump(rep,f,ensure_ascii=False,indent=2)
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+# # dedup: поиск дубликатов среди открытых задач проекта Jira до отправки — локальный индекс MinHash + LSH
+# # Индекс на пару «сайт + проект»: нормализованные основы слов темы → подпись MinHash → корзины LSH (кандидаты без перебора
+# # всех задач), точная оценка — Жаккар по основам. Синхронизация инкрементальная (JQL updated >= -Nm), файл — CACHE_DIR/jira_index.
+import os, re, json, time, hashlib, threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import metrics
+import jira_client as jc
+from pipeline import CACHE_DIR, LazyModule
+
+np = LazyModule("numpy")
+
+DUP_THRESHOLD = float(os.getenv("DUP_THRESHOLD", "0.5"))           # оценка, с которой существующая задача — кандидат в дубликаты
+DUP_MERGE     = float(os.getenv("DUP_MERGE", "0.8"))               # cli --merge-duplicates: с такой оценки задача уходит комментарием
+DUP_SYNC_TTL  = int(os.getenv("DUP_SYNC_TTL", "300"))              # сек между синхронизациями индекса с Jira
+DUP_JQL       = os.getenv("DUP_JQL", "statusCategory != Done")     # какие задачи проекта держать в индексе
+MH_ROWS, MH_BANDS = 3, 30                                           # LSH 30 полос × 3 строки: J=0.5 → кандидат с вер. 0.98, J=0.2 → 0.21
+STEM_LEN = 5                                                        # основа слова — первые 5 букв (отчёт/отчёта/отчёты → отчет)
+STOP = set("и в во на по к ко с со о об от до для из за у а но или не ни что как это то же бы ли the a an to of for and or in on at by with is be".split())
+
+# # tokens: основы значимых слов текста (нижний регистр, ё → е, без стоп-слов и чисел)
+def tokens(text:str)->Set[str]:
+    words=re.findall(r"[^\W\d_]+",str(text or "").lower().replace("ё","е"))
+    return {w[:STEM_LEN] for w in words if len(w)>1 and w not in STOP}
+
+# # _mix: splitmix64 по массиву uint64 — независимые хэш-функции MinHash без умножения по модулю (переполнение — часть хэша)
+def _mix(x:Any)->Any:
+    x=x^(x>>np.uint64(30)); x=x*np.uint64(0xBF58476D1CE4E5B9)
+    x=x^(x>>np.uint64(27)); x=x*np.uint64(0x94D049BB133111EB)
+    return x^(x>>np.uint64(31))
+
+# # band_keys: ключи корзин LSH наборов основ — массив (наборы × MH_BANDS) uint64; пустой набор — строка нулей.
+# # Подписи MinHash считаются пачкой: хэш основы × MH_ROWS·MH_BANDS функций, минимум по основам набора.
+def band_keys(token_sets:List[Set[str]])->Any:
+    out=np.zeros((len(token_sets),MH_BANDS),dtype=np.uint64)
+    live=[i for i,ts in enumerate(token_sets) if ts]
+    if not live: return out
+    vocab:Dict[str,int]={}; flat:List[int]=[]; starts:List[int]=[]
+    for i in live:
+        starts.append(len(flat)); flat.extend(vocab.setdefault(t,len(vocab)) for t in token_sets[i])
+    base=np.array([int.from_bytes(hashlib.blake2b(t.encode("utf-8"),digest_size=8).digest(),"little") for t in vocab],dtype=np.uint64)
+    seeds=_mix(np.arange(1,MH_ROWS*MH_BANDS+1,dtype=np.uint64))
+    h=_mix(base[:,None]^seeds[None,:])                                       # основа × хэш-функция
+    sig=np.minimum.reduceat(h[np.array(flat)],np.array(starts),axis=0)     # набор × хэш-функция
+    sig=sig.reshape(len(live),MH_BANDS,MH_ROWS)
+    out[np.array(live)]=_mix(sig[:,:,0]^_mix(sig[:,:,1]^_mix(sig[:,:,2]^np.arange(MH_BANDS,dtype=np.uint64))))|np.uint64(1)
+    return out
+
+# # jaccard: точная оценка сходства двух наборов основ
+def jaccard(a:Set[str], b:Set[str])->float:
+    return len(a&b)/len(a|b) if a and b else 0.0
+
+# # Index: открытые задачи проекта. Строка на задачу: тема, основы, ключи корзин LSH (матрица bands).
+# # Поиск кандидатов — по отсортированным ключам строк до frozen (searchsorted) и перебором свежих строк после неё;
+# # свежих больше COMPACT_MIN или 10% — перестройка. Удалённые/изменённые строки гасятся в alive до перестройки.
+class Index:
+    COMPACT_MIN = 2000
+
+    def __init__(self, site:str, project:str):
+        self.site=site; self.project=project; self.jql=DUP_JQL; self.synced=0.0
+        self.rows:Dict[str,int]={}; self.keys:List[str]=[]; self.summaries:List[str]=[]; self.toks:List[Set[str]]=[]
+        self.bands=np.zeros((0,MH_BANDS),dtype=np.uint64); self.alive=np.zeros(0,dtype=bool)
+        self.frozen=0; self.fkeys=np.zeros(0,dtype=np.uint64); self.frows=np.zeros(0,dtype=np.int64)
+        self.lock=threading.RLock()
+
+    def __len__(self)->int:
+        return len(self.rows)
+
+    # # put: добавить/обновить задачи (ключ, тема) — пачкой, подписи считаются за один проход
+    def put(self, pairs:Iterable[Tuple[str,str]])->int:
+        pairs=list(pairs)
+        if not pairs: return 0
+        toks=[tokens(s) for _,s in pairs]
+        bk=band_keys(toks)
+        with self.lock:
+            for key,_ in pairs: self.drop(key)
+            n=len(self.keys)
+            for i,(key,summary) in enumerate(pairs):
+                self.rows[key]=n+i; self.keys.append(key); self.summaries.append(summary); self.toks.append(toks[i])
+            self.bands=np.concatenate([self.bands,bk]); self.alive=np.concatenate([self.alive,np.ones(len(pairs),dtype=bool)])
+            if len(self.keys)-self.frozen>max(self.COMPACT_MIN,len(self.rows)//10): self.compact()
+        return len(pairs)
+
+    def drop(self, key:str)->bool:
+        with self.lock:
+            r=self.rows.pop(key,None)
+            if r is None: return False
+            self.alive[r]=False; self.summaries[r]=""; self.toks[r]=set()
+            return True
+
+    # # compact: убрать погашенные строки и отсортировать ключи корзин всех строк
+    def compact(self)->None:
+        with self.lock:
+            live=np.flatnonzero(self.alive)
+            self.keys=[self.keys[r] for r in live]; self.summaries=[self.summaries[r] for r in live]; self.toks=[self.toks[r] for r in live]
+            self.bands=self.bands[live]; self.alive=np.ones(len(live),dtype=bool)
+            self.rows={k:i for i,k in enumerate(self.keys)}
+            flat=self.bands.ravel(); order=np.argsort(flat,kind="stable")
+            self.fkeys=flat[order]; self.frows=order//MH_BANDS; self.frozen=len(self.keys)
+
+    # # candidates: строки, совпавшие с bk хотя бы по одной корзине
+    def candidates(self, bk:Any)->Set[int]:
+        lo=np.searchsorted(self.fkeys,bk,"left"); hi=np.searchsorted(self.fkeys,bk,"right")
+        rows=[self.frows[a:b] for a,b in zip(lo.tolist(),hi.tolist()) if b>a]
+        fresh=self.bands[self.frozen:]
+        if len(fresh): rows.append(self.frozen+np.flatnonzero((fresh==bk[None,:]).any(axis=1)))
+        if not rows: return set()
+        rows=np.unique(np.concatenate(rows))
+        return set(rows[self.alive[rows]].tolist())
+
+    # # query: до k задач индекса, похожих на text (оценка ≥ threshold), по убыванию оценки
+    def query(self, text:str, k:int=3, threshold:float=DUP_THRESHOLD)->List[Dict[str,Any]]:
+        toks=tokens(text)
+        if not toks: return []
+        bk=band_keys([toks])[0]
+        with self.lock:
+            out=[]
+            for r in self.candidates(bk):
+                s=jaccard(toks,self.toks[r])
+                if s>=threshold: out.append({"key":self.keys[r],"summary":self.summaries[r],"score":round(s,3)})
+        return sorted(out,key=lambda x:(-x["score"],x["key"]))[:k]
+
+    def to_dict(self)->Dict[str,Any]:
+        with self.lock:
+            return {"site":self.site,"project":self.project,"jql":self.jql,"synced":self.synced,
+                    "issues":{k:self.summaries[r] for k,r in self.rows.items()}}
+
+# # _index_path: файл индекса пары «сайт + проект»
+def _index_path(site:str, project:str)->str:
+    return os.path.join(CACHE_DIR,"jira_index",hashlib.sha1((site+"|"+project).encode("utf-8")).hexdigest()[:16]+".json")
+
+# # _save: индекс на диск (атомарно)
+def _save(ix:Index)->None:
+    path=_index_path(ix.site,ix.project)
+    try:
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        tmp=f"{path}.{os.getpid()}.tmp"
+        with open(tmp,"w",encoding="utf-8") as f: json.dump(ix.to_dict(),f,ensure_ascii=False)
+        os.replace(tmp,path)
+    except Exception: pass
+
+# # _INDEX: индексы в памяти (ключ — URL сайта + проект), на процесс
+_INDEX:Dict[str,Any]={"lock":threading.Lock(),"items":{}}
+
+# # index_for: индекс проекта — из памяти, иначе с диска (если собран для того же DUP_JQL), иначе пустой
+def index_for(base:str, project:str)->Index:
+    site=base.strip().rstrip("/"); project=project.strip().upper(); key=site+"|"+project
+    with _INDEX["lock"]:
+        ix=_INDEX["items"].get(key)
+        if ix is not None: return ix
+        ix=Index(site,project)
+        try:
+            with open(_index_path(site,project),"r",encoding="utf-8") as f: data=json.load(f)
+            if data.get("jql")==DUP_JQL:
+                ix.put((data.get("issues") or {}).items())
+                ix.synced=float(data.get("synced") or 0.0)
+        except Exception: pass
+        _INDEX["items"][key]=ix
+        return ix
+
+# # sync: догнать индекс до Jira — первый раз все задачи по DUP_JQL, дальше только изменённые с прошлой синхронизации
+# # (подошедшие под DUP_JQL — добавить/обновить, остальные, например закрытые, — убрать); → {"full","put","dropped","issues"}
+def sync(base:str, email:str, token:str, project:str, force:bool=False)->Dict[str,Any]:
+    ix=index_for(base,project)
+    with ix.lock:
+        fresh=not force and time.time()-ix.synced<DUP_SYNC_TTL
+        metrics.count("app_cache_hits_total" if fresh else "app_cache_misses_total",cache="jira_index")
+        if fresh: return {"full":False,"put":0,"dropped":0,"issues":len(ix)}
+        t0=time.time(); full=not ix.synced; prj=json.dumps(ix.project); put=dropped=0
+        with metrics.span("dup_sync",full=full) as sp:
+            # относительное время JQL не зависит от часового пояса профиля; +2 мин — запас на округление
+            since="" if full else f" AND updated >= -{int((t0-ix.synced)//60)+2}m"
+            page:List[Tuple[str,str]]=[]
+            for iss in jc.jira_search(base,email,token,f"project = {prj}{since} AND ({DUP_JQL}) ORDER BY updated ASC",["summary"]):
+                page.append((iss["key"],(iss.get("fields") or {}).get("summary") or ""))
+                if len(page)>=1000: put+=ix.put(page); page=[]
+            put+=ix.put(page)
+            if not full:
+                for iss in jc.jira_search(base,email,token,f"project = {prj}{since} AND NOT ({DUP_JQL})",[]):
+                    dropped+=ix.drop(iss["key"])
+            sp.update({"put":put,"dropped":dropped})
+        ix.synced=t0
+        _save(ix)
+        return {"full":full,"put":put,"dropped":dropped,"issues":len(ix)}
+
+# # find_duplicates: синхронизировать индекс и проставить задачам dups — [{"key","summary","score"}] (пустой — похожих нет)
+def find_duplicates(base:str, email:str, token:str, project:str, tasks:List[Dict[str,Any]],
+                    threshold:float=DUP_THRESHOLD, k:int=3, force:bool=False)->Dict[str,Any]:
+    st=sync(base,email,token,project,force=force)
+    ix=index_for(base,project)
+    with metrics.span("dup_query",tasks=len(tasks)):
+        for t in tasks: t["dups"]=ix.query(t.get("summary") or "",k,threshold)
+    return {**st,"found":sum(1 for t in tasks if t["dups"])}
@@ -0,0 +1,397 @@
+# # jira_client: Jira Cloud REST (метаданные проекта, bulk-создание, комментарии)
+# # Все запросы идут через jira_request: AIMD-лимит одновременных запросов, Retry-After, экспоненциальные паузы с джиттером.
+from __future__ import annotations
+import os, re, json, time, random, hashlib, threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from pipeline import MAX_SUMMARY, LazyModule, to_iso, parse_due_kz, infer_due_from_text
+import metrics
+
+requests = LazyModule("requests")   # импорт — при первом запросе к Jira
+
+# # Jira config
+JIRA_CONCURRENCY = int(os.getenv("JIRA_CONCURRENCY", "8"))   # параллельных запросов к Jira
+JIRA_BULK_SIZE   = 50                                         # лимит /rest/api/3/issue/bulk
+JIRA_ISSUE_TYPE  = os.getenv("JIRA_ISSUE_TYPE", "Task")
+JIRA_META_TTL    = int(os.getenv("JIRA_META_TTL", "3600"))   # сек, кэш метаданных проекта
+JIRA_META_FAIL_TTL = int(os.getenv("JIRA_META_FAIL_TTL", "60"))  # сек, столько помним неудачный запрос метаданных
+JIRA_RETRIES     = int(os.getenv("JIRA_RETRIES", "5"))        # повторов запроса (429, 5xx, обрыв соединения)
+JIRA_BACKOFF_S   = float(os.getenv("JIRA_BACKOFF_S", "0.5"))  # база экспоненциальной паузы между повторами
+JIRA_BACKOFF_MAX = 30.0                                        # потолок паузы и Retry-After, сек
+JIRA_IDEM_PREFIX = os.getenv("JIRA_IDEM_PREFIX", "tasker-")   # метка идемпотентности задачи; "" — выкл.
+RETRY_SAFE       = (429,503)       # запрос не выполнен — повторяем любой
+RETRY_AMBIGUOUS  = (500,502,504)   # мог выполниться — создание сверяем по метке, а не повторяем вслепую
+
+# # jira_session: общий keep-alive Session для Jira (пул соединений, один на процесс)
+_SESSION:Dict[str,Any]={"lock":threading.Lock(),"ses":None}
+def jira_session()->requests.Session:
+    with _SESSION["lock"]:
+        if _SESSION["ses"] is None: _SESSION["ses"]=_new_session()
+        return _SESSION["ses"]
+
+# # _new_session: Session с пулом соединений под JIRA_CONCURRENCY
+def _new_session()->requests.Session:
+    ses=requests.Session()
+    ad=requests.adapters.HTTPAdapter(pool_connections=4,pool_maxsize=max(4,JIRA_CONCURRENCY))
+    ses.mount("https://",ad); ses.mount("http://",ad)
+    ses.headers.update({"Accept":"application/json","Content-Type":"application/json"})
+    return ses
+
+# # AdaptiveLimit: AIMD-лимит одновременных запросов к сайту — 429 делит лимит пополам, каждый успех даёт +1/лимит
+class AdaptiveLimit:
+    def __init__(self, cap:int):
+        self.cap=max(1,cap); self.limit=float(self.cap); self.inflight=0; self.until=0.0; self.cut=0.0
+        self.cv=threading.Condition()
+
+    def acquire(self)->None:
+        with self.cv:
+            while True:
+                wait=self.until-time.monotonic()
+                if wait<=0 and self.inflight<int(self.limit): break
+                self.cv.wait(wait if wait>0 else None)
+            self.inflight+=1
+
+    # # release: throttled — ответ 429; retry_after — пауза для всех запросов к сайту
+    def release(self, throttled:bool=False, retry_after:float=0.0)->None:
+        with self.cv:
+            self.inflight-=1; now=time.monotonic()
+            if throttled:
+                # волна 429 от уже отправленных параллельных запросов — одно снижение, а не log2(N)
+                if now-self.cut>max(retry_after,1.0): self.limit=max(1.0,self.limit/2); self.cut=now
+                self.until=max(self.until,now+retry_after)
+            else:
+                self.limit=min(float(self.cap),self.limit+1.0/self.limit)
+            self.cv.notify_all()
+
+# # _jira_limit: AdaptiveLimit сайта (по хосту URL), на процесс
+_LIMITS:Dict[str,Any]={"lock":threading.Lock(),"items":{}}
+def _jira_limit(url:str)->AdaptiveLimit:
+    host=url.split("://",1)[-1].split("/",1)[0].lower()
+    with _LIMITS["lock"]:
+        if host not in _LIMITS["items"]: _LIMITS["items"][host]=AdaptiveLimit(JIRA_CONCURRENCY)
+        return _LIMITS["items"][host]
+
+# # jira_limits: текущие лимиты по сайтам (хост → лимит, в работе)
+def jira_limits()->Dict[str,Dict[str,Any]]:
+    with _LIMITS["lock"]:
+        return {h:{"limit":int(l.limit),"inflight":l.inflight} for h,l in _LIMITS["items"].items()}
+
+# # retry_after: пауза из Retry-After (секунды или HTTP-дата), не больше JIRA_BACKOFF_MAX; 0 — заголовка нет
+def retry_after(r:Any)->float:
+    v=str((getattr(r,"headers",None) or {}).get("Retry-After","") or "").strip()
+    if not v: return 0.0
+    try: sec=float(v)
+    except ValueError:
+        try: sec=parsedate_to_datetime(v).timestamp()-time.time()
+        except Exception: return 0.0
+    return max(0.0,min(JIRA_BACKOFF_MAX,sec))
+
+# # backoff: экспоненциальная пауза с полным джиттером (попытка 0, 1, 2…)
+def backoff(attempt:int)->float:
+    return random.uniform(JIRA_BACKOFF_S/2,min(JIRA_BACKOFF_MAX,JIRA_BACKOFF_S*2**attempt))
+
+# # retryable: код ответа (0 — исключение) стоит повторить/сверить
+def retryable(code:int)->bool:
+    return code==0 or code in RETRY_SAFE or code in RETRY_AMBIGUOUS
+
+# # jira_request: запрос к Jira под AIMD-лимитом; 429/503 — повтор после Retry-After (или паузы backoff);
+# # 5xx и обрыв — повтор, только если retry_ambiguous (чтение, поиск). Попытки кончились — последний ответ или исключение.
+def jira_request(method:str,url:str,email:str,token:str,retry_ambiguous:bool=True,**kw:Any)->requests.Response:
+    lim=_jira_limit(url); fn=getattr(jira_session(),method.lower())
+    for attempt in range(JIRA_RETRIES+1):
+        r=None; err=None
+        lim.acquire()
+        try: r=metrics.http("jira",fn,url,auth=(email,token),**kw)
+        except requests.RequestException as e: err=e
+        code=r.status_code if r is not None else 0
+        ra=retry_after(r) if code in RETRY_SAFE else 0.0
+        lim.release(throttled=code==429,retry_after=ra)
+        # до сервера не дошли (ConnectTimeout) — как 503; иной обрыв мог случиться после отправки тела
+        safe=code in RETRY_SAFE or isinstance(err,requests.ConnectTimeout)
+        if attempt==JIRA_RETRIES or not (safe or (retry_ambiguous and retryable(code))):
+            if err is not None: raise err
+            return r
+        metrics.count("app_retries_total",target="jira",reason=str(code) if code else type(err).__name__)
+        time.sleep(ra+random.uniform(0,min(1.0,ra/4)) if ra else backoff(attempt))
+
+# # jira_priorities: все приоритеты сайта (имя в нижнем регистре → id)
+def jira_priorities(base:str,email:str,token:str)->Optional[Dict[str,str]]:
+    try:
+        r=jira_request("GET",base.rstrip("/")+"/rest/api/3/priority",email,token,timeout=40)
+        if r.status_code>=300: return None
+        return {str(it.get("name","")).lower():str(it.get("id")) for it in r.json() if it.get("id")}
+    except Exception: return None
+
+# # _jira_issuetypes: типы задач проекта из createmeta (имя в нижнем регистре → {id,name})
+def _jira_issuetypes(base:str,email:str,token:str,project:str)->Optional[Dict[str,Dict[str,str]]]:
+    b=base.rstrip("/")
+    try:
+        r=jira_request("GET",b+f"/rest/api/3/issue/createmeta/{project}/issuetypes",email,token,params={"maxResults":200},timeout=40)
+        if r.status_code<300:
+            data=r.json(); arr=data.get("issueTypes") or data.get("values") or []
+        else:
+            # старый createmeta (до перехода Atlassian на постраничный API)
+            r=jira_request("GET",b+"/rest/api/3/issue/createmeta",email,token,params={"projectKeys":project},timeout=40)
+            if r.status_code>=300: return None
+            prj=(r.json().get("projects") or [{}])[0]
+            arr=prj.get("issuetypes") or []
+        return {str(x.get("name","")).lower():{"id":str(x.get("id")),"name":x.get("name","")} for x in arr if x.get("id")}
+    except Exception: return None
+
+# # _jira_screen_fields: поля экрана создания для типа задачи (fieldId → описание поля)
+def _jira_screen_fields(base:str,email:str,token:str,project:str,type_id:str)->Optional[Dict[str,Any]]:
+    b=base.rstrip("/")
+    try:
+        r=jira_request("GET",b+f"/rest/api/3/issue/createmeta/{project}/issuetypes/{type_id}",email,token,params={"maxResults":200},timeout=40)
+        if r.status_code<300:
+            data=r.json(); arr=data.get("fields") or data.get("results") or data.get("values") or []
+            return {str(f.get("fieldId") or f.get("key")):f for f in arr if f.get("fieldId") or f.get("key")}
+        r=jira_request("GET",b+"/rest/api/3/issue/createmeta",email,token,
+                       params={"projectKeys":project,"issuetypeIds":type_id,"expand":"projects.issuetypes.fields"},timeout=40)
+        if r.status_code>=300: return None
+        prj=(r.json().get("projects") or [{}])[0]
+        its=prj.get("issuetypes") or [{}]
+        return dict(its[0].get("fields") or {})
+    except Exception: return None
+
+# # _jira_meta_store: кэш метаданных Jira (ключ — URL сайта + проект), на процесс; locks — замок на ключ
+_META:Dict[str,Any]={"lock":threading.Lock(),"items":{},"locks":{}}
+def _jira_meta_store()->Dict[str,Any]:
+    return _META
+
+# # jira_meta: метаданные проекта — тип задачи, поля экрана создания, приоритеты (TTL + refresh);
+# # неудачный запрос (сеть, 401) помнится JIRA_META_FAIL_TTL, а не весь JIRA_META_TTL
+def jira_meta(base:str,email:str,token:str,project:str,issuetype:str=JIRA_ISSUE_TYPE,refresh:bool=False)->Dict[str,Any]:
+    key=base.strip().rstrip("/")+"|"+project.strip().upper()
+    store=_jira_meta_store()
+    with store["lock"]: lock=store["locks"].setdefault(key,threading.Lock())
+    # запросы к Jira (с повторами — минуты) — под замком своего сайта и проекта: другие сайты и проекты их не ждут
+    with lock:
+        m=store["items"].get(key)
+        stale=refresh or not m or time.time()-m["ts"]>m["ttl"]
+        metrics.count("app_cache_misses_total" if stale else "app_cache_hits_total",cache="jira_meta")
+        if stale:
+            m={"ts":time.time(),"ttl":JIRA_META_TTL,"types":_jira_issuetypes(base,email,token,project),"fields":{},"priorities":None}
+            store["items"][key]=m
+        def failed()->None: m["ttl"]=min(m["ttl"],time.time()-m["ts"]+JIRA_META_FAIL_TTL)
+        if m["types"] is None: failed()
+        name=(issuetype or JIRA_ISSUE_TYPE).strip()
+        it=(m["types"] or {}).get(name.lower())
+        if it and it["id"] not in m["fields"]:
+            m["fields"][it["id"]]=_jira_screen_fields(base,email,token,project,it["id"])
+            if m["fields"][it["id"]] is None: failed()
+        fields=m["fields"].get(it["id"]) if it else None
+        if m["priorities"] is None and (fields is None or "priority" in fields):
+            allowed=((fields or {}).get("priority") or {}).get("allowedValues") or []
+            pr={str(x.get("name","")).lower():str(x.get("id")) for x in allowed if x.get("id")} or jira_priorities(base,email,token)
+            if pr is None: failed()
+            m["priorities"]=pr or {}
+        return {"ok":m["types"] is not None,"issuetype":it,"type_name":name,"types":sorted(x["name"] for x in (m["types"] or {}).values()),
+                "fields":set(fields) if fields is not None else None,"priorities":dict(m["priorities"] or {})}
+
+# # idem_label: метка идемпотентности задачи — из её id (иначе из текста); по ней повтор и повторная отправка находят уже созданную
+def idem_label(t:Dict[str,Any])->str:
+    if not JIRA_IDEM_PREFIX: return ""
+    tid=re.sub(r"[^\w-]","",str(t.get("id") or ""))
+    if not tid: tid=hashlib.sha1((str(t.get("summary",""))+"\n"+str(t.get("description",""))).encode("utf-8")).hexdigest()[:12]
+    return JIRA_IDEM_PREFIX+tid
+
+# # idem_on: метки можно ставить (поле labels есть на экране создания или экран неизвестен)
+def idem_on(meta:Optional[Dict[str,Any]])->bool:
+    allowed=(meta or {}).get("fields")
+    return bool(JIRA_IDEM_PREFIX) and (allowed is None or "labels" in allowed)
+
+# # jira_issue_fields: поля задачи для create/bulk; поля вне экрана создания не отправляем
+def jira_issue_fields(project:str,t:Dict[str,Any],meta:Optional[Dict[str,Any]]=None)->Dict[str,Any]:
+    meta=meta or {}
+    it=meta.get("issuetype")
+    fields={"project":{"key":project},"summary":(t.get("summary") or "Задача")[:MAX_SUMMARY],"issuetype":{"id":it["id"]} if it else {"name":meta.get("type_name") or JIRA_ISSUE_TYPE}}
+    raw=t.get("labels","") or ""
+    labels=[x.strip() for x in raw.split(",") if x.strip()]
+    if idem_on(meta): labels.append(idem_label(t))
+    if labels: fields["labels"]=labels
+    if t.get("due"):
+        iso = to_iso(t.get("due")) or parse_due_kz(t.get("due")) or infer_due_from_text(t.get("description",""))
+        if iso: fields["duedate"]=iso
+    pr=t.get("priority") or "Medium"
+    pid=(meta.get("priorities") or {}).get(pr.lower())
+    fields["priority"]={"id":pid} if pid else {"name":pr}
+    desc=str(t.get("description","")).strip()
+    if desc: fields["description"]={"type":"doc","version":1,"content":[{"type":"paragraph","content":[{"type":"text","text":desc}]}]}
+    allowed=meta.get("fields")
+    if allowed is not None:
+        fields={k:v for k,v in fields.items() if k in allowed or k in ("project","summary","issuetype")}
+    return fields
+
+# # jira_search: задачи по JQL (POST /rest/api/3/search/jql, постранично через nextPageToken); сбой — RuntimeError
+def jira_search(base:str,email:str,token:str,jql:str,fields:List[str],page:int=100)->Iterator[Dict[str,Any]]:
+    url=base.rstrip("/")+"/rest/api/3/search/jql"
+    body:Dict[str,Any]={"jql":jql,"fields":fields or ["id"],"maxResults":page}
+    while True:
+        r=jira_request("POST",url,email,token,json=body,timeout=60)
+        if r.status_code>=300: raise RuntimeError(f"Jira search {r.status_code}: {r.text[:200]}")
+        data=r.json()
+        yield from data.get("issues") or []
+        if data.get("isLast",True) or not data.get("nextPageToken"): return
+        body["nextPageToken"]=data["nextPageToken"]
+
+# # jira_find_labels: уже созданные задачи проекта с этими метками (метка → {id,key}); None — поиск не удался
+def jira_find_labels(base:str,email:str,token:str,project:str,labels:List[str])->Optional[Dict[str,Dict[str,str]]]:
+    out:Dict[str,Dict[str,str]]={}; want=set(labels)
+    try:
+        for i in range(0,len(labels),JIRA_BULK_SIZE):
+            jql=f'project = "{project}" AND labels in ('+",".join(json.dumps(x) for x in labels[i:i+JIRA_BULK_SIZE])+")"
+            for iss in jira_search(base,email,token,jql,["labels"]):
+                for lb in (iss.get("fields") or {}).get("labels") or []:
+                    if lb in want and lb not in out: out[lb]={"id":str(iss.get("id","")),"key":iss.get("key","")}
+    except (RuntimeError,requests.RequestException): return None
+    return out
+
+# # _failed: результат неудачного запроса; retry — стоит сверить по метке и повторить
+def _failed(r:Any,err:str="")->Dict[str,Any]:
+    code=r.status_code if r is not None else 0
+    return {"ok":False,"error":err or r.text,"retry":retryable(code)}
+
+# # jira_create_issue: создать задачу (429/503 повторяет jira_request; 5xx и обрыв — сверка в jira_submit)
+def jira_create_issue(base:str,email:str,token:str,project:str,t:Dict[str,Any],meta:Optional[Dict[str,Any]]=None)->Dict[str,Any]:
+    url=base.rstrip("/")+"/rest/api/3/issue"
+    if meta is None: meta=jira_meta(base,email,token,project)
+    body={"fields":jira_issue_fields(project,t,meta)}
+    try: r=jira_request("POST",url,email,token,retry_ambiguous=False,json=body,timeout=60)
+    except requests.RequestException as e: return _failed(None,str(e))
+    if r.status_code>=300: return _failed(r)
+    return {"ok":True,**r.json()}
+
+# # jira_create_bulk: пачка задач одним POST /issue/bulk; None — если bulk API недоступен
+def jira_create_bulk(base:str,email:str,token:str,project:str,tasks:List[Dict[str,Any]],meta:Optional[Dict[str,Any]]=None)->Optional[List[Dict[str,Any]]]:
+    url=base.rstrip("/")+"/rest/api/3/issue/bulk"
+    if meta is None: meta=jira_meta(base,email,token,project)
+    ups=[{"fields":jira_issue_fields(project,t,meta)} for t in tasks]
+    try: r=jira_request("POST",url,email,token,retry_ambiguous=False,json={"issueUpdates":ups},timeout=120)
+    except requests.RequestException as e: return [_failed(None,str(e)) for _ in tasks]
+    if r.status_code in (404,405): return None
+    try: data=r.json()
+    except Exception: data={}
+    issues=data.get("issues") if isinstance(data,dict) else None
+    errors=data.get("errors") if isinstance(data,dict) else None
+    if r.status_code>=300 and not issues and not errors:
+        return [_failed(r) for _ in tasks]
+    # успешные issues идут по порядку, ошибки — с номером элемента во входной пачке
+    failed={}
+    for e in errors or []:
+        try: failed[int(e.get("failedElementNumber"))]=json.dumps(e.get("elementErrors",e),ensure_ascii=False)
+        except Exception: pass
+    it=iter(issues or [])
+    out=[]
+    for i in range(len(tasks)):
+        if i in failed: out.append({"ok":False,"error":failed[i]}); continue
+        iss=next(it,None)
+        out.append({"ok":True,**iss} if iss else {"ok":False,"error":r.text})
+    return out
+
+# # _adf_text: текст документа ADF (тело комментария)
+def _adf_text(node:Any)->str:
+    if isinstance(node,dict): return str(node.get("text","")) if node.get("type")=="text" else "".join(_adf_text(x) for x in node.get("content") or [])
+    if isinstance(node,list): return "".join(_adf_text(x) for x in node)
+    return str(node or "")
+
+# # jira_has_comment: у задачи уже есть комментарий с таким текстом (None — не удалось проверить)
+def jira_has_comment(base:str,email:str,token:str,key:str,text:str)->Optional[bool]:
+    url=base.rstrip("/")+f"/rest/api/3/issue/{key}/comment"
+    try: r=jira_request("GET",url,email,token,params={"maxResults":100,"orderBy":"-created"},timeout=40)
+    except requests.RequestException: return None
+    if r.status_code>=300: return None
+    return any(_adf_text(c.get("body")).strip()==text.strip() for c in r.json().get("comments") or [])
+
+# # jira_comment: доп. комментарий после создания; dedupe — сначала проверить, нет ли его уже
+# # (задача создана прошлой отправкой или ответ на POST потерян), 5xx/обрыв — проверить и повторить
+def jira_comment(base:str,email:str,token:str,key:str,text:str,dedupe:bool=False)->Dict[str,Any]:
+    if not (text or "").strip(): return {"ok":True,"skipped":True}
+    url=base.rstrip("/")+f"/rest/api/3/issue/{key}/comment"
+    payload={"body":{"type":"doc","version":1,"content":[{"type":"paragraph","content":[{"type":"text","text":text}]}]}}
+    for attempt in range(JIRA_RETRIES+1):
+        if dedupe:
+            has=jira_has_comment(base,email,token,key,text)
+            if has: return {"ok":True,"existing":True}
+            if has is None: return {"ok":False,"error":"не удалось проверить комментарии "+key}
+        try: r=jira_request("POST",url,email,token,retry_ambiguous=False,json=payload,timeout=60)
+        except requests.RequestException as e: res=_failed(None,str(e))
+        else: res={"ok":True,**r.json()} if r.status_code<300 else _failed(r)
+        if res["ok"] or not res.pop("retry") or attempt==JIRA_RETRIES: return res
+        dedupe=True; time.sleep(backoff(attempt))
+    return res
+
+# # merge_text: комментарий к существующей задаче, в которую слита повторившаяся (merge_into)
+def merge_text(t:Dict[str,Any])->str:
+    parts=["Повторно со встречи: "+(str(t.get("summary") or "").strip() or "задача")]
+    for k,pre in (("description",""),("due","Срок: "),("comment","")):
+        v=str(t.get(k) or "").strip()
+        if v: parts.append(pre+v)
+    return " — ".join(parts)
+
+# # jira_submit: bulk-создание (пачки по 50, иначе пул потоков) + комментарии параллельно;
+# # результат — по одной записи на задачу в исходном порядке. Идемпотентно: задачи с меткой idem_label,
+# # уже созданные прошлой отправкой, не создаются снова ("existing": True); после 5xx/обрыва — сверка по метке
+# # (нашлась — "recovered": True) и повтор. Задача с merge_into (ключ существующей) не создаётся — уходит туда комментарием ("merged": True).
+def jira_submit(base:str,email:str,token:str,project:str,tasks:List[Dict[str,Any]],workers:int=JIRA_CONCURRENCY,
+                issuetype:str=JIRA_ISSUE_TYPE,refresh_meta:bool=False)->List[Dict[str,Any]]:
+    if not tasks: return []
+    workers=max(1,min(workers,len(tasks)))
+    meta=jira_meta(base,email,token,project,issuetype,refresh=refresh_meta)
+    if meta["ok"] and not meta["issuetype"]:
+        err=f"Тип задачи '{issuetype}' не найден в проекте {project}. Доступны: "+", ".join(meta["types"])
+        return [{"ok":False,"error":err} for _ in tasks]
+    res:List[Optional[Dict[str,Any]]]=[None]*len(tasks)
+    labels=[idem_label(t) for t in tasks] if idem_on(meta) else []
+    found_at=set()   # задачи, найденные по метке, — комментарий мог уже быть
+    # # find: задачи idx, уже созданные в Jira (по метке) → res с флагом mark; False — поиск не удался
+    def find(idx:List[int], mark:str)->bool:
+        found=jira_find_labels(base,email,token,project,[labels[i] for i in idx])
+        if found is None: return False
+        for i in idx:
+            if labels[i] in found: res[i]={"ok":True,**found[labels[i]],mark:True}; found_at.add(i)
+        return True
+    bulk=[True]
+    # # create: создать задачи idx — пачками через bulk, без него по одной параллельно
+    def create(ex:ThreadPoolExecutor, idx:List[int])->None:
+        rest=[] if bulk[0] else list(idx)
+        if bulk[0]:
+            batches=[idx[i:i+JIRA_BULK_SIZE] for i in range(0,len(idx),JIRA_BULK_SIZE)]
+            for b,out in zip(batches,ex.map(metrics.bind(lambda b: jira_create_bulk(base,email,token,project,[tasks[i] for i in b],meta)),batches)):
+                if out is None: bulk[0]=False; rest.extend(b); continue
+                for i,o in zip(b,out): res[i]=o
+        # bulk API недоступен → по одной задаче, но параллельно
+        for i,o in zip(rest,ex.map(metrics.bind(lambda i: jira_create_issue(base,email,token,project,tasks[i],meta)),rest)):
+            res[i]=o
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        merge=[i for i,t in enumerate(tasks) if str(t.get("merge_into") or "").strip()]
+        todo=sorted(set(range(len(tasks)))-set(merge))
+        if labels and todo and find(todo,"existing"): todo=[i for i in todo if res[i] is None]
+        for attempt in range(JIRA_RETRIES+1):
+            if todo: create(ex,todo)
+            again=[i for i in todo if not res[i]["ok"] and res[i].get("retry")]
+            # без метки не проверить, создана ли задача, — повтор мог бы её задублировать
+            if not again or not labels or attempt==JIRA_RETRIES: break
+            metrics.count("app_retries_total",len(again),target="jira",reason="reconcile")
+            time.sleep(backoff(attempt))   # индекс поиска Jira догоняет только что созданные задачи
+            if not find(again,"recovered"): break
+            todo=[i for i in again if not res[i]["ok"]]
+        todo=[i for i,o in enumerate(res) if o and o.get("ok") and (tasks[i].get("comment") or "").strip()]
+        for i,c in zip(todo,ex.map(metrics.bind(lambda i: jira_comment(base,email,token,res[i].get("key") or res[i].get("id"),
+                                                                          tasks[i]["comment"].strip(),dedupe=i in found_at)),todo)):
+            if not c.get("ok"): res[i]["comment_error"]=c.get("error","")
+        # слияние: комментарий с проверкой — повторная отправка не добавит его второй раз
+        for i,c in zip(merge,ex.map(metrics.bind(lambda i: jira_comment(base,email,token,str(tasks[i]["merge_into"]).strip(),merge_text(tasks[i]),dedupe=True)),merge)):
+            key=str(tasks[i]["merge_into"]).strip()
+            res[i]={"ok":True,"key":key,"merged":True} if c.get("ok") else {"ok":False,"error":f"{key}: "+c.get("error","")}
+    for o in res:
+        if o: o.pop("retry",None)
+    return [o or {"ok":False,"error":"no result"} for o in res]
+
+# # issue_link / project_link: ссылки
+def issue_link(base:str,key:str)->str:
+    return base.rstrip("/")+"/browse/"+key
+def project_link(base:str,key:str)->str:
+    return base.rstrip("/")+f"/jira/core/projects/{key}/list"
+
@@ -0,0 +1,378 @@
+# # jobs: фоновая очередь распознавания, общая для всех сессий процесса Streamlit.
+# # Whisper работает в фиксированном пуле процессов (JOBS_SLOTS — сколько на устройство); модели живут в них, пока жив пул.
+# # Длинная запись режется по паузам на куски по JOBS_SLICE_S: очередь выдаёт куски по очереди разным владельцам
+# # (кому отдано меньше секунд аудио — тот первый), поэтому большая загрузка задерживает короткие не дольше, чем на кусок.
+# # Состояние и результат каждого задания лежат в APP_CACHE_DIR/jobs и переживают rerun, обновление страницы и перезапуск сервера;
+# # готовая расшифровка попадает в историю (store.py).
+import os, json, time, queue, bisect, shutil, threading
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing as mp
+
+import pipeline as pl
+from pipeline import np
+from store import store
+import metrics
+
+JOBS_SLOTS   = os.getenv("JOBS_SLOTS", "")                  # "cuda=1,cpu=2": процессов Whisper на устройство; "" — 1 на device()
+JOBS_SLICE_S = float(os.getenv("JOBS_SLICE_S", "300"))       # кусок длинной записи, сек (0 — не резать)
+JOBS_KEEP_H  = float(os.getenv("JOBS_KEEP_H", "24"))         # готовые задания хранятся N часов
+JOBS_POLL_S  = float(os.getenv("JOBS_POLL_S", "1"))          # как часто страница спрашивает прогресс
+JOBS_DIR     = os.path.join(pl.CACHE_DIR, "jobs")
+ACTIVE       = ("queued","running","cleaning")
+LANG_PROBE_S = 30                                            # язык — по первым N сек, один на все куски
+REAP_S       = 1.0                                           # как часто проверять, живы ли процессы Whisper
+
+# # slots: {устройство: процессов} из JOBS_SLOTS
+def slots(spec:str="")->Dict[str,int]:
+    out={}
+    for part in (spec or JOBS_SLOTS or f"{pl.device()}=1").split(","):
+        dev,_,n=part.partition("=")
+        if dev.strip() and int(n or 1)>0: out[dev.strip()]=int(n or 1)
+    return out
+
+# # load_model: WhisperModel на устройстве dev ("cpu", "cuda", "cuda:1")
+def load_model(size:str, dev:str, compute:str, threads:int)->Any:
+    cls=pl.whisper_cls()
+    if cls is None: raise RuntimeError("faster-whisper не установлен")
+    kind,_,idx=dev.partition(":")
+    return cls(size, device=kind, device_index=int(idx or 0), compute_type=compute, cpu_threads=threads, num_workers=1)
+
+# # _plan: PCM записи → .npy (его читают куски), точки разреза в паузах, язык по началу
+def _plan(item:Dict[str,Any], model:Callable[[str],Any], progress:Callable[[float,int],None])->Dict[str,Any]:
+    lang=item["lang"]; size=pl.whisper_pick(None,item["pending"])
+    if not pl.ffmpeg_exe():
+        # без ffmpeg faster-whisper декодирует файл сам (PyAV) — один кусок на всю запись
+        return {"duration":0.0,"cuts":None,"model":size,"language":lang}
+    audio=pl.decode_pcm(item["src"])
+    np.save(item["pcm"],np.asarray(audio,dtype=np.float32))
+    dur=len(audio)/pl.SAMPLE_RATE; size=pl.whisper_pick(dur,item["pending"])
+    n=max(1,int(-(-dur//item["slice_s"]))) if item["slice_s"]>0 else 1
+    cuts=pl.shard_bounds(audio,n) if n>1 else [0,len(audio)]
+    if not lang or lang=="auto":
+        # кусками язык определялся бы в каждом заново и мог разойтись
+        _,ti=model(size).transcribe(np.asarray(audio[:LANG_PROBE_S*pl.SAMPLE_RATE],dtype=np.float32),vad_filter=True,vad_parameters=dict(pl.VAD_PARAMS))
+        lang=getattr(ti,"language","") or "auto"
+    return {"duration":round(dur,2),"cuts":cuts,"model":size,"language":lang}
+
+# # _slice: распознать кусок [a,b) (+SHARD_PAD_S с краёв) → сегменты с таймкодами от начала записи
+def _slice(item:Dict[str,Any], model:Callable[[str],Any], progress:Callable[[float,int],None])->Dict[str,Any]:
+    if item["a"] is None: audio=item["src"]; off=0.0
+    else:
+        pcm=np.load(item["pcm"],mmap_mode="r"); pad=int(pl.SHARD_PAD_S*pl.SAMPLE_RATE)
+        lo=max(0,item["a"]-pad); hi=min(len(pcm),item["b"]+pad)
+        audio=np.array(pcm[lo:hi]); off=lo/pl.SAMPLE_RATE; del pcm
+    kw={"beam_size":pl.WHISPER_BEAM}
+    if item["lang"] and item["lang"]!="auto": kw["language"]=item["lang"]
+    segs,ti=model(item["model"]).transcribe(audio,vad_filter=True,vad_parameters=dict(pl.VAD_PARAMS),**kw)
+    out=[]; t=0.0
+    for s in segs:
+        out.append({"start":round(s.start+off,2),"end":round(s.end+off,2),"text":s.text})
+        if time.monotonic()-t>=0.5: progress(out[-1]["end"],len(out)); t=time.monotonic()
+    return {"segments":out,"language":getattr(ti,"language",""),"duration":getattr(ti,"duration",0.0)}
+
+# # _worker: процесс Whisper на устройстве dev; задания — из inbox, события (progress/plan/slice/error) — в outbox
+def _worker(wid:int, dev:str, threads:int, factory:Optional[Callable[...,Any]], inbox:Any, outbox:Any)->None:
+    os.environ["WHISPER_DEVICE"]=dev.partition(":")[0]     # pl.device()/compute_type() в этом процессе — без пробы nvidia-smi
+    models:Dict[str,Any]={}
+    def model(size:str)->Any:
+        if size not in models: models[size]=(factory or load_model)(size,dev,pl.compute_type(),threads)
+        return models[size]
+    while True:
+        item=inbox.get()
+        if item is None: return
+        def progress(end:float, n:int)->None: outbox.put((wid,item,"progress",(end,n)))
+        try:
+            t=time.perf_counter(); res=(_plan if item["kind"]=="plan" else _slice)(item,model,progress)
+            outbox.put((wid,item,item["kind"],{**res,"busy_s":round(time.perf_counter()-t,3)}))
+        except Exception as e:
+            outbox.put((wid,item,"error",f"{type(e).__name__}: {e}"))
+
+# # _path: файлы задания в папке очереди (состояние, результат, загрузка, PCM)
+def _path(root:str, jid:str, ext:str)->str:
+    return os.path.join(root,jid+ext)
+
+# # _dump: атомарная запись JSON
+def _dump(path:str, val:Any)->None:
+    tmp=path+f".{os.getpid()}.tmp"
+    with open(tmp,"w",encoding="utf-8") as f: json.dump(val,f,ensure_ascii=False)
+    os.replace(tmp,path)
+
+# # _load: JSON с диска; None — нет или битый
+def _load(path:str)->Optional[Dict[str,Any]]:
+    try:
+        with open(path,"r",encoding="utf-8") as f: return json.load(f)
+    except Exception:
+        return None
+
+class JobQueue:
+    # # slots — {устройство: процессов}; factory(size, dev, compute, threads) — модель (бенчмарк подставляет fake)
+    def __init__(self, slots_:Optional[Dict[str,int]]=None, factory:Optional[Callable[...,Any]]=None,
+                 slice_s:float=JOBS_SLICE_S, root:str=JOBS_DIR):
+        self.root=root; self.slice_s=slice_s; self.factory=factory; os.makedirs(root,exist_ok=True)
+        self.lock=threading.Lock(); self.jobs:Dict[str,Dict[str,Any]]={}; self.parts:Dict[str,Dict[int,Dict[str,Any]]]={}
+        self.pending:Dict[str,List[Dict[str,Any]]]={}   # владелец → куски по порядку (задание, номер)
+        self.served:Dict[str,float]={}                  # владелец → секунд аудио, уже отданных в работу
+        self.busy:Dict[int,Dict[str,Any]]={}; self.idle:List[int]=[]; self.peak:Dict[str,int]={}
+        self.ctx=mp.get_context("spawn")                # fork процесса с потоками Streamlit небезопасен
+        self.outbox=self.ctx.Queue(); self.workers:List[Dict[str,Any]]=[]
+        for dev,n in (slots_ or slots()).items():
+            threads=pl.WHISPER_CPU_THREADS or (max(1,(os.cpu_count() or n)//n) if not dev.startswith("cuda") else 0)
+            for _ in range(n): self.workers.append({"dev":dev,"threads":threads}); self.spawn(len(self.workers)-1)
+        self.llm=ThreadPoolExecutor(max_workers=2,thread_name_prefix="jobs-clean")   # правка текста — I/O, в этом процессе
+        self.recover()
+        threading.Thread(target=self.loop,daemon=True,name="jobs").start()
+
+    # # spawn: (пере)запустить процесс воркера wid
+    def spawn(self, wid:int)->None:
+        w=self.workers[wid]; w["inbox"]=self.ctx.Queue()
+        w["proc"]=self.ctx.Process(target=_worker,args=(wid,w["dev"],w["threads"],self.factory,w["inbox"],self.outbox),daemon=True)
+        w["proc"].start(); self.idle.append(wid)
+
+    # # save: состояние задания на диск (progress — не чаще раза в секунду)
+    def save(self, j:Dict[str,Any], force:bool=True)->None:
+        now=time.time()
+        if not force and now-j.get("_saved",0.0)<1.0: return
+        j["_saved"]=now; _dump(_path(self.root,j["id"],".json"),{k:v for k,v in j.items() if not k.startswith("_")})
+
+    # # submit: задание на распознавание (+ правка текста LLM, если clean); src — путь или файловый объект (копируется в папку очереди)
+    def submit(self, src:Union[str,BinaryIO], name:str="", owner:str="", lang:str="auto", clean:bool=True, refresh:bool=False)->str:
+        jid=pl.sid(12); own=not isinstance(src,str)
+        if own:
+            path=_path(self.root,jid,os.path.splitext(name or getattr(src,"name",""))[1] or ".bin")
+            src.seek(0)
+            with open(path,"wb") as f: shutil.copyfileobj(src,f,1<<20)
+            src.seek(0)
+        else: path=src
+        j={"id":jid,"owner":owner or "-","name":name or os.path.basename(path),"src":path,"own":own,"lang":lang or "auto",
+           "clean":clean,"refresh":refresh,"status":"queued","created":time.time(),"started":None,"finished":None,
+           "duration":0.0,"done_s":0.0,"segments":0,"slices":0,"slices_done":0,"model":"","language":"","cached":False,"error":"","timings":{}}
+        j["digest"]=pl.file_sha256(path)
+        with self.lock:
+            self.jobs[jid]=j; self.save(j)
+            hit=self.cached(j)
+            if hit is None: self.enqueue(j)
+        if hit is not None: self.transcribed(j,hit["segments"],hit.get("language",""))
+        metrics.count("app_jobs_total",status="submitted")
+        return jid
+
+    # # cached: расшифровка этого файла из общего кэша (тот же ключ, что у pipeline.transcribe_iter)
+    def cached(self, j:Dict[str,Any])->Optional[Dict[str,Any]]:
+        for size in [pl.WHISPER_SIZE]+([pl.WHISPER_FALLBACK_SIZE] if pl.WHISPER_FALLBACK_SIZE else []):
+            hit=pl.disk_cache_get(os.path.join(pl.CACHE_DIR,"transcripts"),pl.transcript_key_digest(j["digest"],j["lang"],size))
+            if hit is not None: break
+        pl.cache_count("transcript",hit is not None)
+        if hit is not None: j.update({"cached":True,"model":hit.get("model",""),"duration":hit.get("duration",0.0),"done_s":hit.get("duration",0.0)})
+        return hit
+
+    # # enqueue: первый шаг задания (декодирование и разметка на куски); новый владелец встаёт вровень с активными
+    def enqueue(self, j:Dict[str,Any])->None:
+        o=j["owner"]
+        if not self.pending.get(o) and not any(it["owner"]==o for it in self.busy.values()):
+            act=[self.served.get(x,0.0) for x,q in self.pending.items() if q]+[self.served.get(it["owner"],0.0) for it in self.busy.values()]
+            self.served[o]=max(self.served.get(o,0.0),min(act,default=0.0))
+        self.push({"kind":"plan","job":j["id"],"owner":o,"t":j["created"],"i":-1,"src":j["src"],"pcm":_path(self.root,j["id"],".npy"),
+                   "lang":j["lang"],"slice_s":self.slice_s,"pending":sum(len(q) for q in self.pending.values()),"cost":0.0})
+        self.dispatch()
+
+    # # push: кусок в очередь владельца (порядок — время задания, номер куска)
+    def push(self, item:Dict[str,Any])->None:
+        bisect.insort(self.pending.setdefault(item["owner"],[]),item,key=lambda x:(x["t"],x["i"]))
+
+    # # dispatch: свободным процессам — куски владельцев, которым отдано меньше всего секунд аудио
+    def dispatch(self)->None:
+        while self.idle and any(self.pending.values()):
+            o=min((x for x,q in self.pending.items() if q),key=lambda x:(self.served.get(x,0.0),self.pending[x][0]["t"]))
+            item=self.pending[o].pop(0); self.served[o]=self.served.get(o,0.0)+item["cost"]
+            wid=self.idle.pop(0); self.busy[wid]=item; self.workers[wid]["inbox"].put(item)
+            dev=self.workers[wid]["dev"]; self.peak[dev]=max(self.peak.get(dev,0),sum(1 for w in self.busy if self.workers[w]["dev"]==dev))
+            j=self.jobs[item["job"]]
+            if j["status"]=="queued":
+                j.update({"status":"running","started":time.time()}); j["timings"]["wait_s"]=round(j["started"]-j["created"],3); self.save(j)
+                metrics.record({"span":"job_wait","dur_s":j["timings"]["wait_s"]})
+
+    # # loop: события воркеров → состояние заданий; раз в REAP_S (и под потоком событий, и без него) упавший процесс
+    # # перезапускается, его задание — с ошибкой
+    def loop(self)->None:
+        reaped=time.monotonic()
+        while True:
+            left=reaped+REAP_S-time.monotonic()
+            if left<=0:
+                self.reap(); reaped=time.monotonic(); continue
+            try: wid,item,kind,data=self.outbox.get(timeout=left)
+            except queue.Empty: continue
+            done=None
+            with self.lock:
+                j=self.jobs.get(item["job"])
+                if kind=="progress":
+                    if j and j["status"]=="running": self.progress(j,item,*data)
+                    continue
+                self.busy.pop(wid,None); self.idle.append(wid)
+                try:
+                    # задание отменено или упало, пока кусок считался: _plan мог записать PCM уже после fail() — удалить
+                    if j is None or j["status"]!="running": self._rm(_path(self.root,item["job"],".npy"))
+                    elif kind=="error": self.fail(j,data)
+                    elif kind=="plan": self.planned(j,data)
+                    else: done=self.sliced(j,item,data)
+                except Exception as e:
+                    # ошибка разбора одного задания не должна останавливать очередь
+                    self.fail(j,f"{type(e).__name__}: {e}")
+                self.dispatch()
+            if done:
+                try: self.transcribed(*done)
+                except Exception as e:
+                    with self.lock: self.fail(done[0],f"{type(e).__name__}: {e}")
+
+    # # reap: процесс воркера умер (OOM, сбой CUDA) — задание с ошибкой, процесс заново
+    def reap(self)->None:
+        with self.lock:
+            for wid,w in enumerate(self.workers):
+                if w["proc"].is_alive(): continue
+                item=self.busy.pop(wid,None)
+                if item and item["job"] in self.jobs: self.fail(self.jobs[item["job"]],f"процесс Whisper завершился (код {w['proc'].exitcode})")
+                self.spawn(wid)
+            self.dispatch()
+
+    # # progress: сегментов и секунд аудио готово (готовые куски + текущие)
+    def progress(self, j:Dict[str,Any], item:Dict[str,Any], end:float, n:int)->None:
+        run=j.setdefault("_run",{}); run[item["i"]]=(max(0.0,end-(item["a"] or 0)/pl.SAMPLE_RATE),n)
+        j["done_s"]=round(j.get("_done_s",0.0)+sum(x for x,_ in run.values()),1); j["segments"]=j.get("_segs",0)+sum(x for _,x in run.values())
+        self.save(j,force=False)
+
+    # # planned: запись размечена → куски в очередь владельца
+    def planned(self, j:Dict[str,Any], p:Dict[str,Any])->None:
+        j.update({"duration":p["duration"],"model":p["model"],"language":p["language"]}); j["timings"]["decode_s"]=p["busy_s"]
+        cuts=p["cuts"] or [None,None]
+        j["slices"]=len(cuts)-1; j["_cuts"]=cuts; self.parts[j["id"]]={}
+        for i in range(len(cuts)-1):
+            a,b=cuts[i],cuts[i+1]
+            self.push({"kind":"slice","job":j["id"],"owner":j["owner"],"t":j["created"],"i":i,"src":j["src"],"pcm":_path(self.root,j["id"],".npy"),
+                       "a":a,"b":b,"lang":p["language"],"model":p["model"],"cost":(b-a)/pl.SAMPLE_RATE if a is not None else 0.0})
+        self.save(j)
+
+    # # sliced: кусок готов; все готовы → сегменты по порядку (повтор на стыке убирает merge_shard_segments)
+    def sliced(self, j:Dict[str,Any], item:Dict[str,Any], res:Dict[str,Any])->Optional[tuple]:
+        parts=self.parts.setdefault(j["id"],{}); parts[item["i"]]=res
+        j.get("_run",{}).pop(item["i"],None)
+        j["_done_s"]=j.get("_done_s",0.0)+(((item["b"]-item["a"])/pl.SAMPLE_RATE) if item["a"] is not None else res["duration"])
+        j["_segs"]=j.get("_segs",0)+len(res["segments"]); j["_busy"]=j.get("_busy",0.0)+res["busy_s"]
+        j.update({"slices_done":len(parts),"done_s":round(j["_done_s"],1),"segments":j["_segs"]})
+        if len(parts)<j["slices"]: self.save(j,force=False); return None
+        out:List[Dict[str,Any]]=[]
+        for i in range(j["slices"]):
+            it=parts[i]
+            if j["slices"]==1: out.extend(it["segments"]); continue
+            pl.merge_shard_segments(out,it["segments"],j["_cuts"][i]/pl.SAMPLE_RATE,j["_cuts"][i+1]/pl.SAMPLE_RATE,i==j["slices"]-1)
+        if not j["duration"]: j["duration"]=parts[0]["duration"]
+        j["timings"]["transcribe_s"]=round(j["_busy"],3)
+        metrics.record({"span":"whisper","model":j["model"],"shards":j["slices"],"segments":len(out),"audio_s":round(j["duration"] or 0.0,1),
+                        "dur_s":round(j["_busy"],4)})
+        self.parts.pop(j["id"],None)
+        return j,out,j["language"] or parts[0]["language"]
+
+    # # transcribed: расшифровка готова → в кэш расшифровок; дальше правка LLM (в пуле потоков) или сразу готово
+    def transcribed(self, j:Dict[str,Any], segs:List[Dict[str,Any]], language:str)->None:
+        if not j["cached"]:
+            pl.disk_cache_put(os.path.join(pl.CACHE_DIR,"transcripts"),pl.transcript_key_digest(j["digest"],j["lang"],j["model"]),
+                              {"segments":segs,"language":language,"duration":j["duration"],"model":j["model"]},pl.TRANSCRIPT_CACHE_MB*1024*1024)
+        self._rm(_path(self.root,j["id"],".npy"))
+        res={"segments":segs,"language":language,"duration":j["duration"],"transcript":"".join(s["text"] for s in segs).strip(),"meta":{}}
+        with self.lock:
+            j.update({"language":language,"segments":len(segs),"done_s":j["duration"],"status":"cleaning" if j["clean"] and res["transcript"] else j["status"]})
+            self.save(j)
+        if j["status"]=="cleaning": self.llm.submit(self.clean,j,res)
+        else: self.complete(j,res)
+
+    # # clean: правка текста окнами (как в конвейере); упала — остаётся сырой текст и предупреждение
+    def clean(self, j:Dict[str,Any], res:Dict[str,Any])->None:
+        tr=metrics.Trace(j["name"]); t=time.perf_counter()
+        try:
+            with metrics.use(tr), metrics.span("clean"):
+                res["transcript"],res["meta"]=pl.llama_clean(res["transcript"],[s["text"] for s in res["segments"]],refresh=j["refresh"])
+        except Exception as e:
+            j["warning"]=f"правка текста не удалась: {type(e).__name__}: {e}"
+        j["timings"]["clean_s"]=round(time.perf_counter()-t,3); res["perf"]=tr.to_dict()
+        self.complete(j,res)
+
+    # # complete: результат на диск, загрузка удаляется
+    def complete(self, j:Dict[str,Any], res:Dict[str,Any])->None:
+        _dump(_path(self.root,j["id"],".result.json"),res)
+        with self.lock:
+            if j["status"] not in ACTIVE: return
+            j.update({"status":"done","finished":time.time()}); j["timings"]["wall_s"]=round(j["finished"]-j["created"],3); self.save(j)
+        if j["own"]: self._rm(j["src"])
+        # в историю — даже если страница уже закрыта (запись фоновая, пачкой)
+        store().put_meeting(j["id"],name=j["name"],file_hash=j["digest"],source="ui",owner=j["owner"],language=j["language"],
+                            duration=j["duration"] or 0.0,model=j["model"],transcript=res["transcript"])
+        metrics.count("app_jobs_total",status="done")
+        metrics.record({"span":"job","dur_s":round(j["finished"]-j["created"],4),"audio_s":j["duration"]})
+
+    # # fail: задание с ошибкой; его куски убрать из очереди
+    def fail(self, j:Dict[str,Any], err:str, status:str="error")->None:
+        if j["status"] not in ACTIVE: return
+        self.pending[j["owner"]]=[x for x in self.pending.get(j["owner"],[]) if x["job"]!=j["id"]]
+        self.parts.pop(j["id"],None)
+        j.update({"status":status,"error":err,"finished":time.time()}); self.save(j)
+        self._rm(_path(self.root,j["id"],".npy"))
+        if j["own"]: self._rm(j["src"])
+        metrics.count("app_jobs_total",status=status)
+
+    # # cancel: отменить задание (кусок, который уже распознаётся, доработает, но результат выбрасывается)
+    def cancel(self, jid:str)->None:
+        with self.lock:
+            if jid in self.jobs: self.fail(self.jobs[jid],"отменено","cancelled")
+
+    # # get: состояние задания (копия) — из памяти или с диска
+    def get(self, jid:str)->Optional[Dict[str,Any]]:
+        with self.lock:
+            j=self.jobs.get(jid)
+            if j is not None: return {k:v for k,v in j.items() if not k.startswith("_")}
+        return _load(_path(self.root,jid,".json"))
+
+    # # stats: занятость процессов и очередь — для подписи под прогрессом и бенчмарка
+    def stats(self)->Dict[str,Any]:
+        with self.lock:
+            return {"workers":len(self.workers),"busy":len(self.busy),"queued":sum(len(q) for q in self.pending.values()),
+                    "devices":{d:sum(1 for w in self.workers if w["dev"]==d) for d in {w["dev"] for w in self.workers}},"peak":dict(self.peak),
+                    "owners":{o:round(s,1) for o,s in self.served.items()}}
+
+    # # recover: после перезапуска — незаконченные задания заново в очередь, старые готовые — удалить,
+    # # PCM (.npy) без незаконченного задания — тоже (остался от отменённого или упавшего задания)
+    def recover(self)->None:
+        old=time.time()-JOBS_KEEP_H*3600; ents=list(os.scandir(self.root)); active=set()
+        for e in ents:
+            if not e.name.endswith(".json") or e.name.endswith(".result.json"): continue
+            j=_load(e.path)
+            if not j or "id" not in j: continue
+            if j["status"] in ACTIVE:
+                if not os.path.exists(j["src"]): j.update({"status":"error","error":"файл задания пропал после перезапуска"}); self.save(j); continue
+                j.update({"status":"queued","started":None,"done_s":0.0,"segments":0,"slices_done":0,"timings":{}})
+                with self.lock: self.jobs[j["id"]]=j; self.enqueue(j)
+                active.add(j["id"])
+            elif (j.get("finished") or 0)<old:
+                for x in (".json",".result.json"): self._rm(_path(self.root,j["id"],x))
+        for e in ents:
+            if e.name.endswith(".npy") and e.name[:-4] not in active: self._rm(e.path)
+
+    @staticmethod
+    def _rm(path:str)->None:
+        try: os.unlink(path)
+        except Exception: pass
+
+# # _Q: одна очередь на процесс (все сессии Streamlit); создаётся при первом задании
+_Q:Dict[str,Any]={"lock":threading.Lock(),"queue":None}
+def job_queue()->JobQueue:
+    with _Q["lock"]:
+        if _Q["queue"] is None: _Q["queue"]=JobQueue()
+        return _Q["queue"]
+
+# # job_state: состояние задания без запуска пула (страница после обновления); незаконченное на диске — поднять очередь
+def job_state(jid:str, root:str=JOBS_DIR)->Optional[Dict[str,Any]]:
+    if _Q["queue"] is not None: return _Q["queue"].get(jid)
+    j=_load(_path(root,jid,".json"))
+    if j and j["status"] in ACTIVE: return job_queue().get(jid)
+    return j
+
+# # job_result: расшифровка готового задания ({segments, language, duration, transcript, meta}); None — нет
+def job_result(jid:str, root:str=JOBS_DIR)->Optional[Dict[str,Any]]:
+    return _load(_path(root,jid,".result.json"))
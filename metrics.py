@@ -0,0 +1,190 @@
+# # metrics: замеры этапов и исходящих HTTP-вызовов, счётчики (кэши, повторы) — без внешних зависимостей
+# # span() — интервал с длительностью, байтами и статусом; count() — счётчик; Trace — спаны одного задания (панель в UI).
+# # Выход: JSON-лог (METRICS_LOG: путь или "-" — stderr), файл Prometheus (setup(prom=...)), HTTP /metrics (METRICS_PORT).
+import os, sys, json, time, uuid, threading, contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+METRICS_LOG  = os.getenv("METRICS_LOG", "")            # JSONL со спанами: путь или "-" (stderr); "" — выкл.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))     # >0 — отдавать /metrics по HTTP (app.py, cli.py)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")   # адрес /metrics; "0.0.0.0" — доступен снаружи
+PROM_EVERY_S = 1.0                                      # файл Prometheus пишем не чаще раза в секунду
+TRACE_MAX    = 2000                                     # спанов в одном Trace (дальше — только агрегаты)
+
+# # _M: счётчики и агрегаты спанов на процесс
+_M:Dict[str,Any]={"lock":threading.Lock(),"counters":{},"spans":{},"prom":"","prom_t":0.0,"log":None,"server":None,"tried":False}
+_TRACE:"contextvars.ContextVar[Optional[Trace]]"=contextvars.ContextVar("metrics_trace",default=None)
+
+# # Trace: спаны одного задания (файл, извлечение, отправка в Jira) — для панели «Производительность»
+class Trace:
+    def __init__(self, name:str=""):
+        self.id=uuid.uuid4().hex[:10]; self.name=name; self.t0=time.time(); self.lock=threading.Lock()
+        self.spans:List[Dict[str,Any]]=[]; self.dropped=0
+
+    def add(self, rec:Dict[str,Any])->None:
+        with self.lock:
+            if len(self.spans)<TRACE_MAX: self.spans.append(rec)
+            else: self.dropped+=1
+
+    # # summary: строки «спан/цель → вызовов, секунд, байт, ошибок, статусы» по убыванию времени
+    def summary(self)->List[Dict[str,Any]]:
+        rows:Dict[str,Dict[str,Any]]={}
+        with self.lock: spans=list(self.spans)
+        for s in spans:
+            k=s["span"]+(":"+s["target"] if s.get("target") else "")
+            r=rows.setdefault(k,{"span":k,"calls":0,"total_s":0.0,"max_s":0.0,"bytes_out":0,"bytes_in":0,"errors":0,"status":{}})
+            r["calls"]+=1; r["total_s"]+=s["dur_s"]; r["max_s"]=max(r["max_s"],s["dur_s"])
+            r["bytes_out"]+=s.get("bytes_out",0); r["bytes_in"]+=s.get("bytes_in",0); r["errors"]+=1 if s.get("error") else 0
+            if "status" in s: r["status"][str(s["status"])]=r["status"].get(str(s["status"]),0)+1
+        for r in rows.values(): r["total_s"]=round(r["total_s"],3); r["max_s"]=round(r["max_s"],3)
+        return sorted(rows.values(),key=lambda r:-r["total_s"])
+
+    def to_dict(self)->Dict[str,Any]:
+        return {"trace":self.id,"name":self.name,"wall_s":round(time.time()-self.t0,3),"dropped":self.dropped,"summary":self.summary()}
+
+# # setup: куда писать файл Prometheus (pipeline задаёт CACHE_DIR/metrics.prom)
+def setup(prom:str="")->None:
+    _M["prom"]=prom
+
+# # current: активный Trace потока/контекста (None — спаны идут только в агрегаты)
+def current()->Optional[Trace]:
+    return _TRACE.get()
+
+# # use: сделать trace активным внутри блока (воркеры конвейера — на время работы над заданием)
+@contextmanager
+def use(trace:Optional[Trace])->Iterator[Optional[Trace]]:
+    tok=_TRACE.set(trace)
+    try: yield trace
+    finally: _TRACE.reset(tok)
+
+# # bind: fn для пула потоков — спаны внутри попадут в Trace вызывающего
+def bind(fn:Callable[...,Any])->Callable[...,Any]:
+    tr=_TRACE.get()
+    def run(*a:Any, **k:Any)->Any:
+        with use(tr): return fn(*a,**k)
+    return run
+
+# # _key: имя метрики + отсортированные метки (ключ словаря счётчиков)
+def _key(name:str, labels:Dict[str,Any])->Tuple[str,Tuple[Tuple[str,str],...]]:
+    return name,tuple(sorted((k,str(v)) for k,v in labels.items()))
+
+# # count: +n к счётчику (например, app_cache_hits_total{cache="llm"}, app_retries_total{target="llm"})
+def count(name:str, n:float=1, **labels:Any)->None:
+    k=_key(name,labels)
+    with _M["lock"]: _M["counters"][k]=_M["counters"].get(k,0)+n
+    flush()
+
+# # counters: {метки: значение} счётчика name
+def counters(name:str)->Dict[Tuple[Tuple[str,str],...],float]:
+    with _M["lock"]: return {lb:v for (n,lb),v in _M["counters"].items() if n==name}
+
+# # record: завершённый спан → агрегаты, активный Trace, JSON-лог
+def record(rec:Dict[str,Any], trace:Optional[Trace]=None)->None:
+    trace=trace or _TRACE.get()
+    k=_key(rec["span"],{"target":rec["target"]} if rec.get("target") else {})
+    with _M["lock"]:
+        a=_M["spans"].setdefault(k,{"count":0,"sum":0.0,"errors":0,"bytes_out":0,"bytes_in":0})
+        a["count"]+=1; a["sum"]+=rec["dur_s"]; a["errors"]+=1 if rec.get("error") else 0
+        a["bytes_out"]+=rec.get("bytes_out",0); a["bytes_in"]+=rec.get("bytes_in",0)
+    if trace is not None: rec["trace"]=trace.id; trace.add(rec)
+    log(rec); flush()
+
+# # span: замер блока; в yield-словарь можно дописать bytes_out/bytes_in/status; исключение → error
+@contextmanager
+def span(name:str, **attrs:Any)->Iterator[Dict[str,Any]]:
+    rec:Dict[str,Any]={"span":name,**attrs,"ts":round(time.time(),3)}; t0=time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec.setdefault("error",type(e).__name__); raise
+    finally:
+        rec["dur_s"]=round(time.perf_counter()-t0,4)
+        if isinstance(rec.get("status"),int) and rec["status"]>=400: rec.setdefault("error",f"HTTP {rec['status']}")
+        record(rec)
+
+# # http_span: спан "http" исходящего вызова (цель, хост, метод); стрим — на всё время чтения ответа
+def http_span(target:str, url:str, method:str="GET", **attrs:Any)->Any:
+    return span("http",target=target,host=urlsplit(url).netloc,method=method,**attrs)
+
+# # http: исходящий HTTP-вызов fn(url, **kw) под http_span; статус и байты запроса/ответа
+def http(target:str, fn:Callable[...,Any], url:str, **kw:Any)->Any:
+    with http_span(target,url,getattr(fn,"__name__","").upper()) as sp:
+        r=fn(url,**kw)
+        sp["status"]=r.status_code
+        req=getattr(r,"request",None); body=getattr(req,"body",None) or b""
+        sp["bytes_out"]=len(body)
+        if not kw.get("stream"): sp["bytes_in"]=len(r.content or b"")
+        return r
+
+# # log: строка JSON в METRICS_LOG
+def log(rec:Dict[str,Any])->None:
+    if not METRICS_LOG: return
+    line=json.dumps(rec,ensure_ascii=False,default=str)+"\n"
+    with _M["lock"]:
+        try:
+            if METRICS_LOG=="-": sys.stderr.write(line); return
+            if _M["log"] is None: _M["log"]=open(METRICS_LOG,"a",encoding="utf-8")
+            _M["log"].write(line); _M["log"].flush()
+        except Exception: pass
+
+# # _labels: {k="v",...} для Prometheus
+def _labels(lb:Tuple[Tuple[str,str],...])->str:
+    return "{"+",".join(f'{k}="{v}"' for k,v in lb)+"}" if lb else ""
+
+# # prom_text: все счётчики и агрегаты спанов в текстовом формате Prometheus
+def prom_text()->str:
+    with _M["lock"]:
+        cs=dict(_M["counters"]); sp={k:dict(v) for k,v in _M["spans"].items()}
+    lines=[]
+    for name in sorted({n for n,_ in cs}):
+        lines.append(f"# TYPE {name} counter")
+        lines+=[f"{name}{_labels(lb)} {v:g}" for (n,lb),v in sorted(cs.items()) if n==name]
+    if sp:
+        lines.append("# TYPE app_span_seconds summary")
+        for (n,lb),v in sorted(sp.items()):
+            lines+=[f"app_span_seconds_sum{_labels((('span',n),)+lb)} {round(v['sum'],4):g}",f"app_span_seconds_count{_labels((('span',n),)+lb)} {v['count']}"]
+    for metric,field in (("app_span_errors_total","errors"),("app_span_bytes_out_total","bytes_out"),("app_span_bytes_in_total","bytes_in")):
+        if not sp: break
+        lines.append(f"# TYPE {metric} counter")
+        lines+=[f"{metric}{_labels((('span',n),)+lb)} {v[field]}" for (n,lb),v in sorted(sp.items())]
+    return "\n".join(lines)+"\n"
+
+# # flush: снимок в файл Prometheus (атомарно); force=False — не чаще PROM_EVERY_S
+def flush(force:bool=False)->None:
+    path=_M["prom"]
+    if not path: return
+    now=time.monotonic()
+    with _M["lock"]:
+        if not force and now-_M["prom_t"]<PROM_EVERY_S: return
+        _M["prom_t"]=now
+    try:
+        os.makedirs(os.path.dirname(path) or ".",exist_ok=True)
+        tmp=f"{path}.{os.getpid()}.tmp"
+        with open(tmp,"w",encoding="utf-8") as f: f.write(prom_text())
+        os.replace(tmp,path)
+    except Exception: pass
+
+# # serve: HTTP-эндпоинт /metrics на METRICS_HOST (один на процесс; port=0 — не запускать). Попытка одна на процесс:
+# # app.py вызывает serve() на каждом rerun, занятый порт не должен пробоваться каждый раз
+def serve(port:int=METRICS_PORT, host:str=METRICS_HOST)->Optional[Any]:
+    if port<=0: return None
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler   # только если эндпоинт включён
+    with _M["lock"]:
+        if _M["tried"]: return _M["server"]
+        _M["tried"]=True
+        class H(BaseHTTPRequestHandler):
+            def log_message(self,*a): pass
+            def do_GET(self):
+                if self.path.split("?")[0].rstrip("/") not in ("/metrics",""): self.send_response(404); self.end_headers(); return
+                b=prom_text().encode("utf-8")
+                self.send_response(200); self.send_header("Content-Type","text/plain; version=0.0.4")
+                self.send_header("Content-Length",str(len(b))); self.end_headers(); self.wfile.write(b)
+        try: srv=ThreadingHTTPServer((host,port),H); err=None
+        except OSError as e: srv=None; err=e   # порт занят (второй процесс Streamlit/CLI) — хватает файла
+        if srv is not None:
+            srv.daemon_threads=True
+            threading.Thread(target=srv.serve_forever,daemon=True).start()
+            _M["server"]=srv
+    if err is not None: log({"span":"metrics","error":f"{type(err).__name__}: {err}","addr":f"{host}:{port}"})
+    return srv
@@ -0,0 +1,1670 @@
+# # pipeline: распознавание → правка → извлечение задач без Streamlit (для app.py и cli.py)
+from __future__ import annotations   # аннотации с np.* не требуют импорта numpy на старте
+import os, io, re, json, math, uuid, time, random, shutil, hashlib, tempfile, threading, subprocess, importlib, importlib.util, functools
+from datetime import datetime, timedelta, date
+from typing import Any, BinaryIO, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from types import MappingProxyType
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from collections import deque
+from urllib.parse import urlsplit
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import metrics
+
+# # resource — только на Unix (пик RSS для отчёта)
+try:
+    import resource
+except Exception:
+    resource = None
+
+# # LazyModule: модуль импортируется при первом обращении к атрибуту —
+# # Streamlit-страница и CLI стартуют без numpy/requests, пока они не нужны
+class LazyModule:
+    def __init__(self, name:str):
+        self._name=name; self._mod=None
+
+    def __getattr__(self, k:str)->Any:
+        if self._mod is None: self._mod=importlib.import_module(self._name)
+        return getattr(self._mod,k)
+
+np = LazyModule("numpy")
+requests = LazyModule("requests")
+
+# # optional_module: необязательная зависимость (faster-whisper, dateparser, imageio-ffmpeg) — при первом вызове; None — не установлена
+_OPTIONAL:Dict[str,Any]={}
+def optional_module(name:str)->Optional[Any]:
+    if name not in _OPTIONAL:
+        try: _OPTIONAL[name]=importlib.import_module(name)
+        except Exception: _OPTIONAL[name]=None
+    return _OPTIONAL[name]
+
+# # Timezone (KZ)
+try:
+    from zoneinfo import ZoneInfo
+    KZ_TZ = ZoneInfo("Asia/Almaty")
+except Exception:
+    ZoneInfo = None
+    KZ_TZ = None
+
+# # LLaMA endpoint defaults (override via env if нужно)
+LLAMA_BASE   = os.getenv("LLAMA_BASE", "https://vsjz8fv63q4oju-8000.proxy.runpod.net")
+LLAMA_URL    = os.getenv("LLAMA_URL", "")            # if set — используется напрямую
+LLAMA_MODEL  = os.getenv("LLAMA_MODEL", "")          # желаемая модель
+LLAMA_KEY    = os.getenv("LLAMA_API_KEY", "YOUR API KEY")
+LLAMA_AUTH_HEADER  = os.getenv("LLAMA_AUTH_HEADER", "Authorization")
+LLAMA_AUTH_SCHEME  = os.getenv("LLAMA_AUTH_SCHEME", "Bearer")
+LLAMA_DISCOVERY_TTL = int(os.getenv("LLAMA_DISCOVERY_TTL", "21600"))   # сек, кэш автоконфига (6 ч)
+LLAMA_PARALLEL     = int(os.getenv("LLAMA_PARALLEL", "4"))               # одновременных запросов к LLM (на сервер)
+LLAMA_ENDPOINTS    = os.getenv("LLAMA_ENDPOINTS", "")                    # несколько серверов: "base[|model[|key]]" через запятую
+LLAMA_CONNECT_TIMEOUT = float(os.getenv("LLAMA_CONNECT_TIMEOUT", "5"))   # сек на соединение (холодный сервер — сразу другой)
+LLAMA_TIMEOUT      = float(os.getenv("LLAMA_TIMEOUT", "180"))            # сек на ответ LLM; дольше не ждём и свободного сервера
+LLAMA_BACKOFF_S    = float(os.getenv("LLAMA_BACKOFF_S", "0.5"))          # пауза перед повтором на том же сервере (без Retry-After)
+LLAMA_CB_FAILS     = int(os.getenv("LLAMA_CB_FAILS", "3"))               # ошибок подряд → сервер выключается на паузу
+LLAMA_CB_COOLDOWN_S = float(os.getenv("LLAMA_CB_COOLDOWN_S", "15"))      # первая пауза, сек (дальше удваивается)
+LLAMA_CB_MAX_S     = 300.0                                               # потолок паузы выключенного сервера
+LLAMA_HEDGE        = os.getenv("LLAMA_HEDGE", "1")!="0"                  # копия запроса на второй сервер при долгом ответе
+LLAMA_HEDGE_MIN_S  = float(os.getenv("LLAMA_HEDGE_MIN_S", "2"))          # не раньше N с (иначе — p95 недавних ответов)
+LLAMA_HEDGE_PCT    = float(os.getenv("LLAMA_HEDGE_PCT", "10"))           # хеджей — не больше N% запросов
+CLEAN_CHUNK_TOKENS = int(os.getenv("CLEAN_CHUNK_TOKENS", "1200"))        # ~токенов в одном окне правки
+CLEAN_OVERLAP_TOKENS = int(os.getenv("CLEAN_OVERLAP_TOKENS", "80"))      # ~токенов контекста из прошлого окна
+EXTRACT_CHUNK_TOKENS = int(os.getenv("EXTRACT_CHUNK_TOKENS", "3000"))    # длиннее — map-reduce извлечение
+EXTRACT_OVERLAP_TOKENS = int(os.getenv("EXTRACT_OVERLAP_TOKENS", "200")) # перекрытие окон извлечения
+EXTRACT_BLOCK_TOKENS = int(os.getenv("EXTRACT_BLOCK_TOKENS", "800"))    # ~токенов в блоке инкрементального извлечения
+EXTRACT_SCHEMA = os.getenv("EXTRACT_SCHEMA", "1")!="0"                  # извлечение с response_format (JSON-схема), где сервер умеет
+EXTRACT_TASK_TOKENS = int(os.getenv("EXTRACT_TASK_TOKENS", "120"))      # ~токенов ответа на одну задачу
+EXTRACT_TASKS_PER_1K = float(os.getenv("EXTRACT_TASKS_PER_1K", "8"))    # задач на 1000 токенов текста (оценка с запасом)
+EXTRACT_MAX_TOKENS = int(os.getenv("EXTRACT_MAX_TOKENS", "4000"))       # max_tokens одного ответа извлечения, не больше
+EXTRACT_CONTINUE = int(os.getenv("EXTRACT_CONTINUE", "3"))              # догрузок, если ответ оборвался на max_tokens
+LLM_CACHE_MB = int(os.getenv("LLM_CACHE_MB", "256"))                     # лимит дискового кэша ответов LLM
+LLAMA_STREAM = os.getenv("LLAMA_STREAM", "1")!="0"                      # извлечение задач стримом (SSE)
+
+# # Кэш на диске (переживает перезапуск процесса)
+CACHE_DIR    = os.getenv("APP_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "whisper-llama-jira"))
+metrics.setup(prom=os.getenv("METRICS_PROM") or os.path.join(CACHE_DIR, "metrics.prom"))   # счётчики и спаны для Prometheus
+
+# # Inference config (устройство и compute type — device()/compute_type(), проба один раз на процесс)
+WHISPER_SIZE = os.getenv("WHISPER_SIZE", "medium")
+WHISPER_BEAM = int(os.getenv("WHISPER_BEAM", "5"))                    # beam search; 1 — жадный, быстрее на CPU
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))      # 0 — по умолчанию CTranslate2
+WHISPER_WORKERS = int(os.getenv("WHISPER_NUM_WORKERS", "1"))          # параллельных transcribe() на одну модель
+WHISPER_BATCH = int(os.getenv("WHISPER_BATCH", "0"))                  # >0 — batched: столько VAD-кусков за проход
+WHISPER_FALLBACK_SIZE = os.getenv("WHISPER_FALLBACK_SIZE", "")        # модель попроще (например small), "" — выкл.
+WHISPER_FALLBACK_MIN = float(os.getenv("WHISPER_FALLBACK_MIN", "0"))  # запись длиннее N минут → fallback (0 — выкл.)
+WHISPER_FALLBACK_QUEUE = int(os.getenv("WHISPER_FALLBACK_QUEUE", "0"))# в очереди больше N файлов → fallback (0 — выкл.)
+WHISPER_SHARDS = int(os.getenv("WHISPER_SHARDS", "0"))                # CPU: процессов на одну длинную запись (0/1 — выкл.)
+WHISPER_SHARD_MIN_S = float(os.getenv("WHISPER_SHARD_MIN_S", "300"))  # шард не короче N секунд
+SHARD_PAD_S  = 2.0                                                     # перекрытие шардов, сек (дубли на стыке убирает merge)
+SUPPORTED    = ["wav","mp3","m4a","ogg","flac","mp4","mov","mkv","webm"]
+VIDEO_EXT    = ["mp4","mov","mkv","webm"]
+VAD_PARAMS   = {"min_silence_duration_ms":500}
+TRANSCRIPT_CACHE_MB = int(os.getenv("TRANSCRIPT_CACHE_MB", "512"))   # лимит дискового кэша расшифровок
+SAMPLE_RATE  = 16000                                                   # Whisper ждёт 16 кГц mono float32
+PCM_SPILL_MB = int(os.getenv("PCM_SPILL_MB", "256"))                   # больше — PCM на диск (memmap); 1 мин ≈ 3.7 МБ
+PRIORITIES   = ["Highest","High","Medium","Low","Lowest"]
+MAX_SUMMARY  = 160
+DUE_CACHE_SIZE = int(os.getenv("DUE_CACHE_SIZE", "4096"))            # LRU разобранных сроков (фраза, дата отсчёта, tz)
+DUE_DP_MAX_CHARS = 80                                                  # dateparser — только для коротких фраз, не для расшифровки
+DUE_DEFAULT_DAYS = 3                                                   # срок, если в тексте его нет
+
+# # _HW: результаты проб окружения (GPU, ffmpeg) — на процесс, а не на каждый rerun/вызов
+_HW:Dict[str,Any]={}
+
+# # device: cuda, если отвечает nvidia-smi (WHISPER_DEVICE — задать явно, без пробы)
+def device()->str:
+    if "device" not in _HW:
+        d=os.getenv("WHISPER_DEVICE","")
+        if not d:
+            exe=shutil.which("nvidia-smi")
+            try: d="cuda" if exe and subprocess.run([exe],stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL,timeout=10).returncode==0 else "cpu"
+            except Exception: d="cpu"
+        _HW["device"]=d
+    return _HW["device"]
+
+# # compute_type: WHISPER_COMPUTE или по устройству
+def compute_type()->str:
+    return os.getenv("WHISPER_COMPUTE") or ("int8_float16" if device()=="cuda" else "int8")
+
+# # ffmpeg_exe: ffmpeg из imageio-ffmpeg (и его папка — в PATH) или системный; None — нет
+def ffmpeg_exe()->Optional[str]:
+    if "ffmpeg" not in _HW:
+        exe=None; iff=optional_module("imageio_ffmpeg")
+        if iff:
+            try:
+                exe=iff.get_ffmpeg_exe()
+                os.environ["PATH"]=str(os.path.dirname(exe))+os.pathsep+os.environ.get("PATH","")
+            except Exception: exe=None
+        _HW["ffmpeg"]=exe or shutil.which("ffmpeg")
+    return _HW["ffmpeg"]
+
+# # whisper_available: установлен ли faster-whisper (без импорта — он тяжёлый)
+def whisper_available()->bool:
+    return importlib.util.find_spec("faster_whisper") is not None
+
+# # whisper_cls: класс WhisperModel (импорт faster-whisper — при первой расшифровке); None — не установлен
+def whisper_cls()->Optional[Any]:
+    fw=optional_module("faster_whisper")
+    return getattr(fw,"WhisperModel",None) if fw else None
+
+# # batched_cls: BatchedInferencePipeline — есть в faster-whisper >= 1.1 (в requirements 1.0.3: без него — обычный режим)
+def batched_cls()->Optional[Any]:
+    fw=optional_module("faster_whisper")
+    return getattr(fw,"BatchedInferencePipeline",None) if fw else None
+
+# # kz_now: текущее время в Asia/Almaty
+def kz_now():
+    return datetime.now(KZ_TZ) if KZ_TZ else datetime.now()
+
+# # cache_count: +1 к счётчику попаданий/промахов кэша (metrics → CACHE_DIR/metrics.prom)
+def cache_count(name:str, hit:bool)->None:
+    metrics.count("app_cache_hits_total" if hit else "app_cache_misses_total",cache=name)
+
+# # cache_stats: {имя кэша: {"hit":N,"miss":M}}
+def cache_stats()->Dict[str,Dict[str,int]]:
+    out:Dict[str,Dict[str,int]]={}
+    for kind,name in (("hit","app_cache_hits_total"),("miss","app_cache_misses_total")):
+        for lb,v in metrics.counters(name).items():
+            out.setdefault(dict(lb)["cache"],{"hit":0,"miss":0})[kind]=int(v)
+    return dict(sorted(out.items()))
+
+# # disk_cache_get: запись JSON-кэша по ключу; mtime обновляем — это отметка для LRU
+def disk_cache_get(folder:str, key:str)->Optional[Any]:
+    path=os.path.join(folder,key+".json")
+    try:
+        with open(path,"r",encoding="utf-8") as f: val=json.load(f)
+        os.utime(path,None)
+        return val
+    except Exception:
+        return None
+
+# # disk_cache_evict: удалить самые давние записи, пока папка больше cap_bytes
+def disk_cache_evict(folder:str, cap_bytes:int)->None:
+    try:
+        items=[]
+        for e in os.scandir(folder):
+            if e.is_file() and e.name.endswith(".json"):
+                stt=e.stat(); items.append((stt.st_mtime,stt.st_size,e.path))
+    except Exception:
+        return
+    total=sum(x[1] for x in items)
+    for _,size,path in sorted(items):
+        if total<=cap_bytes: break
+        try: os.unlink(path); total-=size
+        except Exception: pass
+
+# # disk_cache_put: атомарно записать значение и подрезать кэш по размеру
+def disk_cache_put(folder:str, key:str, val:Any, cap_bytes:int)->None:
+    try:
+        os.makedirs(folder,exist_ok=True)
+        tmp=os.path.join(folder,f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp,"w",encoding="utf-8") as f: json.dump(val,f,ensure_ascii=False)
+        os.replace(tmp,os.path.join(folder,key+".json"))
+    except Exception:
+        return
+    disk_cache_evict(folder,cap_bytes)
+
+# # sid: короткий id
+def sid(n:int=10)->str:
+    return uuid.uuid4().hex[:n]
+
+# # to_iso: вернуть YYYY-MM-DD если валидно
+ISO_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+def to_iso(d:Any)->str:
+    if not d: return ""
+    if isinstance(d,date): return d.isoformat()
+    s=str(d).strip()
+    return s if ISO_RE.match(s) else ""
+
+# # WEEKDAYS: формы дня недели (ru — им./вин./дат. падеж, en) → индекс
+WEEKDAYS = {"понедельник":0,"вторник":1,"среда":2,"среду":2,"четверг":3,"пятница":4,"пятницу":4,"суббота":5,"субботу":5,"воскресенье":6,
+            "понедельнику":0,"вторнику":1,"среде":2,"четвергу":3,"пятнице":4,"субботе":5,"воскресенью":6,
+            "monday":0,"tuesday":1,"wednesday":2,"thursday":3,"friday":4,"saturday":5,"sunday":6}
+WEEKDAY_RE = "|".join(sorted(WEEKDAYS,key=len,reverse=True))
+
+# # weekday_ru_to_idx: день недели → индекс
+def weekday_ru_to_idx(word:str)->Optional[int]:
+    return WEEKDAYS.get(word.lower().strip())
+
+# # next_weekday: следующая дата указанного дня недели
+def next_weekday(base:date, idx:int)->date:
+    delta=(idx - base.weekday()) % 7
+    delta = 7 if delta==0 else delta
+    return base + timedelta(days=delta)
+
+# # _ymd: дата из чисел или None, если такой даты нет
+def _ymd(y:str, m:str, d:str)->Optional[date]:
+    try: return date(int(y),int(m),int(d))
+    except ValueError: return None
+
+# # DUE_PHRASE_RULES: срок целиком (поле due от LLM) — (regex, дата от today); компилируются один раз
+DUE_PHRASE_RULES = [
+    (re.compile(r"^(?:сегодня|today)$"), lambda m,t: t),
+    (re.compile(r"^(?:завтра|tomorrow)$"), lambda m,t: t+timedelta(days=1)),
+    (re.compile(r"^(?:послезавтра|day after tomorrow)$"), lambda m,t: t+timedelta(days=2)),
+    (re.compile(r"^(?:через|in)\s+(\d+)\s*(?:дн(?:я|ей|ь)?|day|days)$"), lambda m,t: t+timedelta(days=int(m.group(1)))),
+    (re.compile(r"^(?:через|in)\s+(\d+)\s*(?:недел[юиь]|week|weeks)$"), lambda m,t: t+timedelta(days=int(m.group(1))*7)),
+    (re.compile(r"^(?:во?|ко?|до|on|by)?\s*("+WEEKDAY_RE+r")$"), lambda m,t: next_weekday(t,WEEKDAYS[m.group(1)])),
+    (re.compile(r"^(\d{2})[./-](\d{2})[./-](\d{4})$"), lambda m,t: _ymd(m.group(3),m.group(2),m.group(1))),
+    (re.compile(r"^(\d{4})[./-](\d{2})[./-](\d{2})$"), lambda m,t: _ymd(m.group(1),m.group(2),m.group(3))),
+]
+
+# # DUE_TEXT_RULES: срок внутри свободного текста; порядок — приоритет (первое правило с совпадением выигрывает)
+DUE_TEXT_RULES = [
+    (re.compile(r"послезавтра|day after tomorrow"), lambda m,t: t+timedelta(days=2)),
+    (re.compile(r"завтра(?!к)|tomorrow"), lambda m,t: t+timedelta(days=1)),
+    (re.compile(r"\b(?:через|in)\s+(\d+)\s*(?:дн|day)"), lambda m,t: t+timedelta(days=int(m.group(1)))),
+    (re.compile(r"\b(?:через|in)\s+(\d+)\s*(?:нед|week)"), lambda m,t: t+timedelta(days=int(m.group(1))*7)),
+]+[(re.compile(r"\b(?:"+"|".join(w for w,i in WEEKDAYS.items() if i==k)+")"), lambda m,t,k=k: next_weekday(t,k)) for k in range(7)]+[
+    (re.compile(r"на этой неделе|в течение недели|this week|within a week"), lambda m,t: t+timedelta(days=7)),
+]
+
+# # due_today: дата отсчёта в часовом поясе tz
+def due_today(tz:str="Asia/Almaty")->date:
+    z=ZoneInfo(tz) if ZoneInfo else None
+    return datetime.now(z).date() if z else datetime.now().date()
+
+# # due_norm: нормализованная фраза — ключ кэша
+def due_norm(s:str)->str:
+    return " ".join((s or "").lower().replace("ё","е").split())
+
+# # _dateparser_due: dateparser относительно today (RELATIVE_BASE — результат зависит только от ключа кэша)
+def _dateparser_due(s:str, today:date, tz:str)->str:
+    dp=optional_module("dateparser")
+    if not dp or len(s)>DUE_DP_MAX_CHARS: return ""
+    try:
+        dt=dp.parse(s,languages=["ru","en"],settings={"TIMEZONE":tz,"RETURN_AS_TIMEZONE_AWARE":True,"PREFER_DATES_FROM":"future",
+                                                      "RELATIVE_BASE":datetime(today.year,today.month,today.day)})
+        if dt: return dt.astimezone(ZoneInfo(tz)).date().isoformat() if ZoneInfo else dt.date().isoformat()
+    except Exception: pass
+    return ""
+
+# # due_phrase_cached: срок-фраза → ISO ("" — не распознан); LRU по (фраза, дата отсчёта, tz)
+@functools.lru_cache(maxsize=DUE_CACHE_SIZE)
+def due_phrase_cached(s:str, today:date, tz:str)->str:
+    for rx,fn in DUE_PHRASE_RULES:
+        m=rx.match(s)
+        if m:
+            d=fn(m,today)
+            if d: return d.isoformat()
+    return _dateparser_due(s,today,tz)
+
+# # due_scan_text: совпадения правил DUE_TEXT_RULES в тексте → {номер правила: ISO} (первое совпадение каждого правила)
+def due_scan_text(s:str, today:date)->Dict[int,str]:
+    out={}
+    for i,(rx,fn) in enumerate(DUE_TEXT_RULES):
+        m=rx.search(s)
+        if m: out[i]=fn(m,today).isoformat()
+    return out
+
+# # due_scan: то же с LRU — для коротких текстов (описания задач); расшифровку сканирует due_scan_text без кэша.
+# # Ответ только для чтения: один и тот же объект отдаётся всем вызовам с этим текстом, правка испортила бы кэш
+@functools.lru_cache(maxsize=DUE_CACHE_SIZE)
+def due_scan(s:str, today:date)->Mapping[int,str]:
+    return MappingProxyType(due_scan_text(s,today))
+
+# # due_pick: срок по приоритету правил; срок из текста задачи важнее срока из контекста (расшифровки)
+def due_pick(own:Mapping[int,str], ctx:Optional[Mapping[int,str]]=None)->str:
+    for hits in (own,ctx or {}):
+        if hits: return hits[min(hits)]
+    return ""
+
+# # parse_due_kz: парсинг относительных сроков → ISO
+def parse_due_kz(s:str, today:Optional[date]=None, tz:str="Asia/Almaty")->str:
+    s=due_norm(s)
+    if not s: return ""
+    return due_phrase_cached(s,today or due_today(tz),tz)
+
+# # infer_due_from_text: дедлайн из текстовой фразы (по умолчанию — через DUE_DEFAULT_DAYS дней)
+def infer_due_from_text(text:str, today:Optional[date]=None, tz:str="Asia/Almaty", ctx:Optional[Dict[int,str]]=None)->str:
+    t=today or due_today(tz); s=due_norm(text)
+    return due_pick(due_scan(s,t),ctx) or (due_phrase_cached(s,t,tz) if s else "") or (t+timedelta(days=DUE_DEFAULT_DAYS)).isoformat()
+
+# # resolve_due_batch: сроки всех задач за один проход — source_text (расшифровка) сканируется один раз, а не на каждую задачу
+def resolve_due_batch(tasks:List[Dict[str,Any]], source_text:str="", today:Optional[date]=None, tz:str="Asia/Almaty")->List[Dict[str,Any]]:
+    t=today or due_today(tz)
+    ctx=due_scan_text(due_norm(source_text),t) if source_text else None
+    for x in tasks:
+        due=str(x.get("due") or "").strip()
+        if to_iso(due): continue
+        x["due"]=(parse_due_kz(due,t,tz) if due else "") or infer_due_from_text(x.get("description","") or "",t,tz,ctx)
+    return tasks
+
+# # due_cache_info: заполнение и попадания LRU сроков (для бенчмарка)
+def due_cache_info()->Dict[str,Dict[str,int]]:
+    return {n:f.cache_info()._asdict() for n,f in (("phrase",due_phrase_cached),("scan",due_scan))}
+
+# # rss_peak_mb: пик RSS процесса (self) и дочерних ffmpeg (children), МБ
+def rss_peak_mb()->Dict[str,float]:
+    if resource is None: return {}
+    k=1024.0*1024.0 if os.uname().sysname=="Darwin" else 1024.0   # ru_maxrss: байты в macOS, КБ в Linux
+    return {"rss_peak_mb":round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/k,1),
+            "ffmpeg_rss_peak_mb":round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss/k,1)}
+
+# # io_bytes: (прочитано, записано) байт с диска процессом — /proc/self/io; None — не Linux
+def io_bytes()->Optional[Tuple[int,int]]:
+    try:
+        with open("/proc/self/io","r") as f: d=dict(l.split(":",1) for l in f.read().splitlines() if ":" in l)
+        return int(d["read_bytes"]), int(d["write_bytes"])
+    except Exception:
+        return None
+
+# # stream_sha256: sha256 файлового объекта по кускам; позиция возвращается в начало
+def stream_sha256(f:BinaryIO, bufsize:int=1<<20)->str:
+    h=hashlib.sha256(); f.seek(0)
+    for b in iter(lambda: f.read(bufsize), b""): h.update(b)
+    f.seek(0)
+    return h.hexdigest()
+
+# # _pipe_in: файловый объект → stdin ffmpeg кусками (отдельный поток, чтобы не упереться в буфер канала)
+def _pipe_in(src:BinaryIO, stdin:Any, bufsize:int=1<<20)->None:
+    try:
+        src.seek(0)
+        for b in iter(lambda: src.read(bufsize), b""): stdin.write(b)
+    except (BrokenPipeError, OSError, ValueError):
+        pass    # ffmpeg закрыл вход раньше (не тот формат) — причину скажет код возврата
+    finally:
+        try: stdin.close()
+        except Exception: pass
+
+# # decode_pcm: аудио/видео → 16 кГц mono float32 через каналы ffmpeg, без промежуточного WAV.
+# # src — путь или файловый объект (загрузка Streamlit). До spill_mb PCM копится в памяти,
+# # дальше пишется во временный файл и отдаётся как np.memmap. stats ← pcm_mb, spilled, decode_s, диск, пик RSS.
+def decode_pcm(src:Union[str,BinaryIO], stats:Optional[Dict[str,Any]]=None, spill_mb:int=PCM_SPILL_MB)->np.ndarray:
+    stats=stats if stats is not None else {}
+    exe=ffmpeg_exe()
+    if not exe: raise RuntimeError("ffmpeg not found")
+    t0=time.perf_counter(); io0=io_bytes()
+    piped=not isinstance(src,str)
+    cmd=[exe,"-hide_banner","-loglevel","error"]+([] if piped else ["-nostdin"])+["-i","pipe:0" if piped else src,
+         "-vn","-ac","1","-ar",str(SAMPLE_RATE),"-f","f32le","pipe:1"]
+    err=tempfile.TemporaryFile()
+    proc=subprocess.Popen(cmd,stdin=subprocess.PIPE if piped else subprocess.DEVNULL,stdout=subprocess.PIPE,stderr=err)
+    writer=None
+    if piped:
+        writer=threading.Thread(target=_pipe_in,args=(src,proc.stdin),daemon=True); writer.start()
+    buf=bytearray(); spill=None; n=0; cap=spill_mb*1024*1024
+    try:
+        for b in iter(lambda: proc.stdout.read(1<<20), b""):
+            n+=len(b)
+            if spill is None and len(buf)+len(b)>cap:
+                spill=tempfile.NamedTemporaryFile(delete=False,suffix=".f32"); spill.write(buf); buf=bytearray()
+            if spill is not None: spill.write(b)
+            else: buf+=b
+        rc=proc.wait()
+    finally:
+        if proc.poll() is None: proc.kill(); proc.wait()
+        if writer: writer.join()
+        if spill is not None: spill.close()
+    err.seek(0); msg=err.read().decode("utf-8","replace").strip()[-300:]; err.close()
+    # mp4/mov с индексом (moov) в конце из канала не читаются (ошибка или пустой выход) — один раз через временный файл
+    if piped and (rc!=0 or n==0) and not stats.get("spooled"):
+        if spill is not None: os.unlink(spill.name)
+        tmp=tempfile.NamedTemporaryFile(delete=False)
+        try:
+            src.seek(0); shutil.copyfileobj(src,tmp,1<<20); tmp.close()
+            stats["spooled"]=True
+            return decode_pcm(tmp.name,stats,spill_mb)
+        finally:
+            os.unlink(tmp.name)
+    if rc!=0:
+        if spill is not None: os.unlink(spill.name)
+        raise RuntimeError("ffmpeg failed: "+(msg or f"code {rc}"))
+    n-=n%4
+    if spill is not None:
+        audio=np.memmap(spill.name,dtype=np.float32,mode="r",shape=(n//4,))
+        try: os.unlink(spill.name)   # отображение держит файл, пока массив жив (POSIX)
+        except OSError: pass
+    else:
+        audio=np.frombuffer(buf,dtype=np.float32,count=n//4)
+    io1=io_bytes()
+    stats.update({"pcm_mb":round(n/1048576,1),"spilled":spill is not None,"decode_s":round(time.perf_counter()-t0,3),**rss_peak_mb()})
+    if io0 and io1: stats.update({"disk_read_mb":round((io1[0]-io0[0])/1048576,1),"disk_write_mb":round((io1[1]-io0[1])/1048576,1)})
+    return audio
+
+# # llm_specs: серверы LLM из LLAMA_ENDPOINTS («base[|model[|key]]» через запятую; URL на /chat/completions или
+# # /responses — без автоконфига); пусто — один сервер из LLAMA_URL/LLAMA_BASE, как раньше
+def llm_specs()->List[Dict[str,str]]:
+    out=[]
+    for part in re.split(r"[,\n]",LLAMA_ENDPOINTS):
+        f=[x.strip() for x in part.split("|")]
+        u=f[0].rstrip("/")
+        if not u: continue
+        direct=u.endswith("/chat/completions") or u.endswith("/responses")
+        out.append({"base":"" if direct else u,"url":u if direct else "","model":f[1] if len(f)>1 and f[1] else LLAMA_MODEL,
+                    "key":f[2] if len(f)>2 else LLAMA_KEY})
+    return out or [{"base":LLAMA_BASE.strip().rstrip("/"),"url":LLAMA_URL.strip(),"model":LLAMA_MODEL,"key":LLAMA_KEY}]
+
+# # llama_headers: заголовки с токеном (key — ключ сервера, по умолчанию LLAMA_API_KEY)
+def llama_headers(key:Optional[str]=None)->Dict[str,str]:
+    h={"Content-Type":"application/json"}
+    key=LLAMA_KEY if key is None else key
+    if key: h[LLAMA_AUTH_HEADER]=f"{LLAMA_AUTH_SCHEME} {key}"
+    return h
+
+# # llama_models: список моделей с сервера (ses — keep-alive сессия сервера)
+def llama_models(base:str, key:Optional[str]=None, ses:Any=None)->List[str]:
+    try:
+        r=metrics.http("llm",(ses or requests).get,base.rstrip("/")+"/v1/models",headers=llama_headers(key),timeout=30)
+        if not r.ok: return []
+        arr=r.json().get("data",[])
+        out=[]
+        for x in arr:
+            mid=x.get("id") if isinstance(x,dict) else None
+            if isinstance(mid,str): out.append(mid)
+        return out
+    except Exception:
+        return []
+
+# # model_pick: выбрать «лучшую» модель по названию
+def model_pick(models:List[str], prefer:str)->str:
+    if prefer and prefer in models: return prefer
+    if prefer:
+        low=prefer.lower()
+        for m in models:
+            if m.lower()==low: return m
+    ranked=[]
+    for m in models:
+        ml=m.lower();score=0
+        if "instruct" in ml or "chat" in ml: score+=3
+        if "llama" in ml: score+=2
+        if "scout" in ml: score+=1
+        if "fp8" in ml: score+=1
+        ranked.append((score,m))
+    ranked.sort(key=lambda x:(-x[0],x[1]))
+    return ranked[0][1] if ranked else ""
+
+# # try_mode: определить рабочий endpoint (chat/responses)
+def try_mode(base:str, model:str, key:Optional[str]=None, ses:Any=None)->Tuple[str,str]:
+    urlc=base.rstrip("/")+"/v1/chat/completions"
+    urlr=base.rstrip("/")+"/v1/responses"
+    m={"model":model or "llama","temperature":0.1}; post=(ses or requests).post
+    try:
+        rc=metrics.http("llm",post,urlc,headers=llama_headers(key),json={**m,"messages":[{"role":"user","content":"ping"}]},timeout=25)
+        if rc.status_code==200: return "chat",urlc
+    except Exception: pass
+    try:
+        rr=metrics.http("llm",post,urlr,headers=llama_headers(key),json={**m,"input":[{"role":"user","content":"ping"}]},timeout=25)
+        if rr.status_code==200: return "responses",urlr
+    except Exception: pass
+    return "",""
+
+# # discovery_key: ключ кэша автоконфига (base, model, хэш ключа); без аргументов — первый сервер llm_specs()
+def discovery_key(spec:Optional[Dict[str,str]]=None)->str:
+    spec=spec or llm_specs()[0]
+    kh=hashlib.sha256((spec["key"] or "").encode("utf-8")).hexdigest()[:16]
+    return "|".join([spec["base"],spec["model"],kh])
+
+# # _discovery_store: кэш автоконфига в памяти процесса (модуль живёт между rerun Streamlit);
+# # probes — блокировка пробы на каждый сервер (разные серверы пробуются параллельно)
+_DISCOVERY:Dict[str,Any]={"lock":threading.Lock(),"probes":{},"items":{}}
+def _discovery_store()->Dict[str,Any]:
+    return _DISCOVERY
+
+# # _discovery_file: путь к дисковой копии кэша автоконфига
+def _discovery_file()->str:
+    return os.path.join(CACHE_DIR,"llama_discovery.json")
+
+# # _discovery_disk: прочитать дисковый кэш автоконфига
+def _discovery_disk()->Dict[str,Any]:
+    try:
+        with open(_discovery_file(),"r",encoding="utf-8") as f: data=json.load(f)
+        return data if isinstance(data,dict) else {}
+    except Exception:
+        return {}
+
+# # _discovery_flush: атомарно записать кэш автоконфига на диск
+def _discovery_flush(items:Dict[str,Any])->None:
+    try:
+        os.makedirs(CACHE_DIR,exist_ok=True)
+        tmp=_discovery_file()+f".{os.getpid()}.tmp"
+        with open(tmp,"w",encoding="utf-8") as f: json.dump(items,f,ensure_ascii=False)
+        os.replace(tmp,_discovery_file())
+    except Exception: pass
+
+# # discovery_get: взять (mode,url,model) из кэша, если не протух
+def discovery_get(key:str)->Optional[Tuple[str,str,str]]:
+    store=_discovery_store()
+    with store["lock"]:
+        it=store["items"].get(key)
+        if it is None:
+            it=_discovery_disk().get(key)
+            if it: store["items"][key]=it
+    if not it or time.time()-float(it.get("ts",0))>LLAMA_DISCOVERY_TTL: return None
+    if not it.get("mode") or not it.get("url"): return None
+    return it["mode"],it["url"],it.get("model","")
+
+# # discovery_put: сохранить результат автоконфига (память + диск)
+def discovery_put(key:str,mode:str,url:str,model:str)->None:
+    store=_discovery_store()
+    with store["lock"]:
+        store["items"][key]={"mode":mode,"url":url,"model":model,"ts":time.time()}
+        items={**_discovery_disk(),**store["items"]}
+        _discovery_flush(items)
+
+# # discovery_invalidate: сбросить кэш автоконфига (по умолчанию — текущий ключ)
+def discovery_invalidate(key:Optional[str]=None)->None:
+    key=key or discovery_key()
+    store=_discovery_store()
+    with store["lock"]:
+        store["items"].pop(key,None)
+        items=_discovery_disk()
+        if items.pop(key,None) is not None: _discovery_flush(items)
+
+# # autodiscover: автоконфиг LLaMA (base → model → mode/url), с кэшем; spec — сервер из llm_specs() (по умолчанию первый)
+def autodiscover(force:bool=False, spec:Optional[Dict[str,str]]=None, ses:Any=None)->Tuple[str,str,str]:
+    spec=spec or llm_specs()[0]
+    if spec["url"]:
+        u=spec["url"]
+        mode="chat" if "/chat/completions" in u else ("responses" if "/responses" in u else "")
+        return mode,u,spec["model"] or ""
+    base=spec["base"]; key=discovery_key(spec); store=_discovery_store()
+    if not force:
+        hit=discovery_get(key)
+        if hit: return hit
+    # параллельные вызовы не должны пинговать один сервер одновременно
+    with store["lock"]: probe=store["probes"].setdefault(key,threading.Lock())
+    with probe:
+        if not force:
+            hit=discovery_get(key)
+            if hit: return hit
+        with metrics.span("autodiscover",host=urlsplit(base).netloc) as sp:
+            models=llama_models(base,spec["key"],ses)
+            model=model_pick(models,spec["model"])
+            mode,url=try_mode(base, model or (models[0] if models else "llama"), spec["key"], ses)
+            model=model or (models[0] if models else "llama")
+            sp["mode"]=mode
+        if mode and url: discovery_put(key,mode,url,model)
+    return mode,url,model
+
+# # LLMDown: сервер недоступен (автоконфиг не нашёл endpoint, все серверы выключены предохранителем или на паузе дольше LLAMA_TIMEOUT)
+class LLMDown(RuntimeError):
+    pass
+
+# # http_status: код ответа из requests.HTTPError (0 — не HTTP-ошибка)
+def http_status(e:BaseException)->int:
+    r=getattr(e,"response",None)
+    return r.status_code if r is not None else 0
+
+# # llm_failover: ошибку стоит повторить на другом сервере — сервер лежит, перегружен или оборвал соединение;
+# # остальные 4xx (плохой запрос, длинный контекст) на любом сервере будут теми же
+def llm_failover(e:BaseException)->bool:
+    code=http_status(e)
+    if code: return code in (404,405,408,409,425,429) or code>=500
+    return isinstance(e,(LLMDown,requests.RequestException,ConnectionError,TimeoutError))
+
+# # llm_health: что ошибка говорит о здоровье сервера — fail (лежит, 5xx, обрыв) или neutral
+# # (429 — перегружен, пауза по Retry-After; 404/405 — сменился API; ошибка запроса)
+def llm_health(e:BaseException)->str:
+    return "fail" if llm_failover(e) and http_status(e) not in (404,405,429) else "neutral"
+
+# # llm_retry_after: пауза сервера из Retry-After ответа 429/503 (секунды, не больше минуты); 0 — заголовка нет
+def llm_retry_after(e:BaseException)->float:
+    if http_status(e) not in (429,503): return 0.0
+    try: return max(0.0,min(60.0,float(e.response.headers.get("Retry-After") or 0)))
+    except (TypeError,ValueError): return 0.0
+
+# # Endpoint: один сервер LLM — автоконфиг, keep-alive сессия, запросы в работе, задержки ответов и предохранитель
+# # (LLAMA_CB_FAILS ошибок подряд → сервер выключен на паузу; после паузы — один пробный запрос, провал удваивает паузу)
+class Endpoint:
+    def __init__(self, spec:Dict[str,str]):
+        self.spec=spec; self.name=urlsplit(spec["url"] or spec["base"]).netloc or spec["url"] or spec["base"]
+        self.lock=threading.Lock(); self.ses=None; self.cfg:Tuple[str,str,str]=("","","")
+        self.inflight=0; self.fails=0; self.state="closed"; self.until=0.0; self.pause=0.0; self.trial=False
+        self.cooldown=LLAMA_CB_COOLDOWN_S; self.lat:deque=deque(maxlen=200); self.ewma=0.0; self.starts:List[float]=[]
+        self.stats={"requests":0,"ok":0,"errors":0,"hedges":0,"opened":0}
+        self.schema=True   # принимает response_format (JSON-схему); False — после 400/422 на запрос со схемой
+
+    # # session: keep-alive Session сервера (пул соединений под параллельные окна и хеджи)
+    def session(self)->requests.Session:
+        with self.lock:
+            if self.ses is None:
+                ses=requests.Session()
+                ad=requests.adapters.HTTPAdapter(pool_connections=1,pool_maxsize=max(8,LLAMA_PARALLEL*2))
+                ses.mount("https://",ad); ses.mount("http://",ad); self.ses=ses
+            return self.ses
+
+    # # config: (mode, url, model) сервера — автоконфиг с общим кэшем
+    def config(self, force:bool=False)->Tuple[str,str,str]:
+        mode,url,model=autodiscover(force,self.spec,self.session())
+        if not mode or not url: raise LLMDown(f"{self.name}: LLM endpoint not found")
+        self.cfg=(mode,url,model)
+        return self.cfg
+
+    # # invalidate: сбросить автоконфиг (404/405 — сервер сменил модель или API)
+    def invalidate(self)->None:
+        if not self.spec["url"]: discovery_invalidate(discovery_key(self.spec))
+
+    def meta(self)->Dict[str,str]:
+        return {"mode":self.cfg[0],"url":self.cfg[1],"model":self.cfg[2],"endpoint":self.name}
+
+    # # ready: можно слать запрос — предохранитель закрыт (или пауза кончилась и пробный ещё не ушёл), нет паузы Retry-After
+    def ready(self, now:float)->bool:
+        with self.lock:
+            if now<self.pause: return False
+            return self.state=="closed" or (now>=self.until and not self.trial)
+
+    # # wake: когда сервер снова примет запрос — конец паузы Retry-After и выключения; пробный запрос ещё в работе — скоро, проверить снова
+    def wake(self, now:float)->float:
+        with self.lock:
+            t=self.pause
+            if self.state!="closed": t=max(t,now+0.1 if self.trial else self.until)
+            return t
+
+    # # why: почему сервер сейчас не принимает запросы (для текста LLMDown)
+    def why(self, now:float)->str:
+        with self.lock:
+            if now<self.pause: return f"{self.name}: пауза по Retry-After ещё {self.pause-now:.0f} с"
+            return f"{self.name}: выключен после {self.fails} ошибок подряд"
+
+    # # load: (запросов в работе + 1) × ожидаемое время ответа — EWMA ответов или возраст самого старого запроса в работе
+    # # (зависший сервер дорожает, пока висит, а не после таймаута)
+    def load(self, now:float)->float:
+        with self.lock:
+            age=now-self.starts[0] if self.starts else 0.0
+            return (self.inflight+1)*max(self.ewma,age,1e-3)
+
+    def begin(self)->float:
+        with self.lock:
+            t=time.monotonic(); self.inflight+=1; self.stats["requests"]+=1; self.starts.append(t)
+            if self.state!="closed": self.trial=True
+            return t
+
+    # # end: итог запроса — ok, fail (сервер болен) или neutral (не про здоровье сервера); lat — учесть задержку для хеджа
+    def end(self, t0:float, status:str, lat:bool=True, pause:float=0.0)->None:
+        opened=False; dur=time.monotonic()-t0
+        with self.lock:
+            self.inflight-=1; self.starts.remove(t0)
+            if pause: self.pause=max(self.pause,time.monotonic()+pause)
+            if status=="ok":
+                self.stats["ok"]+=1; self.fails=0; self.state="closed"; self.trial=False; self.cooldown=LLAMA_CB_COOLDOWN_S
+                if lat: self.lat.append(dur); self.ewma=dur if not self.ewma else 0.8*self.ewma+0.2*dur
+                return
+            if status!="fail":
+                self.trial=False; return
+            self.stats["errors"]+=1; self.fails+=1
+            if self.state!="closed" or self.fails>=LLAMA_CB_FAILS:
+                # пробный запрос не прошёл — следующая пауза вдвое длиннее
+                if self.state!="closed": self.cooldown=min(LLAMA_CB_MAX_S,self.cooldown*2)
+                self.state="open"; self.until=time.monotonic()+self.cooldown; self.trial=False
+                self.stats["opened"]+=1; opened=True
+        if opened: metrics.count("app_llm_breaker_total",endpoint=self.name)
+
+    def info(self)->Dict[str,Any]:
+        with self.lock:
+            st="half-open" if self.state=="open" and time.monotonic()>=self.until else self.state
+            return {"endpoint":self.name,"state":st,"inflight":self.inflight,"ewma_s":round(self.ewma,3),**self.stats}
+
+# # LLMPool: запросы к нескольким серверам — к наименее загруженному (запросы в работе × время ответа),
+# # переход на другой сервер при сбое, хедж (копия на второй сервер), если ответа нет дольше p95 недавних ответов
+class LLMPool:
+    def __init__(self, specs:List[Dict[str,str]]):
+        self.eps=[Endpoint(s) for s in specs]; self.lock=threading.Lock(); self.calls=0; self.hedges=0
+        self.tries=1 if len(self.eps)>1 else 2   # один сервер — 429/5xx повторяется на нём же
+        self.ex=ThreadPoolExecutor(max_workers=max(8,LLAMA_PARALLEL*len(self.eps)*2),thread_name_prefix="llm")
+
+    # # pick: сервер для следующей попытки; left — сколько попыток ещё можно отдать каждому серверу
+    def pick(self, left:Dict[Endpoint,int])->Optional[Endpoint]:
+        now=time.monotonic()
+        c=[e for e in self.eps if left.get(e,1)>0 and e.ready(now)]
+        if not c: return None
+        return min(c,key=lambda e:(e.load(now),random.random()))
+
+    # # await_ready: pick, а если все серверы на паузе Retry-After или выключены — ждать ближайшего (до deadline);
+    # # None — попытки кончились; LLMDown — никто не освободится до deadline
+    def await_ready(self, left:Dict[Endpoint,int], deadline:float)->Optional[Endpoint]:
+        waited=False
+        while True:
+            ep=self.pick(left)
+            if ep is not None: return ep
+            now=time.monotonic(); c=[e for e in self.eps if left.get(e,1)>0]
+            if not c: return None
+            t=min(e.wake(now) for e in c)
+            if t>deadline: raise LLMDown("нет доступных серверов LLM: "+"; ".join(e.why(now) for e in c))
+            if not waited: waited=True; metrics.count("app_llm_waits_total")
+            time.sleep(max(0.01,t-now))
+
+    # # hedge_delay: ждать ответа столько (p95 недавних ответов, не меньше LLAMA_HEDGE_MIN_S), потом — копия на другой сервер;
+    # # None — хедж выключен или кончился бюджет (LLAMA_HEDGE_PCT% запросов плюс одна волна LLAMA_PARALLEL на старте)
+    def hedge_delay(self)->Optional[float]:
+        if not LLAMA_HEDGE or len(self.eps)<2: return None
+        with self.lock:
+            if self.hedges>=self.calls*LLAMA_HEDGE_PCT/100.0+LLAMA_PARALLEL: return None
+        lat=[]
+        for e in self.eps:
+            with e.lock: lat.extend(e.lat)
+        lat.sort()
+        p95=lat[int(len(lat)*0.95)] if len(lat)>=20 else 0.0
+        return max(LLAMA_HEDGE_MIN_S,p95)
+
+    # # attempt: один запрос fn(ep) с учётом здоровья сервера
+    def attempt(self, ep:Endpoint, fn:Any)->Any:
+        t=ep.begin()
+        try: out=fn(ep)
+        except Exception as e:
+            ep.end(t,llm_health(e),pause=llm_retry_after(e)); raise
+        ep.end(t,"ok")
+        return out
+
+    # # retry: ошибку e сервера ep можно повторить — учесть попытку (404/405 — один повтор там же после автоконфига,
+# # 429/503 с Retry-After — повтор после паузы; paused — сколько таких повторов уже было)
+    def retry(self, ep:Endpoint, e:BaseException, left:Dict[Endpoint,int], redo:set, paused:Dict[Endpoint,int])->bool:
+        if not llm_failover(e): return False
+        code=http_status(e)
+        if code in (404,405) and not ep.spec["url"] and ep not in redo: redo.add(ep); left[ep]+=1
+        elif llm_retry_after(e) and paused.get(ep,0)<3:
+            paused[ep]=paused.get(ep,0)+1; left[ep]+=1   # сервер сам назвал, когда вернуться — попытка не тратится (до 3 раз)
+        elif left[ep]>0: time.sleep(LLAMA_BACKOFF_S*(0.5+random.random()))   # повтор на том же сервере — не сразу
+        metrics.count("app_retries_total",target="llm",reason=str(code) if code else type(e).__name__)
+        return True
+
+    # # call: fn(ep) на лучшем сервере; сбой — следующий сервер, долгое ожидание — хедж; → (результат, сервер).
+    # # hit(ep) — готовый ответ для выбранного сервера (кэш по его модели): не None — он и возвращается, запрос не уходит
+    def call(self, fn:Any, hit:Any=None)->Tuple[Any,Endpoint]:
+        with self.lock: self.calls+=1
+        left:Dict[Endpoint,int]={e:self.tries for e in self.eps}; futs:Dict[Any,Endpoint]={}; err:Optional[BaseException]=None
+        redo:set=set(); paused:Dict[Endpoint,int]={}; hedged=False; deadline=time.monotonic()+LLAMA_TIMEOUT
+        def launch(ep:Endpoint)->None:
+            left[ep]-=1; futs[self.ex.submit(metrics.bind(self.attempt),ep,fn)]=ep
+        ep=self.await_ready(left,deadline)
+        if ep is None: raise LLMDown("нет доступных серверов LLM")
+        v=hit(ep) if hit else None
+        if v is not None: return v,ep
+        launch(ep)
+        while futs:
+            delay=self.hedge_delay() if not hedged and len(futs)==1 else None
+            done,_=wait(list(futs),timeout=delay,return_when=FIRST_COMPLETED)
+            if not done:
+                # ответа нет дольше обычного — та же работа на втором сервере, берём первый ответ
+                hedged=True; ep=self.pick(left)
+                if ep is not None:
+                    with self.lock: self.hedges+=1
+                    with ep.lock: ep.stats["hedges"]+=1
+                    metrics.count("app_llm_hedges_total"); launch(ep)
+                continue
+            for f in done:
+                ep=futs.pop(f)
+                try: return f.result(),ep
+                except Exception as e:
+                    if not self.retry(ep,e,left,redo,paused): raise
+                    err=e
+            if not futs:
+                try: ep=self.await_ready(left,deadline)
+                except LLMDown: raise err if err is not None else LLMDown("нет доступных серверов LLM")
+                if ep is None: continue
+                v=hit(ep) if hit else None
+                if v is not None: return v,ep
+                launch(ep)
+        raise err if err is not None else LLMDown("нет доступных серверов LLM")
+
+    # # stream: fn(ep) — генератор кусков; сбой до первого куска — следующий сервер, после — ошибка (текст уже отдан);
+    # # hit(ep) — готовый текст для выбранного сервера (кэш по его модели): не None — отдаётся он, запрос не уходит
+    def stream(self, fn:Any, on_start:Any=None, hit:Any=None)->Iterator[str]:
+        with self.lock: self.calls+=1
+        left:Dict[Endpoint,int]={e:self.tries for e in self.eps}; err:Optional[BaseException]=None; redo:set=set()
+        paused:Dict[Endpoint,int]={}; deadline=time.monotonic()+LLAMA_TIMEOUT
+        while True:
+            try: ep=self.await_ready(left,deadline)
+            except LLMDown:
+                if err is not None: raise err
+                raise
+            if ep is None: raise err if err is not None else LLMDown("нет доступных серверов LLM")
+            v=hit(ep) if hit else None
+            if v is not None: yield v; return
+            left[ep]-=1; t=ep.begin(); got=False; status="neutral"; err=None
+            try:
+                for p in fn(ep):
+                    if not got and on_start: on_start(ep)
+                    got=True; yield p
+                status="ok"
+            except Exception as e:
+                err=e; status=llm_health(e)
+            finally:
+                # стрим отдаёт текст по мере генерации — его длительность в задержку для хеджа не идёт
+                ep.end(t,status,lat=False,pause=llm_retry_after(err) if err is not None else 0.0)
+            if status=="ok": return
+            if got or not self.retry(ep,err,left,redo,paused): raise err
+
+    def stats(self)->Dict[str,Any]:
+        with self.lock: c,h=self.calls,self.hedges
+        return {"calls":c,"hedges":h,"endpoints":[e.info() for e in self.eps]}
+
+# # llm_pool: пул серверов LLM (один на процесс; LLAMA_ENDPOINTS читается при первом запросе)
+_LLM:Dict[str,Any]={"lock":threading.Lock(),"pool":None}
+def llm_pool()->LLMPool:
+    with _LLM["lock"]:
+        if _LLM["pool"] is None: _LLM["pool"]=LLMPool(llm_specs())
+        return _LLM["pool"]
+
+# # llm_parallel: сколько окон слать одновременно — LLAMA_PARALLEL на каждый невыключенный сервер
+def llm_parallel()->int:
+    now=time.monotonic()
+    return LLAMA_PARALLEL*max(1,sum(1 for e in llm_pool().eps if e.ready(now)))
+
+# # llm_cache_key: ключ кэша ответа — режим и модель сервера после автоконфига, хэш сообщений, temperature, max_tokens
+# # (и схема ответа, если есть); без адреса сервера: серверы пула с одной и той же моделью делят ответы, с разными — нет
+def llm_cache_key(mode:str,model:str,msgs:List[Dict[str,str]],temperature:float,max_tokens:int,schema:Optional[Dict[str,Any]]=None)->str:
+    mh=hashlib.sha256(json.dumps(msgs,ensure_ascii=False,sort_keys=True).encode("utf-8")).hexdigest()
+    return hashlib.sha256(json.dumps(["pool",mode,model,mh,temperature,max_tokens]+([schema] if schema else []),sort_keys=True).encode("utf-8")).hexdigest()
+
+# # llm_cache_hit: ответ из кэша для сервера ep (ключ — его режим и модель после автоконфига); keys — уже проверенные ключи
+# # (переход на другой сервер с той же моделью не считается вторым промахом); автоконфиг не прошёл — None, запрос покажет ошибку
+def llm_cache_hit(ep:Endpoint, keys:set, msgs:List[Dict[str,str]], temperature:float, max_tokens:int,
+                  schema:Optional[Dict[str,Any]])->Optional[Dict[str,Any]]:
+    try: mode,_,model=ep.config()
+    except Exception: return None
+    key=llm_cache_key(mode,model,msgs,temperature,max_tokens,schema)
+    if key in keys: return None
+    keys.add(key); hit=disk_cache_get(os.path.join(CACHE_DIR,"llm"),key)
+    cache_count("llm",hit is not None)
+    return hit
+
+# # llm_cache_put: ответ сервера (meta — его режим и модель) в кэш
+def llm_cache_put(meta:Dict[str,str], msgs:List[Dict[str,str]], temperature:float, max_tokens:int,
+                  schema:Optional[Dict[str,Any]], txt:str)->None:
+    if not txt.strip(): return
+    key=llm_cache_key(meta.get("mode",""),meta.get("model",""),msgs,temperature,max_tokens,schema)
+    disk_cache_put(os.path.join(CACHE_DIR,"llm"),key,{"text":txt,"meta":dict(meta)},LLM_CACHE_MB*1024*1024)
+
+# # llama_format: поле запроса structured output — ответ по JSON-схеме (guided decoding: vLLM, llama.cpp, OpenAI-совместимые)
+def llama_format(mode:str, schema:Dict[str,Any])->Dict[str,Any]:
+    if mode=="chat": return {"response_format":{"type":"json_schema","json_schema":{"name":"tasks","schema":schema,"strict":True}}}
+    return {"text":{"format":{"type":"json_schema","name":"tasks","schema":schema,"strict":True}}}
+
+# # llama_send: POST запроса к серверу ep (stream — без своего спана: его ведёт llama_stream до конца стрима); со схемой —
+# # на 400/422 повтор без неё; прошёл — сервер схему не умеет, дальше ему она не отправляется (JSON держится промптом).
+# # Не прошёл и без схемы (например, длинный контекст) — дело не в схеме, ошибка уходит вызывающему.
+def llama_send(ep:Endpoint, url:str, mode:str, payload:Dict[str,Any], schema:Optional[Dict[str,Any]], stream:bool=False)->Any:
+    def post(body:Dict[str,Any])->Any:
+        kw={"headers":llama_headers(ep.spec["key"]),"json":body,"timeout":(LLAMA_CONNECT_TIMEOUT,LLAMA_TIMEOUT)}
+        return ep.session().post(url,stream=True,**kw) if stream else metrics.http("llm",ep.session().post,url,**kw)
+    fmt=schema is not None and ep.schema
+    r=post({**payload,**llama_format(mode,schema)} if fmt else payload)
+    if fmt and r.status_code in (400,422):
+        r.close(); r=post(payload)
+        if r.status_code<400: ep.schema=False; metrics.count("app_llm_schema_fallback_total",endpoint=ep.name)
+    return r
+
+# # llama_post: один запрос к серверу ep (/chat или /responses) → текст ответа; schema — ответ по JSON-схеме, где сервер умеет
+def llama_post(ep:Endpoint, msgs:List[Dict[str,str]], max_tokens:int, temperature:float, schema:Optional[Dict[str,Any]]=None)->str:
+    mode,url,model=ep.config()
+    if mode=="chat":
+        payload={"model":model,"messages":msgs,"temperature":temperature,"max_tokens":max_tokens}
+    else:
+        payload={"model":model,"input":msgs,"temperature":temperature,"max_tokens":max_tokens}
+    r=llama_send(ep,url,mode,payload,schema)
+    if r.status_code in (404,405): ep.invalidate()
+    r.raise_for_status()
+    return llama_text(mode,r.json())
+
+# # llama_call: запрос через пул серверов; cache=False — мимо кэша, refresh=True — перезаписать; → (текст, meta сервера)
+def llama_call(msgs:List[Dict[str,str]],max_tokens:int=4000,temperature:float=0.15,cache:bool=True,refresh:bool=False,
+               schema:Optional[Dict[str,Any]]=None)->Tuple[str,Dict[str,str]]:
+    keys:set=set()
+    hit=(lambda ep: llm_cache_hit(ep,keys,msgs,temperature,max_tokens,schema)) if cache and not refresh else None
+    out,ep=llm_pool().call(lambda ep: llama_post(ep,msgs,max_tokens,temperature,schema),hit=hit)
+    if isinstance(out,dict): return out.get("text",""),out.get("meta") or {}   # из кэша
+    meta=ep.meta()
+    if cache: llm_cache_put(meta,msgs,temperature,max_tokens,schema,out)
+    return out,meta
+
+# # llama_text: текст ответа из JSON /chat или /responses
+def llama_text(mode:str,data:Dict[str,Any])->str:
+    if mode=="chat":
+        return data["choices"][0]["message"]["content"]
+    txt=data.get("output_text")
+    if isinstance(txt,str) and txt.strip(): return txt
+    out=data.get("output",[]) or data.get("choices",[])
+    if out and isinstance(out,list):
+        first=out[0]
+        return first.get("content") or first.get("message",{}).get("content") or ""
+    return ""
+
+# # llama_delta: кусок текста из SSE-события /chat или /responses
+def llama_delta(mode:str,ev:Dict[str,Any])->str:
+    if mode!="chat" and ev.get("type"):
+        return ev.get("delta","") if ev.get("type")=="response.output_text.delta" else ""
+    ch=(ev.get("choices") or [{}])[0]
+    return (ch.get("delta") or {}).get("content") or ch.get("text") or ""
+
+# # llama_stream: запрос со stream=true к серверу ep → куски текста по мере генерации
+def llama_stream(ep:Endpoint,msgs:List[Dict[str,str]],max_tokens:int=4000,temperature:float=0.15,
+                 schema:Optional[Dict[str,Any]]=None)->Iterator[str]:
+    mode,url,model=ep.config()
+    key="messages" if mode=="chat" else "input"
+    payload={"model":model,key:msgs,"temperature":temperature,"max_tokens":max_tokens,"stream":True}
+    # спан — на весь стрим (до последнего события), а не до заголовков ответа
+    with metrics.http_span("llm",url,"POST",stream=True) as sp, llama_send(ep,url,mode,payload,schema,stream=True) as r:
+        sp["status"]=r.status_code; sp["bytes_out"]=len(r.request.body or b""); sp["bytes_in"]=0
+        if r.status_code in (404,405): ep.invalidate()
+        r.raise_for_status()
+        if "text/event-stream" not in r.headers.get("Content-Type",""):
+            # сервер проигнорировал stream — отдаём ответ целиком
+            sp["bytes_in"]=len(r.content); yield llama_text(mode,r.json()); return
+        r.encoding="utf-8"
+        for line in r.iter_lines(decode_unicode=True):
+            sp["bytes_in"]+=len(line.encode("utf-8"))+1 if line else 1
+            if not line or not line.startswith("data:"): continue
+            data=line[5:].strip()
+            if data=="[DONE]": break
+            try: ev=json.loads(data)
+            except Exception: continue
+            piece=llama_delta(mode,ev) if isinstance(ev,dict) else ""
+            if piece: yield piece
+
+# # llama_ask_stream: как llama_ask, но стримом; кэш общий с llama_call, meta — заполняется, когда сервер начал отвечать
+def llama_ask_stream(msgs:List[Dict[str,str]],max_tokens:int=4000,cache:bool=True,refresh:bool=False,
+                     meta:Optional[Dict[str,str]]=None,schema:Optional[Dict[str,Any]]=None)->Iterator[str]:
+    meta=meta if meta is not None else {}
+    keys:set=set()
+    def hit(ep:Endpoint)->Optional[str]:
+        h=llm_cache_hit(ep,keys,msgs,0.15,max_tokens,schema)
+        if h is None: return None
+        meta.update(h.get("meta") or {}); return h.get("text","")
+    parts=[]; got=[False]
+    def start(ep:Endpoint)->None: got[0]=True; meta.update(ep.meta())
+    for p in llm_pool().stream(lambda ep: llama_stream(ep,msgs,max_tokens,schema=schema),on_start=start,
+                               hit=hit if cache and not refresh else None):
+        parts.append(p); yield p
+    if cache and got[0]: llm_cache_put(meta,msgs,0.15,max_tokens,schema,"".join(parts))
+
+# # llama_ask: запрос к LLM через пул серверов (автоконфиг, переход на другой сервер при сбое) → (текст, meta сервера)
+def llama_ask(msgs:List[Dict[str,str]],max_tokens:int=4000,cache:bool=True,refresh:bool=False,
+              schema:Optional[Dict[str,Any]]=None)->Tuple[str,Dict[str,str]]:
+    return llama_call(msgs,max_tokens,cache=cache,refresh=refresh,schema=schema)
+
+# # approx_tokens: грубая оценка числа токенов (≈3 символа на токен для ru/en)
+def approx_tokens(s:str)->int:
+    return max(1,len(s or "")//3)
+
+# # split_units: сегменты Whisper или предложения; слишком длинные куски режем по словам
+def split_units(text:str, segments:Optional[List[str]]=None, budget:int=CLEAN_CHUNK_TOKENS)->List[str]:
+    src=[x.strip() for x in (segments or []) if x and x.strip()] or [x.strip() for x in re.split(r"(?<=[.!?…])\s+|\n+",text or "") if x.strip()]
+    out=[]
+    for u in src:
+        if approx_tokens(u)<=budget: out.append(u); continue
+        cur=[]
+        for w in u.split():
+            if cur and approx_tokens(" ".join(cur+[w]))>budget: out.append(" ".join(cur)); cur=[]
+            cur.append(w)
+        if cur: out.append(" ".join(cur))
+    return out
+
+# # WindowStream: окна token_windows по мере поступления кусков (для конвейера с перекрытием этапов)
+class WindowStream:
+    def __init__(self, budget:int=CLEAN_CHUNK_TOKENS, overlap:int=CLEAN_OVERLAP_TOKENS):
+        self.budget=budget; self.overlap=overlap; self.cur=[]; self.n=0; self.prev=[]
+
+    # # _emit: закрыть текущее окно; контекст — хвост прошлого окна не длиннее overlap
+    def _emit(self)->Tuple[str,str]:
+        ctx=[]; n=0
+        for u in reversed(self.prev):
+            n+=approx_tokens(u)
+            if n>self.overlap: break
+            ctx.insert(0,u)
+        w=(" ".join(ctx)," ".join(self.cur)); self.prev=self.cur; self.cur=[]; self.n=0
+        return w
+
+    # # feed: добавить куски → окна, которые закрылись
+    def feed(self, units:List[str])->List[Tuple[str,str]]:
+        out=[]
+        for u in units:
+            k=approx_tokens(u)
+            if self.cur and self.n+k>self.budget: out.append(self._emit())
+            self.cur.append(u); self.n+=k
+        return out
+
+    # # close: последнее (неполное) окно
+    def close(self)->List[Tuple[str,str]]:
+        return [self._emit()] if self.cur else []
+
+# # token_windows: окна (контекст, тело) по бюджету токенов; контекст — хвост прошлого окна
+def token_windows(units:List[str], budget:int=CLEAN_CHUNK_TOKENS, overlap:int=CLEAN_OVERLAP_TOKENS)->List[Tuple[str,str]]:
+    ws=WindowStream(budget,overlap)
+    return ws.feed(units)+ws.close()
+
+# # llama_clean_window: правка одного окна; контекст только для связности, в ответ не входит
+def llama_clean_window(ctx:str, body:str, refresh:bool=False)->Tuple[str,Dict[str,str]]:
+    sys="Ты редактор текста. Исправь опечатки, регистр и пунктуацию, не меняй смысл. Верни только исправленный текст."
+    msgs=[{"role":"system","content":sys}]
+    if ctx: msgs.append({"role":"user","content":"Предыдущий фрагмент (только для контекста, НЕ включай его в ответ):\n"+ctx})
+    msgs.append({"role":"user","content":body})
+    out,meta=llama_ask(msgs,max_tokens=approx_tokens(body)*2+64,refresh=refresh)
+    return (out.strip() or body), meta
+
+# # llama_clean: лёгкая правка текста (опечатки) перед задачами; длинный текст — окнами параллельно
+def llama_clean(s:str, segments:Optional[List[str]]=None, parallel:int=0, refresh:bool=False)->Tuple[str,Dict[str,str]]:
+    wins=token_windows(split_units(s,segments))
+    if len(wins)<=1:
+        out,meta=llama_clean_window("",s.strip(),refresh)
+        return (out or s), meta
+    # окна независимы → параллельно; порядок склейки = порядок окон
+    def job(w):
+        try: return llama_clean_window(w[0],w[1],refresh),None
+        except Exception as e: return (w[1],{}),e
+    with ThreadPoolExecutor(max_workers=max(1,min(parallel or llm_parallel(),len(wins)))) as ex:
+        res=list(ex.map(metrics.bind(job),wins))
+    errs=[e for _,e in res if e]
+    if len(errs)==len(res): raise errs[0]
+    meta=next((m for (_,m),e in res if not e),{})
+    out=" ".join(t for (t,_),_ in res).strip()
+    return (out or s), {**meta,"chunks":str(len(wins)),"failed":str(len(errs))}
+
+# # autolabels_from_summary: авто-лейблы из заголовка
+def autolabels_from_summary(s:str)->str:
+    w=[x.lower() for x in re.findall(r"[\w\-А-Яа-яЁё]{3,}", s)]
+    seen=set(); out=[]
+    for x in w:
+        if x in seen: continue
+        seen.add(x); out.append(x)
+        if len(out)>=5: break
+    return ", ".join(out)
+
+# # parse_task_item: один объект задачи от LLaMA → нормализованная задача (None — если не объект)
+def parse_task_item(it:Any)->Optional[Dict[str,Any]]:
+    if not isinstance(it,dict): return None
+    summary=str(it.get("summary","")).strip()[:MAX_SUMMARY]
+    desc=str(it.get("description","")).strip()
+    labels_raw=str(it.get("labels","")).strip()
+    if not labels_raw and summary: labels_raw=autolabels_from_summary(summary)
+    parts=[p.strip() for p in labels_raw.split(",") if p.strip()]
+    due_raw=str(it.get("due","")).strip()
+    due_iso=to_iso(due_raw) or parse_due_kz(due_raw) if due_raw else ""
+    comment=str(it.get("comment","")).strip()
+    pr=str(it.get("priority","") or "Medium").title()
+    if pr not in PRIORITIES: pr="Medium"
+    return {"id":uuid.uuid4().hex[:8],"summary":summary,"description":desc,"labels":", ".join(parts),"due":due_iso,"comment":comment,"priority":pr}
+
+# # TASKS_SCHEMA: JSON-схема ответа извлечения (structured output); корень — объект: массив в корне принимают не все серверы
+TASKS_SCHEMA:Dict[str,Any]={"type":"object","additionalProperties":False,"required":["tasks"],"properties":{"tasks":{"type":"array","items":{
+    "type":"object","additionalProperties":False,"required":["summary","description","labels","due","comment","priority"],
+    "properties":{"summary":{"type":"string","maxLength":MAX_SUMMARY},"description":{"type":"string"},"labels":{"type":"string"},
+                  "due":{"type":"string"},"comment":{"type":"string"},"priority":{"type":"string","enum":PRIORITIES}}}}}}
+
+# # parse_tasks_text: ответ LLaMA → (задачи, ответ закончен). Массив задач или {"tasks": [...]}, текст и ```json вокруг не мешают;
+# # оборванный ответ (max_tokens) — целые объекты до места обрыва и False
+def parse_tasks_text(txt:str)->Tuple[List[Dict[str,Any]],bool]:
+    dec=json.JSONDecoder()
+    for m in re.finditer(r"[\[{]",txt or ""):
+        try: data,_=dec.raw_decode(txt,m.start())
+        except ValueError: continue
+        if isinstance(data,dict) and isinstance(data.get("tasks"),list): data=data["tasks"]
+        if isinstance(data,list): return [t for t in (parse_task_item(it) for it in data) if t],True
+    return [t for t in (parse_task_item(it) for it in TaskStreamParser().feed(txt or "")) if t],False
+
+# # parse_tasks_json: строгое чтение JSON списка задач из LLaMA (оборванный или не-JSON ответ — ValueError)
+def parse_tasks_json(txt:str)->List[Dict[str,Any]]:
+    tasks,done=parse_tasks_text(txt)
+    if not done:
+        metrics.count("app_llm_parse_errors_total")
+        raise ValueError("в ответе LLM нет полного JSON-списка задач: "+(txt or "").strip()[:120])
+    return tasks
+
+# # TaskStreamParser: инкрементальный разбор JSON-массива задач —
+# # объект верхнего уровня отдаётся, как только закрылась его «}»
+class TaskStreamParser:
+    def __init__(self):
+        self.buf=""; self.pos=0; self.depth=0; self.start=-1
+        self.in_array=False; self.in_str=False; self.esc=False
+
+    # # feed: дописать кусок текста → список закрывшихся объектов
+    def feed(self, chunk:str)->List[Dict[str,Any]]:
+        self.buf+=chunk; b=self.buf; out=[]
+        for i in range(self.pos,len(b)):
+            c=b[i]
+            if self.in_str:
+                if self.esc: self.esc=False
+                elif c=="\\": self.esc=True
+                elif c=='"': self.in_str=False
+            elif not self.in_array:
+                if c=="[": self.in_array=True
+            elif c=='"': self.in_str=True
+            elif c=="{":
+                if self.depth==0: self.start=i
+                self.depth+=1
+            elif c=="}" and self.depth>0:
+                self.depth-=1
+                if self.depth==0:
+                    try: obj=json.loads(b[self.start:i+1])
+                    except Exception: obj=None
+                    if isinstance(obj,dict): out.append(obj)
+                    self.start=-1
+            elif c=="]" and self.depth==0:
+                self.in_array=False
+        # разобранный префикс больше не нужен
+        if self.start<0: self.buf=""; self.pos=0
+        else: self.buf=b[self.start:]; self.pos=len(self.buf); self.start=0
+        return out
+
+# # heuristic_split_one_task: если LLaMA вернула 1 задачу, а действий несколько — аккуратно сплитим
+def heuristic_split_one_task(task:Dict[str,Any])->List[Dict[str,Any]]:
+    text=(task.get("summary","")+" . "+task.get("description","")).lower()
+    # ищем соединители
+    if not any(k in text for k in [" и ", " а также ", " затем ", " после этого ", " потом "]):
+        return [task]
+    # грубый сплит по «и/затем/после этого»
+    pieces=re.split(r"\s+(?:и|а также|затем|после этого|потом)\s+", (task.get("description") or task.get("summary") or ""))
+    pieces=[p.strip(" .,!?:;") for p in pieces if p and len(p.strip())>2]
+    if len(pieces)<2: 
+        return [task]
+    results=[]
+    for p in pieces:
+        # отдельная тема — первое слово-глагол + оставшееся
+        sumr=p.capitalize()
+        due=parse_due_kz(p) or infer_due_from_text(p)
+        results.append({
+            "id":uuid.uuid4().hex[:8],
+            "summary":sumr[:MAX_SUMMARY],
+            "description":p,
+            "labels":autolabels_from_summary(sumr),
+            "due":due,
+            "comment":task.get("comment",""),
+            "priority":task.get("priority","Medium")
+        })
+    return results if results else [task]
+
+# # extract_prompt: строгий промпт — КАЖДОЕ ДЕЙСТВИЕ = ОТДЕЛЬНАЯ ЗАДАЧА + due = YYYY-MM-DD
+def extract_prompt()->str:
+    today=kz_now().date().isoformat()
+    tz="Asia/Almaty"
+    return (
+        "Ты аналитик задач. Разбей текст на отдельные действия и верни строго JSON-объект с массивом задач в поле tasks. "
+        "Формат: {\"tasks\": [ ... ]}. "
+        "Правила: 1) каждое отдельное действие — отдельная задача (если есть 'и', 'а также', 'затем', 'после этого', разделяй); "
+        "2) поля каждой задачи: {summary, description, labels, due, comment, priority}; "
+        "summary — до 160 символов; labels — 3–6 ключевых слов через запятую; priority — одно из Highest, High, Medium, Low, Lowest; "
+        "3) сегодняшняя дата: "+today+"; часовой пояс: "+tz+"; "
+        "4) относительные выражения ('завтра', 'послезавтра', 'через N дней/недель', 'в пятницу'...) пересчитай в абсолютный due формата YYYY-MM-DD; "
+        "5) если явной даты нет — поставь разумный due (обычно +3 дня). "
+        "Верни ТОЛЬКО JSON без пояснений."
+    )
+
+# # extract_msgs: сообщения запроса извлечения; ctx — хвост предыдущего блока (только для связности)
+def extract_msgs(text:str, ctx:str="")->List[Dict[str,str]]:
+    msgs=[{"role":"system","content":extract_prompt()}]
+    if ctx: msgs.append({"role":"user","content":"Предыдущий фрагмент (только для контекста, задачи из него НЕ извлекай):\n"+ctx})
+    msgs.append({"role":"user","content":text})
+    return msgs
+
+# # extract_budget: max_tokens ответа извлечения — по длине текста и ожидаемому числу задач (не весь EXTRACT_MAX_TOKENS
+# # на каждый короткий текст: сервер резервирует под него место); не хватило — ответ догружается (extract_rest)
+def extract_budget(text:str)->int:
+    expect=max(3,math.ceil(approx_tokens(text)*EXTRACT_TASKS_PER_1K/1000))
+    return min(EXTRACT_MAX_TOKENS,64+expect*EXTRACT_TASK_TOKENS)
+
+# # extract_schema: схема ответа для запроса извлечения (None — EXTRACT_SCHEMA=0, JSON только по промпту)
+def extract_schema()->Optional[Dict[str,Any]]:
+    return TASKS_SCHEMA if EXTRACT_SCHEMA else None
+
+# # extract_rest: ответ оборвался на max_tokens — целые задачи got уже есть; модель получает их темы и отдаёт только
+# # остальные (не генерирует список заново). До EXTRACT_CONTINUE догрузок → (новые задачи, догрузок, ответ закончен)
+def extract_rest(msgs:List[Dict[str,str]], got:List[Dict[str,Any]], budget:int, refresh:bool=False)->Tuple[List[Dict[str,Any]],int,bool]:
+    out:List[Dict[str,Any]]=[]; n=0; done=False
+    while not done and n<EXTRACT_CONTINUE:
+        seen=json.dumps({"tasks":[{"summary":t["summary"],"due":t["due"]} for t in got+out]},ensure_ascii=False)
+        more_msgs=msgs+[{"role":"assistant","content":seen},
+                        {"role":"user","content":"Ответ оборвался. Верни в том же формате только задачи, которых ещё нет в списке выше."}]
+        txt,_=llama_ask(more_msgs,max_tokens=budget,refresh=refresh,schema=extract_schema())
+        more,done=parse_tasks_text(txt); n+=1
+        metrics.count("app_llm_continue_total")
+        if not more: break
+        out+=more
+    return out,n,done
+
+# # llama_extract_once: один запрос извлечения (весь текст, окно или блок); оборванный ответ — догрузка остальных задач.
+# # split — одну «комбинированную» задачу делить эвристикой; только для всего текста: одна задача в окне или блоке — обычное дело
+def llama_extract_once(text:str, refresh:bool=False, ctx:str="", split:bool=True)->Tuple[List[Dict[str,Any]],Dict[str,str]]:
+    msgs=extract_msgs(text,ctx); budget=extract_budget(text)
+    txt,meta=llama_ask(msgs,max_tokens=budget,refresh=refresh,schema=extract_schema())
+    tasks,done=parse_tasks_text(txt)
+    if not done and not tasks: parse_tasks_json(txt)   # не JSON и не оборванный список — понятная ошибка
+    if not done:
+        more,n,done=extract_rest(msgs,tasks,budget,refresh)
+        # догрузка могла повторить задачу с места обрыва — такие сливаются с уже полученными
+        sigs=[summary_tokens(t.get("summary","")) for t in tasks]; merge_into(tasks,sigs,more)
+        meta={**meta,"continued":str(n),**({} if done else {"truncated":"1"})}
+    # если LLaMA всё равно вернула одну «комбинированную» задачу — мягко сплитим
+    if split and len(tasks)==1:
+        tasks = heuristic_split_one_task(tasks[0])
+    return tasks, meta
+
+# # summary_tokens: нормализованные слова темы (грубая основа — первые 5 букв)
+def summary_tokens(s:str)->set:
+    return {w[:5] for w in re.findall(r"[0-9a-zа-яё]+",(s or "").lower()) if len(w)>=3 or w.isdigit()}
+
+# # prio_rank: место приоритета в PRIORITIES (меньше — важнее)
+def prio_rank(p:str)->int:
+    return PRIORITIES.index(p) if p in PRIORITIES else PRIORITIES.index("Medium")
+
+# # find_similar: индекс задачи из out с похожей темой (sig) и тем же due; None — такой нет
+def find_similar(out:List[Dict[str,Any]], sigs:List[set], sig:set, due:str, threshold:float=0.7)->Optional[int]:
+    for i,o in enumerate(out):
+        if (o.get("due") or "")!=(due or ""): continue
+        inter=len(sig & sigs[i]); union=len(sig | sigs[i]) or 1
+        if inter/union>=threshold: return i
+    return None
+
+# # merge_into: добавить задачи в out (похожая тема + тот же due → слить в уже найденную); вернуть новые
+def merge_into(out:List[Dict[str,Any]], sigs:List[set], tasks:List[Dict[str,Any]], threshold:float=0.7)->List[Dict[str,Any]]:
+    new=[]
+    for t in tasks:
+        sig=summary_tokens(t.get("summary",""))
+        dup=find_similar(out,sigs,sig,t.get("due") or "",threshold)
+        if dup is None:
+            d=dict(t); out.append(d); sigs.append(sig); new.append(d); continue
+        o=out[dup]
+        if len(t.get("description","") or "")>len(o.get("description","") or ""): o["description"]=t["description"]
+        if prio_rank(t.get("priority",""))<prio_rank(o.get("priority","")): o["priority"]=t["priority"]
+        labels=[x.strip() for x in (o.get("labels","")+","+t.get("labels","")).split(",") if x.strip()]
+        o["labels"]=", ".join(list(dict.fromkeys(labels))[:6])
+        if not o.get("comment") and t.get("comment"): o["comment"]=t["comment"]
+    return new
+
+# # merge_tasks: слить списки задач из окон в один без дублей
+def merge_tasks(lists:List[List[Dict[str,Any]]], threshold:float=0.7)->List[Dict[str,Any]]:
+    out=[]; sigs=[]
+    for lst in lists: merge_into(out,sigs,lst,threshold)
+    return out
+
+# # llama_extract: задачи из текста; длинный текст — map-reduce по перекрывающимся окнам
+def llama_extract(transcript:str, mode:str="auto", parallel:int=0, refresh:bool=False)->Tuple[List[Dict[str,Any]],Dict[str,str]]:
+    if mode=="single" or (mode=="auto" and approx_tokens(transcript)<=EXTRACT_CHUNK_TOKENS):
+        return llama_extract_once(transcript,refresh)
+    # перекрытие входит в текст окна: задача на стыке видна обоим окнам, дубль уберёт merge_tasks
+    wins=[(c+" "+b).strip() for c,b in token_windows(split_units(transcript,budget=EXTRACT_CHUNK_TOKENS),EXTRACT_CHUNK_TOKENS,EXTRACT_OVERLAP_TOKENS)]
+    def job(w):
+        try: return llama_extract_once(w,refresh,split=False),None
+        except Exception as e: return ([],{}),e
+    with ThreadPoolExecutor(max_workers=max(1,min(parallel or llm_parallel(),len(wins)))) as ex:
+        res=list(ex.map(metrics.bind(job),wins))
+    errs=[e for _,e in res if e]
+    if len(errs)==len(res): raise errs[0]
+    meta=next((m for (_,m),e in res if not e),{})
+    tasks=merge_tasks([t for (t,_),_ in res])
+    return tasks, {**meta,"chunks":str(len(wins)),"failed":str(len(errs))}
+
+# # llama_extract_stream: задачи по мере генерации; info ← meta, first_task_s, total_s, tasks (итоговый список);
+# # split — как в llama_extract_once
+def llama_extract_stream(transcript:str, parallel:int=0, refresh:bool=False,
+                         info:Optional[Dict[str,Any]]=None, ctx:str="", split:bool=True)->Iterator[Dict[str,Any]]:
+    info=info if info is not None else {}
+    t0=time.perf_counter(); info["first_task_s"]=None
+    def mark():
+        if info["first_task_s"] is None: info["first_task_s"]=time.perf_counter()-t0
+    if approx_tokens(transcript)>EXTRACT_CHUNK_TOKENS:
+        # map-reduce: окна считаются параллельно, задачи отдаём по окнам в исходном порядке
+        wins=[(c+" "+b).strip() for c,b in token_windows(split_units(transcript,budget=EXTRACT_CHUNK_TOKENS),EXTRACT_CHUNK_TOKENS,EXTRACT_OVERLAP_TOKENS)]
+        out=[]; sigs=[]; failed=0; meta={}; err=None
+        with ThreadPoolExecutor(max_workers=max(1,min(parallel or llm_parallel(),len(wins)))) as ex:
+            for f in [ex.submit(metrics.bind(llama_extract_once),w,refresh,"",False) for w in wins]:
+                try: tasks,m=f.result()
+                except Exception as e: failed+=1; err=err or e; continue
+                meta=meta or m
+                for t in merge_into(out,sigs,tasks):
+                    mark(); yield t
+        if failed==len(wins) and err: raise err
+        info.update({"meta":{**meta,"chunks":str(len(wins)),"failed":str(failed)},"tasks":out})
+    else:
+        meta={}; parser=TaskStreamParser(); parts=[]; tasks=[]
+        msgs=extract_msgs(transcript,ctx); budget=extract_budget(transcript)
+        for piece in llama_ask_stream(msgs,max_tokens=budget,refresh=refresh,meta=meta,schema=extract_schema()):
+            parts.append(piece)
+            for it in parser.feed(piece):
+                t=parse_task_item(it)
+                if not t: continue
+                tasks.append(t); mark(); yield t
+        # стрим не дал ни одного объекта — разбираем целиком (не JSON и не оборванный список — внятная ошибка)
+        txt="".join(parts)
+        if tasks: done=not parser.in_array
+        else: tasks,done=parse_tasks_text(txt)
+        if not done and not tasks: parse_tasks_json(txt)
+        if not done:
+            # ответ оборвался на max_tokens — догружаем только недостающие задачи
+            more,n,done=extract_rest(msgs,tasks,budget,refresh)
+            for t in merge_into(tasks,[summary_tokens(x.get("summary","")) for x in tasks],more):
+                mark(); yield t
+            meta={**meta,"continued":str(n),**({} if done else {"truncated":"1"})}
+        # если LLaMA всё равно вернула одну «комбинированную» задачу — мягко сплитим
+        if split and len(tasks)==1: tasks=heuristic_split_one_task(tasks[0])
+        info.update({"meta":meta,"tasks":tasks})
+    info["total_s"]=time.perf_counter()-t0
+
+# # block_hash: хэш блока текста; пробелы и переносы строк правкой не считаются
+def block_hash(text:str)->str:
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()[:16]
+
+# # text_blocks: расшифровка → блоки [(хэш, текст)] для инкрементального извлечения, в среднем ≈ budget токенов.
+# # Граница — конец абзаца или предложение, выбранное по его хэшу с вероятностью ∝ его длине (блок не короче budget/4
+# # и не длиннее 3×budget). Граница зависит только от самого предложения, а не от того, где была прошлая:
+# # правка нескольких слов меняет один блок (два — если задела границу), следующие блоки остаются теми же.
+def text_blocks(text:str, budget:int=EXTRACT_BLOCK_TOKENS)->List[Tuple[str,str]]:
+    out:List[Tuple[str,str]]=[]; cur:List[str]=[]; n=0
+    for para in re.split(r"\n\s*\n",text or ""):
+        for u in split_units(para,budget=budget):
+            k=approx_tokens(u); cur.append(u); n+=k
+            if n>=3*budget or (n>=budget//4 and int(block_hash(u),16)%(3*budget)<4*k):
+                b=" ".join(cur); out.append((block_hash(b),b)); cur=[]; n=0
+        if cur and n>=budget//2:
+            b=" ".join(cur); out.append((block_hash(b),b)); cur=[]; n=0
+    if cur:
+        b=" ".join(cur); out.append((block_hash(b),b))
+    return out
+
+# # block_tail: хвост блока (≈tokens токенов, с начала слова) — контекст для следующего блока
+def block_tail(text:str, tokens:int=EXTRACT_OVERLAP_TOKENS)->str:
+    if approx_tokens(text)<=tokens: return text
+    tail=text[-tokens*3:]
+    return tail.split(" ",1)[-1]
+
+# # place_manual: задачи без блока (добавлены вручную) — на прежние места в новом списке res. Опора — ближайшая из задач prev,
+# # оставшихся в res (или начало/конец списка): сверху — сразу после неё, снизу — перед ней. Не осталось ни одной (refresh) —
+# # то же место в долях списка
+def place_manual(res:List[Dict[str,Any]], prev:List[Dict[str,Any]])->List[Dict[str,Any]]:
+    pos={id(t):i for i,t in enumerate(res)}; at:Dict[int,List[Dict[str,Any]]]={}
+    for i,t in enumerate(prev):
+        if t.get("block"): continue
+        up=next(((i-j,pos[id(x)]+1) for j,x in zip(range(i-1,-1,-1),reversed(prev[:i])) if id(x) in pos),None)
+        down=next(((j-i,pos[id(x)]) for j,x in enumerate(prev[i+1:],i+1) if id(x) in pos),None)
+        if up is None and down is None: k=round(i*len(res)/max(1,len(prev)-1)) if pos else 0
+        else: k=min(up or (i+1,0),down or (len(prev)-i,len(res)))[1]
+        at.setdefault(k,[]).append(t)
+    out=[]
+    for k in range(len(res)+1):
+        out.extend(at.get(k,[]))
+        if k<len(res): out.append(res[k])
+    return out
+
+# # llama_extract_blocks: инкрементальное извлечение. В LLM уходят только блоки, которых нет в prev_blocks (хэши прошлого
+# # извлечения); задачи неизменённых блоков остаются как есть, с правками пользователя (и удалённые не возвращаются),
+# # задачи изменённых и исчезнувших блоков заменяются новыми, задачи без блока (добавлены вручную) остаются на своих местах.
+# # refresh — извлечь всё заново. Новые задачи — по мере готовности блоков, в порядке текста; отдаются только задачи итогового
+# # списка (info["tasks"]); у каждой задачи — поле block.
+# # info ← blocks (хэши обработанных блоков), total / sent (блоков всего / отправлено), kept (задач сохранено), tokens_in / tokens_full (≈ токенов
+# # запросов: отправлено / понадобилось бы для всего текста), meta, first_task_s, total_s, tasks (итоговый список)
+def llama_extract_blocks(transcript:str, prev_tasks:Optional[List[Dict[str,Any]]]=None, prev_blocks:Optional[List[str]]=None,
+                         parallel:int=0, refresh:bool=False, stream:bool=False,
+                         info:Optional[Dict[str,Any]]=None)->Iterator[Dict[str,Any]]:
+    info=info if info is not None else {}
+    t0=time.perf_counter(); info["first_task_s"]=None
+    blocks=text_blocks(transcript); hashes=[h for h,_ in blocks]
+    known=set() if refresh else set(prev_blocks or [])&set(hashes)
+    reqs=[(h,b,block_tail(blocks[i-1][1]) if i else "") for i,(h,b) in enumerate(blocks)]
+    send=[]; seen=set()
+    for h,b,ctx in reqs:
+        if h not in known and h not in seen: send.append((h,b,ctx)); seen.add(h)
+    kept:Dict[str,List[Dict[str,Any]]]={}; manual=[]
+    for t in prev_tasks or []:
+        if not t.get("block"): manual.append(t)
+        elif t["block"] in known: kept.setdefault(t["block"],[]).append(t)
+    # новая задача, похожая на сохранённую (та же задача из соседнего блока), не дублирует её
+    old=[t for ts in kept.values() for t in ts]+manual; old_sigs=[summary_tokens(t.get("summary","")) for t in old]
+    out:List[Dict[str,Any]]=[]; sigs:List[set]=[]; new:Dict[str,List[Dict[str,Any]]]={}
+    def add(h:str, tasks:List[Dict[str,Any]])->List[Dict[str,Any]]:
+        fresh=[t for t in tasks if find_similar(old,old_sigs,summary_tokens(t.get("summary","")),t.get("due") or "") is None]
+        for t in fresh: t["block"]=h
+        res=merge_into(out,sigs,fresh)
+        new.setdefault(h,[]).extend(res)
+        return res
+    meta:Dict[str,str]={}; failed=0; err=None
+    if stream and len(send)==1:
+        # один изменённый блок — стримом: первая задача видна, не дожидаясь всего ответа. Похожие на сохранённые и дубли
+        # отсеиваются сразу; единственная задача всего текста ждёт конца ответа — её может разделить эвристика
+        h,b,ctx=send[0]; sub:Dict[str,Any]={}; split=len(blocks)==1; held:List[Dict[str,Any]]=[]; n=0
+        for t in llama_extract_stream(b,parallel,refresh,sub,ctx,split=split):
+            n+=1; held.append(t)
+            if split and n==1: continue
+            for x in add(h,held):
+                if info["first_task_s"] is None: info["first_task_s"]=time.perf_counter()-t0
+                yield x
+            held=[]
+        meta=sub.get("meta",{})
+        if n==0 or held:
+            # итог — список после разбора всего ответа (стрим не дал объектов или единственная задача ждала конца: могла разделиться)
+            for x in add(h,sub.get("tasks",[])):
+                if info["first_task_s"] is None: info["first_task_s"]=time.perf_counter()-t0
+                yield x
+    elif send:
+        with ThreadPoolExecutor(max_workers=max(1,min(parallel or llm_parallel(),len(send)))) as ex:
+            futs=[(h,ex.submit(metrics.bind(llama_extract_once),b,refresh,ctx,len(blocks)==1)) for h,b,ctx in send]
+            for h,f in futs:
+                try: tasks,m=f.result()
+                except Exception as e: failed+=1; err=err or e; continue
+                meta=meta or m
+                for t in add(h,tasks):
+                    if info["first_task_s"] is None: info["first_task_s"]=time.perf_counter()-t0
+                    yield t
+        if failed==len(send) and err: raise err
+    # итог — в порядке блоков текста; блок, который не удалось обработать, в prev_blocks не попадает (уйдёт в LLM в следующий раз)
+    done=set(new)|known; res=[]; emitted=set()
+    for h in hashes:
+        if h in emitted: continue
+        emitted.add(h); res.extend(kept.get(h) or new.get(h) or [])
+    tok=lambda xs: sum(approx_tokens(m["content"]) for _,b,ctx in xs for m in extract_msgs(b,ctx))
+    info.update({"blocks":[h for h in hashes if h in done],"total":len(set(hashes)),"sent":len(send),"kept":sum(len(v) for v in kept.values()),
+                 "tokens_in":tok(send),"tokens_full":tok(reqs),"meta":{**meta,"chunks":str(len(send)),"failed":str(failed)},
+                 "tasks":place_manual(res,prev_tasks or []),"total_s":time.perf_counter()-t0})
+
+# # normalize_tasks_after_extraction: добить пустые due/labels (срок — из описания, иначе из расшифровки)
+def normalize_tasks_after_extraction(tasks:List[Dict[str,Any]], source_text:str)->List[Dict[str,Any]]:
+    resolve_due_batch(tasks,source_text)
+    for t in tasks:
+        if not t.get("labels"):
+            t["labels"]=autolabels_from_summary(t.get("summary",""))
+    return list(tasks)
+
+# # prepare_due: перед отправкой в Jira — due только в формате YYYY-MM-DD
+def prepare_due(tasks:List[Dict[str,Any]])->List[Dict[str,Any]]:
+    return resolve_due_batch(tasks)
+
+# # Whisper loader: одна модель каждого размера на процесс
+_WHISPER:Dict[str,Any]={"lock":threading.Lock(),"models":{},"batched":{}}
+def load_whisper(size:str="")->Any:
+    size=size or WHISPER_SIZE
+    with _WHISPER["lock"]:
+        if size not in _WHISPER["models"]:
+            cls=whisper_cls()
+            if cls is None: raise RuntimeError("faster-whisper не установлен")
+            _WHISPER["models"][size]=cls(size, device=device(), compute_type=compute_type(),
+                                                  cpu_threads=WHISPER_CPU_THREADS, num_workers=max(1,WHISPER_WORKERS))
+        return _WHISPER["models"][size]
+
+# # whisper_runner: чем распознавать — batched-обёртка над моделью (если включена и доступна) или сама модель
+def whisper_runner(size:str="")->Tuple[Any,bool]:
+    model=load_whisper(size)
+    cls=batched_cls() if WHISPER_BATCH>0 else None
+    if cls is None: return model, False
+    with _WHISPER["lock"]:
+        k=id(model)
+        if k not in _WHISPER["batched"]: _WHISPER["batched"][k]=cls(model=model)
+        return _WHISPER["batched"][k], True
+
+# # whisper_pick: размер модели для записи — fallback, если запись длинная или очередь большая
+def whisper_pick(duration_s:Optional[float], pending:int=0)->str:
+    if not WHISPER_FALLBACK_SIZE: return WHISPER_SIZE
+    if WHISPER_FALLBACK_MIN>0 and duration_s and duration_s/60.0>WHISPER_FALLBACK_MIN: return WHISPER_FALLBACK_SIZE
+    if WHISPER_FALLBACK_QUEUE>0 and pending>WHISPER_FALLBACK_QUEUE: return WHISPER_FALLBACK_SIZE
+    return WHISPER_SIZE
+
+# # transcript_key: ключ кэша расшифровки — sha256 файла + модель + язык + VAD
+def transcript_key(file_bytes:bytes, lang:str)->str:
+    return transcript_key_digest(hashlib.sha256(file_bytes).hexdigest(),lang)
+
+# # transcript_key_digest: то же по готовому sha256 файла (size — модель, по умолчанию WHISPER_SIZE)
+def transcript_key_digest(digest:str, lang:str, size:str="")->str:
+    cfg=json.dumps([size or WHISPER_SIZE,compute_type(),lang or "auto",VAD_PARAMS,WHISPER_BEAM,WHISPER_BATCH>0],sort_keys=True)
+    return hashlib.sha256((digest+"|"+cfg).encode("utf-8")).hexdigest()
+
+# # file_sha256: sha256 файла по кускам, без чтения целиком в память
+def file_sha256(path:str, bufsize:int=1<<20)->str:
+    h=hashlib.sha256()
+    with open(path,"rb") as f:
+        for b in iter(lambda: f.read(bufsize), b""): h.update(b)
+    return h.hexdigest()
+
+# # silence_cut: точка разреза около target (в сэмплах) — середина самой длинной паузы VAD в окне ±search_s;
+# # без VAD (или если в окне сплошная речь) — самый тихий кадр 30 мс
+def silence_cut(audio:np.ndarray, target:int, search_s:float=30.0)->int:
+    w=int(search_s*SAMPLE_RATE); a=max(0,target-w); b=min(len(audio),target+w)
+    win=np.asarray(audio[a:b],dtype=np.float32)
+    try:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        speech=get_speech_timestamps(win,VadOptions(min_silence_duration_ms=VAD_PARAMS.get("min_silence_duration_ms",500),speech_pad_ms=0))
+        edges=[0]+[x for sp in speech for x in (sp["start"],sp["end"])]+[len(win)]
+        gaps=[(edges[i],edges[i+1]) for i in range(0,len(edges)-1,2) if edges[i+1]-edges[i]>=SAMPLE_RATE//4]
+        if gaps:
+            g=max(gaps,key=lambda g:(g[1]-g[0],-abs(a+(g[0]+g[1])//2-target)))
+            return a+(g[0]+g[1])//2
+    except Exception:
+        pass
+    f=SAMPLE_RATE*30//1000; n=len(win)//f
+    if n==0: return target
+    rms=np.sqrt((win[:n*f].reshape(n,f)**2).mean(axis=1))
+    return a+int(np.argmin(rms))*f+f//2
+
+# # shard_bounds: границы шардов [0, c1, …, len] — разрезы в паузах около равных долей
+def shard_bounds(audio:np.ndarray, n:int)->List[int]:
+    cuts=[0]
+    for k in range(1,n):
+        c=silence_cut(audio,len(audio)*k//n)
+        if c>cuts[-1]: cuts.append(c)
+    return cuts+[len(audio)]
+
+# # _SHARD: состояние процесса-воркера — модель грузится один раз в initializer и живёт, пока жив пул
+_SHARD:Dict[str,Any]={"model":None}
+def _shard_init(size:str, compute:str, threads:int)->None:
+    _SHARD["model"]=whisper_cls()(size, device="cpu", compute_type=compute, cpu_threads=threads, num_workers=1)
+
+# # _shard_audio: кусок PCM из общей памяти родителя (копия — только этого куска)
+def _shard_audio(shm_name:str, total:int, a:int, b:int)->np.ndarray:
+    # resource_tracker у spawn-воркеров общий с родителем: сегмент удалит родитель (unlink), воркер только закрывает
+    shm=shared_memory.SharedMemory(name=shm_name)
+    try:
+        return np.array(np.ndarray((total,),dtype=np.float32,buffer=shm.buf)[a:b])
+    finally:
+        shm.close()
+
+# # _shard_lang: язык по первым 30 с (transcribe определяет язык сразу, сегменты не декодируем)
+def _shard_lang(shm_name:str, total:int)->str:
+    _,ti=_SHARD["model"].transcribe(_shard_audio(shm_name,total,0,min(total,30*SAMPLE_RATE)),vad_filter=True,vad_parameters=dict(VAD_PARAMS))
+    return getattr(ti,"language","")
+
+# # _shard_run: распознать кусок [a,b) → сегменты с таймкодами от начала всей записи
+def _shard_run(shm_name:str, total:int, a:int, b:int, kw:Dict[str,Any])->List[Dict[str,Any]]:
+    segs,_=_SHARD["model"].transcribe(_shard_audio(shm_name,total,a,b),vad_filter=True,vad_parameters=dict(VAD_PARAMS),**kw)
+    off=a/SAMPLE_RATE
+    return [{"start":round(s.start+off,2),"end":round(s.end+off,2),"text":s.text} for s in segs]
+
+# # shard_pool: пул процессов с моделью в каждом; один на (размер, compute, N) — модели не грузятся заново
+_SHARD_POOLS:Dict[str,Any]={"lock":threading.Lock(),"pools":{}}
+def shard_pool(size:str, n:int)->ProcessPoolExecutor:
+    key=f"{size}|{compute_type()}|{n}"
+    with _SHARD_POOLS["lock"]:
+        if key not in _SHARD_POOLS["pools"]:
+            if not whisper_available(): raise RuntimeError("faster-whisper не установлен")
+            threads=WHISPER_CPU_THREADS or max(1,(os.cpu_count() or n)//n)
+            # spawn: fork процесса с потоками (Streamlit, конвейер) небезопасен
+            _SHARD_POOLS["pools"][key]=ProcessPoolExecutor(max_workers=n,mp_context=mp.get_context("spawn"),
+                                                           initializer=_shard_init,initargs=(size,compute_type(),threads))
+        return _SHARD_POOLS["pools"][key]
+
+# # shard_count: на сколько процессов делить запись (1 — не делить)
+def shard_count(duration_s:float)->int:
+    if WHISPER_SHARDS<2 or device()!="cpu": return 1
+    return max(1,min(WHISPER_SHARDS,int(duration_s//WHISPER_SHARD_MIN_S)))
+
+# # merge_shard_segments: сегмент принадлежит шарду, в чей [lo,hi) попала его середина; повтор текста на стыке — выкинуть
+def merge_shard_segments(out:List[Dict[str,Any]], segs:List[Dict[str,Any]], lo:float, hi:float, last:bool)->List[Dict[str,Any]]:
+    new=[]
+    for d in segs:
+        mid=(d["start"]+d["end"])/2
+        if mid<lo or (mid>=hi and not last): continue
+        prev=(new or out)[-1] if (new or out) else None
+        if prev and prev["end"]>d["start"] and prev["text"].strip().lower()==d["text"].strip().lower(): continue
+        new.append(d)
+    out.extend(new)
+    return new
+
+# # transcribe_sharded: длинная запись на n процессах; сегменты отдаём по шардам по порядку
+def transcribe_sharded(audio:np.ndarray, lang:str, size:str, n:int, info:Dict[str,Any])->Iterator[Dict[str,Any]]:
+    pool=shard_pool(size,n); total=len(audio)
+    cuts=shard_bounds(audio,n); pad=int(SHARD_PAD_S*SAMPLE_RATE)
+    shm=shared_memory.SharedMemory(create=True,size=max(4,total*4))
+    try:
+        np.ndarray((total,),dtype=np.float32,buffer=shm.buf)[:]=audio
+        # язык один на всю запись — иначе шарды могли бы определить его по-разному
+        if not lang or lang=="auto": lang=pool.submit(_shard_lang,shm.name,total).result()
+        kw={"beam_size":WHISPER_BEAM,"language":lang}
+        futs=[pool.submit(_shard_run,shm.name,total,max(0,cuts[i]-pad),min(total,cuts[i+1]+pad),kw) for i in range(len(cuts)-1)]
+        info.update({"language":lang,"duration":total/SAMPLE_RATE,"shards":len(futs)})
+        out=[]
+        for i,f in enumerate(futs):
+            yield from merge_shard_segments(out,f.result(),cuts[i]/SAMPLE_RATE,cuts[i+1]/SAMPLE_RATE,i==len(futs)-1)
+    finally:
+        shm.close(); shm.unlink()
+
+# # transcribe_iter: сегменты Whisper по мере распознавания; src — путь или файловый объект.
+# # pending — сколько файлов ждёт в очереди (для fallback на модель попроще).
+# # info ← digest, cached, model, batched, shards, language, duration, decode (интервал ffmpeg), pcm (decode_pcm stats). В кэш — только дочитанный файл.
+def transcribe_iter(src:Union[str,BinaryIO], lang:str, info:Optional[Dict[str,Any]]=None, pending:int=0)->Iterator[Dict[str,Any]]:
+    info=info if info is not None else {}
+    folder=os.path.join(CACHE_DIR,"transcripts")
+    digest=file_sha256(src) if isinstance(src,str) else stream_sha256(src); info["digest"]=digest
+    # расшифровка fallback-моделью тоже годится: иначе после разгрузки очереди файл распознавался бы заново
+    for size in [WHISPER_SIZE]+([WHISPER_FALLBACK_SIZE] if WHISPER_FALLBACK_SIZE else []):
+        hit=disk_cache_get(folder,transcript_key_digest(digest,lang,size))
+        if hit is not None: break
+    cache_count("transcript",hit is not None)
+    info["cached"]=hit is not None
+    if hit is not None:
+        info.update({"language":hit.get("language",""),"duration":hit.get("duration",0.0),"model":hit.get("model",WHISPER_SIZE)})
+        yield from hit["segments"]
+        return
+    audio=src
+    if ffmpeg_exe():
+        # PCM сразу в массив для Whisper; без ffmpeg faster-whisper декодирует сам (PyAV)
+        t0=time.perf_counter(); info["pcm"]={}
+        with metrics.span("ffmpeg") as sp:
+            audio=decode_pcm(src,info["pcm"]); sp.update({"bytes_in":audio.nbytes,"spilled":info["pcm"].get("spilled",False)})
+        info["decode"]=(t0,time.perf_counter())
+    size=whisper_pick(len(audio)/SAMPLE_RATE if isinstance(audio,np.ndarray) else None,pending)
+    n=shard_count(len(audio)/SAMPLE_RATE) if isinstance(audio,np.ndarray) else 1
+    out=[]; busy=0.0; t=time.perf_counter()
+    if n>1:
+        # CPU и длинная запись: шарды по паузам на пуле процессов (ключ кэша тот же — текст совпадает с обычным прогоном)
+        info.update({"model":size,"batched":False})
+        for d in transcribe_sharded(audio,lang,size,n,info):
+            busy+=time.perf_counter()-t
+            out.append(d); yield d
+            t=time.perf_counter()
+    else:
+        whisper,batched=whisper_runner(size)
+        info.update({"model":size,"batched":batched})
+        kw={"beam_size":WHISPER_BEAM}
+        if lang and lang!="auto": kw["language"]=lang
+        if batched: kw["batch_size"]=WHISPER_BATCH
+        segs, ti = whisper.transcribe(audio, vad_filter=True, vad_parameters=dict(VAD_PARAMS), **kw)
+        info.update({"language":getattr(ti,"language",""),"duration":getattr(ti,"duration",0.0)})
+        for s in segs:
+            busy+=time.perf_counter()-t
+            d={"start":round(s.start,2),"end":round(s.end,2),"text":s.text}
+            out.append(d); yield d
+            t=time.perf_counter()
+    # время Whisper без времени потребителя между сегментами
+    metrics.record({"span":"whisper","model":size,"shards":n,"segments":len(out),"audio_s":round(info.get("duration") or 0.0,1),
+                    "dur_s":round(busy+time.perf_counter()-t,4)})
+    del audio
+    disk_cache_put(folder,transcript_key_digest(digest,lang,size),
+                   {"segments":out,"language":info["language"],"duration":info["duration"],"model":size},TRANSCRIPT_CACHE_MB*1024*1024)
+
+# # transcribe_all: transcribe_iter до конца → ({"segments","language","duration"}, из кэша?)
+def transcribe_all(src:Union[str,BinaryIO], lang:str)->Tuple[Dict[str,Any],bool]:
+    info={}
+    segs=list(transcribe_iter(src,lang,info))
+    return {"segments":segs,"language":info.get("language",""),"duration":info.get("duration",0.0)}, info["cached"]
+
+# # transcribe_cached: расшифровка по содержимому файла; повтор того же файла — из кэша
+def transcribe_cached(file_bytes:bytes, file_name:str, lang:str)->Tuple[Dict[str,Any],bool]:
+    return transcribe_all(io.BytesIO(file_bytes),lang)
+
+# # transcribe_path_cached: расшифровка файла с диска (пакетный режим), тот же кэш, без временной копии
+def transcribe_path_cached(path:str, lang:str)->Tuple[Dict[str,Any],bool]:
+    return transcribe_all(path,lang)
@@ -0,0 +1,246 @@
+# # stages: конвейер с перекрытием этапов — Whisper → правка окнами → извлечение окнами
+# # Сегменты Whisper сразу режутся на окна правки, исправленные окна (по порядку) — на окна извлечения,
+# # поэтому пока LLM правит/разбирает один файл или его начало, Whisper уже распознаёт дальше.
+# # Очереди между этапами ограничены: если LLM не успевает, Whisper ждёт (backpressure). cancel() — остановка.
+import time, queue, threading
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+import pipeline as pl
+import metrics
+
+# # Job: состояние одного файла в конвейере
+class Job:
+    def __init__(self, idx:int, path:Union[str,BinaryIO], lang:str, clean:bool, extract:bool, refresh:bool):
+        self.idx=idx; self.path=path; self.lang=lang; self.clean=clean; self.extract=extract; self.refresh=refresh
+        self.lock=threading.Lock(); self.info:Dict[str,Any]={}; self.segments:List[Dict[str,Any]]=[]
+        self.clean_ws=pl.WindowStream(pl.CLEAN_CHUNK_TOKENS,pl.CLEAN_OVERLAP_TOKENS)
+        self.ext_ws=pl.WindowStream(pl.EXTRACT_CHUNK_TOKENS,pl.EXTRACT_OVERLAP_TOKENS)
+        self.clean_n=0; self.clean_total:Optional[int]=None; self.clean_out:Dict[int,str]={}; self.clean_next=0
+        self.texts:List[str]=[]; self.ext_n=0; self.ext_total:Optional[int]=None; self.ext_out:Dict[int,List[Dict[str,Any]]]={}
+        self.failed={"clean":0,"extract":0}; self.errors:Dict[str,str]={}; self.meta:Dict[str,str]={}
+        self.timings:Dict[str,float]={}; self.t0=0.0
+        self.trace=metrics.Trace(path if isinstance(path,str) else getattr(path,"name","upload"))   # спаны файла (ffmpeg, Whisper, LLM, HTTP)
+        self.transcript=""; self.tasks:List[Dict[str,Any]]=[]; self.error=""; self.cancelled=False; self.finished=False
+
+    # # add_time: +сек к времени этапа (сумма по всем окнам файла)
+    def add_time(self, stage:str, sec:float)->None:
+        with self.lock: self.timings[stage+"_s"]=round(self.timings.get(stage+"_s",0.0)+sec,3)
+
+# # stage_union: суммарная длина объединения интервалов [(t0,t1), ...]
+def stage_union(spans:List[Tuple[float,float]])->List[Tuple[float,float]]:
+    out=[]
+    for a,b in sorted(spans):
+        if out and a<=out[-1][1]: out[-1]=(out[-1][0],max(out[-1][1],b))
+        else: out.append((a,b))
+    return out
+
+# # overlap_report: сколько работал каждый этап и насколько этапы шли одновременно
+# # serial_s — сумма всех интервалов работы (≈ время строго последовательного прогона),
+# # stages_overlap_s — время, когда работали хотя бы два разных этапа сразу
+def overlap_report(spans:List[Tuple[str,float,float]], t0:float, t1:float)->Dict[str,Any]:
+    work={}; busy={}; unions={}
+    for st,a,b in spans: work.setdefault(st,[]).append((a,b))
+    for st,lst in work.items():
+        unions[st]=stage_union(lst); busy[st]=round(sum(b-a for a,b in unions[st]),3)
+    ev=sorted([(a,1) for u in unions.values() for a,_ in u]+[(b,-1) for u in unions.values() for _,b in u])
+    both=0.0; n=0; prev=t0
+    for t,d in ev:
+        if n>=2: both+=t-prev
+        n+=d; prev=t
+    wall=max(t1-t0,1e-9); serial=sum(b-a for _,a,b in spans)
+    return {"wall_s":round(wall,3),"serial_s":round(serial,3),"speedup":round(serial/wall,2),
+            "stages_overlap_s":round(both,3),"busy_s":busy,"work_s":{st:round(sum(b-a for a,b in lst),3) for st,lst in work.items()}}
+
+class Pipeline:
+    def __init__(self, transcribe_workers:int=1, llm_workers:int=0, queue_size:int=0):
+        # 0 — LLAMA_PARALLEL на каждый сервер пула LLM
+        self.transcribe_workers=max(1,transcribe_workers); self.llm_workers=max(1,llm_workers or pl.llm_parallel())
+        qs=queue_size or 2*self.llm_workers
+        self.q_files:"queue.Queue[Optional[Job]]"=queue.Queue()
+        self.q_clean:"queue.Queue[Any]"=queue.Queue(maxsize=qs)      # окна на правку
+        self.q_extract:"queue.Queue[Any]"=queue.Queue(maxsize=qs)    # окна на извлечение
+        self.q_done:"queue.Queue[Job]"=queue.Queue()
+        self.llm=threading.Semaphore(self.llm_workers)               # правка и извлечение делят одни слоты LLM
+        self.stop=threading.Event(); self.jobs:List[Job]=[]; self.threads:List[threading.Thread]=[]
+        self.spans:List[Tuple[str,float,float]]=[]; self.slock=threading.Lock(); self.t0=0.0; self.t1=0.0
+
+    # # span: отметить интервал работы этапа (для отчёта о перекрытии)
+    def span(self, job:Job, stage:str, a:float, b:float)->None:
+        with self.slock: self.spans.append((stage,a,b))
+        job.add_time(stage,b-a)
+
+    # # put: положить в ограниченную очередь; ждём место, пока не отменили (False — отменено)
+    def put(self, q:"queue.Queue[Any]", item:Any)->bool:
+        while not self.stop.is_set():
+            try: q.put(item,timeout=0.2); return True
+            except queue.Full: continue
+        return False
+
+    # # get: взять из очереди; None — конвейер остановлен
+    def get(self, q:"queue.Queue[Any]")->Any:
+        while not self.stop.is_set():
+            try: return q.get(timeout=0.2)
+            except queue.Empty: continue
+        return None
+
+    # # start: запустить файлы (пути или файловые объекты); clean/extract=False — пропустить этап
+    def start(self, paths:List[Union[str,BinaryIO]], lang:str="auto", clean:bool=True, extract:bool=True, refresh:bool=False)->"Pipeline":
+        self.t0=time.perf_counter()
+        self.jobs=[Job(i,p,lang,clean,extract,refresh) for i,p in enumerate(paths)]
+        for j in self.jobs: self.q_files.put(j)
+        for _ in range(self.transcribe_workers): self.q_files.put(None)
+        roles=[self.transcribe_worker]*self.transcribe_workers+[self.clean_worker]*self.llm_workers+[self.extract_worker]*self.llm_workers
+        for fn in roles:
+            th=threading.Thread(target=fn,daemon=True); th.start(); self.threads.append(th)
+        return self
+
+    # # cancel: остановить весь конвейер (job=None) или один файл
+    def cancel(self, job:Optional[Job]=None)->None:
+        if job is not None:
+            job.cancelled=True; job.error=job.error or "отменено"; return
+        self.stop.set()
+
+    # # results: готовые файлы по мере завершения (не по порядку); отменённый файл — с error; после cancel() — только уже готовые
+    def results(self)->Iterator[Job]:
+        left=len(self.jobs)
+        while left:
+            j=self.get(self.q_done)
+            if j is None: break
+            left-=1; yield j
+        self.t1=time.perf_counter()
+
+    # # join: дождаться потоков после cancel()
+    def join(self, timeout:float=5.0)->None:
+        self.stop.set()
+        for th in self.threads: th.join(timeout)
+
+    # # report: отчёт о перекрытии этапов (overlap_report) по уже отработанным интервалам
+    def report(self)->Dict[str,Any]:
+        with self.slock: spans=list(self.spans)
+        return {**overlap_report(spans,self.t0,self.t1 or time.perf_counter()),"files":len(self.jobs),
+                "transcribe_workers":self.transcribe_workers,"llm_workers":self.llm_workers}
+
+    # # transcribe_worker: Whisper по файлу; сегменты сразу режем на окна правки
+    def transcribe_worker(self)->None:
+        while True:
+            job=self.get(self.q_files)
+            if job is None: return
+            job.t0=time.perf_counter()
+            # файлы в очереди (без стоп-меток потоков) — по ним pipeline может взять модель попроще
+            gen=pl.transcribe_iter(job.path,job.lang,job.info,max(0,self.q_files.qsize()-self.transcribe_workers))
+            try:
+                while not (self.stop.is_set() or job.cancelled):
+                    a=time.perf_counter()
+                    # генератор выполняется в этом потоке: спаны ffmpeg/Whisper — в trace файла
+                    with metrics.use(job.trace):
+                        try: seg=next(gen)
+                        except StopIteration: seg=None
+                    b=time.perf_counter(); d=job.info.pop("decode",None)
+                    if d: self.span(job,"decode",*d); a=max(a,d[1])
+                    self.span(job,"transcribe",a,b)
+                    if seg is None: break
+                    job.segments.append(seg)
+                    for w in job.clean_ws.feed(pl.split_units("",[seg["text"]])):
+                        if not self.dispatch_clean(job,w): break
+                else:
+                    gen.close(); self.finish(job,force=True); continue
+                for w in job.clean_ws.close():
+                    if not self.dispatch_clean(job,w): break
+                with job.lock: job.clean_total=job.clean_n
+            except Exception as e:
+                job.error=f"{type(e).__name__}: {e}"; self.finish(job,force=True); continue
+            self.advance(job)
+
+    # # dispatch_clean: окно → очередь правки (или сразу дальше, если правка выключена)
+    def dispatch_clean(self, job:Job, w:Tuple[str,str])->bool:
+        with job.lock: i=job.clean_n; job.clean_n+=1
+        if not job.clean:
+            with job.lock: job.clean_out[i]=w[1]
+            self.advance(job); return True
+        return self.put(self.q_clean,(job,i,w))
+
+    # # clean_worker: правка окна; упавшее окно остаётся как есть (как в llama_clean)
+    def clean_worker(self)->None:
+        while True:
+            item=self.get(self.q_clean)
+            if item is None: return
+            job,i,(ctx,body)=item
+            text=body
+            if not job.cancelled:
+                with self.llm:
+                    a=time.perf_counter()
+                    try:
+                        with metrics.use(job.trace), metrics.span("clean"):
+                            text,meta=pl.llama_clean_window(ctx,body,job.refresh)
+                        job.meta=job.meta or meta
+                    except Exception as e:
+                        with job.lock: job.failed["clean"]+=1; job.errors.setdefault("clean",f"{type(e).__name__}: {e}")
+                    self.span(job,"clean",a,time.perf_counter())
+            with job.lock: job.clean_out[i]=text
+            self.advance(job)
+
+    # # advance: исправленные окна по порядку → окна извлечения; когда файл дочитан — закрыть последнее окно
+    def advance(self, job:Job)->None:
+        wins=[]
+        with job.lock:
+            while job.clean_next in job.clean_out:
+                t=job.clean_out.pop(job.clean_next); job.clean_next+=1
+                job.texts.append(t)
+                if job.extract: wins+=job.ext_ws.feed(pl.split_units(t,budget=pl.EXTRACT_CHUNK_TOKENS))
+            closing=job.clean_total is not None and job.clean_next==job.clean_total and job.ext_total is None
+            if closing:
+                if job.extract: wins+=job.ext_ws.close()
+            base=job.ext_n; job.ext_n+=len(wins)
+            if closing: job.ext_total=job.ext_n
+        for k,(c,b) in enumerate(wins):
+            if not self.put(self.q_extract,(job,base+k,(c+" "+b).strip())): return
+        self.finish(job)
+
+    # # extract_worker: задачи из окна
+    def extract_worker(self)->None:
+        while True:
+            item=self.get(self.q_extract)
+            if item is None: return
+            job,i,text=item
+            tasks=[]
+            if not job.cancelled:
+                with self.llm:
+                    a=time.perf_counter()
+                    try:
+                        with metrics.use(job.trace), metrics.span("extract"):
+                            tasks,meta=pl.llama_extract_once(text,job.refresh)
+                        job.meta=job.meta or meta
+                    except Exception as e:
+                        with job.lock: job.failed["extract"]+=1; job.errors.setdefault("extract",f"{type(e).__name__}: {e}")
+                    self.span(job,"extract",a,time.perf_counter())
+            with job.lock: job.ext_out[i]=tasks
+            self.finish(job)
+
+    # # finish: файл готов, когда все окна правки и извлечения отработали → слить задачи и отдать в results()
+    def finish(self, job:Job, force:bool=False)->None:
+        with job.lock:
+            if job.finished: return
+            ready=job.ext_total is not None and len(job.ext_out)==job.ext_total
+            if not (ready or force or job.cancelled): return
+            job.finished=True
+        job.transcript=" ".join(t for t in job.texts if t).strip()
+        if ready and not job.cancelled:
+            # ошибка — только если упали все окна этапа (как в llama_clean/llama_extract); иначе берём то, что есть
+            for st,total in (("clean",job.clean_total),("extract",job.ext_total)):
+                if total and job.failed[st]==total: job.error=job.error or job.errors[st]
+            with metrics.use(job.trace), metrics.span("normalize"):
+                job.tasks=pl.normalize_tasks_after_extraction(pl.merge_tasks([job.ext_out[i] for i in range(job.ext_total)]),job.transcript)
+            job.meta={**job.meta,"clean_chunks":str(job.clean_total),"extract_chunks":str(job.ext_total),
+                      "failed":str(job.failed["clean"]+job.failed["extract"])}
+        job.timings["wall_s"]=round(time.perf_counter()-job.t0,3) if job.t0 else 0.0
+        if not self.stop.is_set(): self.q_done.put(job)
+
+# # run_files: прогнать файлы конвейером и вернуть (задания по порядку, отчёт о перекрытии)
+def run_files(paths:List[Union[str,BinaryIO]], lang:str="auto", clean:bool=True, extract:bool=True, refresh:bool=False,
+              transcribe_workers:int=1, llm_workers:int=0)->Tuple[List[Job],Dict[str,Any]]:
+    p=Pipeline(transcribe_workers,llm_workers).start(paths,lang,clean,extract,refresh)
+    try:
+        for _ in p.results(): pass
+    finally:
+        p.join()
+    return p.jobs, p.report()
@@ -0,0 +1,249 @@
+# # store: история на диске — встречи (расшифровки), извлечённые задачи и созданные ключи Jira в SQLite (WAL).
+# # Индексы: хэш файла, дата, проект, ключ Jira; полнотекстовый поиск FTS5 по расшифровкам и темам/описаниям задач.
+# # Запись — фоновым потоком пачками (одна транзакция на STORE_FLUSH_S), вызывающий только кладёт операцию в очередь;
+# # чтение — соединения из небольшого общего пула (WAL: читатели не ждут писателя). Ошибка базы не ломает распознавание и извлечение.
+import os, re, time, queue, atexit, sqlite3, threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from pipeline import CACHE_DIR
+
+STORE_DB      = os.getenv("APP_STORE_DB", os.path.join(CACHE_DIR, "history.db"))   # "" — история выключена
+STORE_FLUSH_S = float(os.getenv("STORE_FLUSH_S", "0.5"))   # окно сбора пачки записей, сек
+STORE_BATCH   = 1000                                       # операций в одной транзакции, не больше
+STORE_READERS = 4                                          # соединений для чтения в пуле (лишние закрываются после запроса)
+TASK_FIELDS   = ("summary","description","labels","due","priority","comment","block")
+MEETING_FIELDS= ("name","file_hash","source","owner","language","duration","model","transcript","blocks")
+
+# # _n: SQL-выражение текста для FTS — ё → е (unicode61 снимает диакритику только с латиницы; «отчет» должен находить «отчёт»)
+def _n(col:str)->str:
+    return f"replace(replace({col},'ё','е'),'Ё','Е')"
+
+# # _fts_sync: триггеры таблицы tab → её FTS (external content: индекс хранит только слова, текст — в самой таблице)
+def _fts_sync(tab:str, cols:Tuple[str,...])->str:
+    names=",".join(cols); new=",".join(_n("new."+c) for c in cols); old=",".join(_n("old."+c) for c in cols)
+    ins=f"INSERT INTO {tab}_fts(rowid,{names}) VALUES(new.rowid,{new});"
+    dele=f"INSERT INTO {tab}_fts({tab}_fts,rowid,{names}) VALUES('delete',old.rowid,{old});"
+    return (f"CREATE TRIGGER IF NOT EXISTS {tab}_ai AFTER INSERT ON {tab} BEGIN {ins} END;\n"
+            f"CREATE TRIGGER IF NOT EXISTS {tab}_ad AFTER DELETE ON {tab} BEGIN {dele} END;\n"
+            f"CREATE TRIGGER IF NOT EXISTS {tab}_au AFTER UPDATE OF {names} ON {tab} BEGIN {dele} {ins} END;\n")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings(
+  rowid INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, created REAL NOT NULL, updated REAL NOT NULL,
+  name TEXT NOT NULL DEFAULT '', file_hash TEXT NOT NULL DEFAULT '', source TEXT NOT NULL DEFAULT '', owner TEXT NOT NULL DEFAULT '',
+  language TEXT NOT NULL DEFAULT '', duration REAL NOT NULL DEFAULT 0, model TEXT NOT NULL DEFAULT '', transcript TEXT NOT NULL DEFAULT '', blocks TEXT NOT NULL DEFAULT '');
+CREATE INDEX IF NOT EXISTS meetings_hash ON meetings(file_hash);
+CREATE INDEX IF NOT EXISTS meetings_created ON meetings(created);
+CREATE TABLE IF NOT EXISTS tasks(
+  rowid INTEGER PRIMARY KEY, meeting TEXT NOT NULL, id TEXT NOT NULL, pos INTEGER NOT NULL DEFAULT 0,
+  summary TEXT NOT NULL DEFAULT '', description TEXT NOT NULL DEFAULT '', labels TEXT NOT NULL DEFAULT '', due TEXT NOT NULL DEFAULT '',
+  priority TEXT NOT NULL DEFAULT '', comment TEXT NOT NULL DEFAULT '', project TEXT NOT NULL DEFAULT '', jira_key TEXT NOT NULL DEFAULT '',
+  block TEXT NOT NULL DEFAULT '', UNIQUE(meeting,id));
+CREATE INDEX IF NOT EXISTS tasks_project ON tasks(project);
+CREATE INDEX IF NOT EXISTS tasks_jira ON tasks(jira_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS meetings_fts USING fts5(name, transcript, content='meetings', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2');
+CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(summary, description, labels, content='tasks', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2');
+"""+_fts_sync("meetings",("name","transcript"))+_fts_sync("tasks",("summary","description","labels"))
+# # столбцы, добавленные после первой версии схемы: (таблица, столбец) — в старую базу добавляются при открытии
+COLUMNS = (("meetings","blocks"),("tasks","block"))
+
+# # fts_query: строка поиска → запрос FTS5 (каждое слово — префикс, все слова обязательны); кавычки и операторы пользователя не ломают запрос
+def fts_query(q:str)->str:
+    return " ".join(f'"{w}"*' for w in re.findall(r"\w+",(q or "").replace("ё","е").replace("Ё","Е")))
+
+# # Store: база истории. Операции записи — в очередь (put_*), фоновый поток пишет их пачками; flush() — дождаться записи.
+class Store:
+    def __init__(self, path:str=STORE_DB, flush_s:float=STORE_FLUSH_S):
+        self.path=path; self.flush_s=flush_s; self.q:"queue.Queue[Any]"=queue.Queue()
+        self.idle:List[sqlite3.Connection]=[]; self.lock=threading.Lock(); self.init_lock=threading.Lock()
+        self.thread:Optional[threading.Thread]=None; self.ready=False
+        self.ok=bool(path); self.stats={"ops":0,"batches":0,"errors":0}
+
+    # # _open: соединение с базой (WAL); схема и миграция столбцов — один раз на процесс, при первом соединении;
+    # # база недоступна — история выключается, приложение работает дальше
+    def _open(self, read:bool=False)->Optional[sqlite3.Connection]:
+        if not self.ok: return None
+        try:
+            if not self.ready: self._schema()
+            con=sqlite3.connect(self.path,timeout=30,check_same_thread=not read)
+            con.execute("PRAGMA synchronous=NORMAL")
+            if read: con.execute("PRAGMA query_only=ON"); con.row_factory=sqlite3.Row
+            return con
+        except sqlite3.Error as e:
+            self.ok=False; metrics.count("app_store_errors_total",op="open")
+            metrics.log({"span":"store","error":f"{type(e).__name__}: {e}","path":self.path})
+            return None
+
+    # # _schema: WAL, таблицы, индексы, FTS и недостающие столбцы старой базы (ошибка — sqlite3.Error наружу)
+    def _schema(self)->None:
+        with self.init_lock:
+            if self.ready: return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),exist_ok=True)
+            con=sqlite3.connect(self.path,timeout=30)
+            try:
+                con.execute("PRAGMA journal_mode=WAL"); con.executescript(SCHEMA)
+                for tab,col in COLUMNS:
+                    if col not in {r[1] for r in con.execute(f"PRAGMA table_info({tab})")}:
+                        con.execute(f"ALTER TABLE {tab} ADD COLUMN {col} TEXT NOT NULL DEFAULT ''")
+                con.commit()
+            finally: con.close()
+            self.ready=True
+
+    # # read: соединение для чтения из общего пула (Streamlit выполняет каждый rerun в новом потоке — соединение на поток
+    # # открывалось бы заново на каждый rerun); после запроса возвращается в пул, сверх STORE_READERS — закрывается
+    @contextmanager
+    def read(self)->Iterator[Optional[sqlite3.Connection]]:
+        with self.lock: con=self.idle.pop() if self.idle else None
+        if con is None: con=self._open(read=True)
+        try: yield con
+        finally:
+            if con is not None:
+                with self.lock:
+                    keep=len(self.idle)<STORE_READERS
+                    if keep: self.idle.append(con)
+                if not keep: con.close()
+
+    # # put: операция записи (имя метода _w_*, аргументы) — в очередь; писатель стартует при первой записи
+    def put(self, op:str, *args:Any)->None:
+        if not self.ok: return
+        with self.lock:
+            if self.thread is None:
+                self.thread=threading.Thread(target=self.writer,name="store",daemon=True); self.thread.start()
+        self.q.put((op,args))
+
+    # # writer: копит операции STORE_FLUSH_S (или STORE_BATCH штук) и пишет их одной транзакцией
+    def writer(self)->None:
+        con=self._open()
+        while True:
+            batch=[self.q.get()]; until=time.monotonic()+self.flush_s
+            while len(batch)<STORE_BATCH:
+                left=until-time.monotonic()
+                if left<=0 or isinstance(batch[-1],threading.Event): break
+                try: batch.append(self.q.get(timeout=left))
+                except queue.Empty: break
+            ops=[x for x in batch if not isinstance(x,threading.Event)]
+            if con is not None and ops:
+                t0=time.perf_counter()
+                try:
+                    with con:
+                        for op,args in ops: getattr(self,"_w_"+op)(con,*args)
+                    self.stats["ops"]+=len(ops); self.stats["batches"]+=1
+                except sqlite3.Error as e:
+                    self.stats["errors"]+=1; metrics.count("app_store_errors_total",op="write")
+                    metrics.log({"span":"store","error":f"{type(e).__name__}: {e}","ops":len(ops)})
+                metrics.record({"span":"store_write","dur_s":round(time.perf_counter()-t0,4),"ops":len(ops)})
+            for x in batch:
+                if isinstance(x,threading.Event): x.set()
+
+    # # flush: дождаться записи всего, что уже в очереди (False — не успели за timeout)
+    def flush(self, timeout:float=10.0)->bool:
+        if not self.ok or self.thread is None: return True
+        ev=threading.Event(); self.q.put(ev)
+        return ev.wait(timeout)
+
+    # # put_meeting: встреча mid (создать или обновить переданные поля: name, file_hash, transcript…)
+    def put_meeting(self, mid:str, **fields:Any)->None:
+        self.put("meeting",mid,{k:v for k,v in fields.items() if k in MEETING_FIELDS and v is not None},time.time())
+
+    # # put_tasks: задачи встречи — ровно этот список (по порядку); ключ Jira у уже сохранённых задач остаётся
+    def put_tasks(self, mid:str, tasks:List[Dict[str,Any]])->None:
+        self.put("tasks",mid,[{"id":str(t.get("id") or i),**{c:str(t.get(c) or "") for c in TASK_FIELDS}} for i,t in enumerate(tasks)],time.time())
+
+    # # put_jira: созданные (или дополненные комментарием) задачи Jira — [(id задачи, ключ)] в проекте project
+    def put_jira(self, mid:str, project:str, keys:List[Tuple[str,str]])->None:
+        if keys: self.put("jira",mid,project,list(keys))
+
+    def _w_meeting(self, con:sqlite3.Connection, mid:str, f:Dict[str,Any], ts:float)->None:
+        cols=list(f)
+        upd="".join(f",{c}=excluded.{c}" for c in cols)
+        con.execute(f"INSERT INTO meetings(id,created,updated{''.join(','+c for c in cols)}) VALUES(?,?,?{',?'*len(cols)}) "
+                    f"ON CONFLICT(id) DO UPDATE SET updated=excluded.updated{upd}",(mid,ts,ts,*[f[c] for c in cols]))
+
+    def _w_tasks(self, con:sqlite3.Connection, mid:str, tasks:List[Dict[str,str]], ts:float)->None:
+        self._w_meeting(con,mid,{},ts)
+        ids=[t["id"] for t in tasks]
+        con.execute(f"DELETE FROM tasks WHERE meeting=? AND id NOT IN ({','.join('?'*len(ids))})",(mid,*ids))
+        con.executemany(f"INSERT INTO tasks(meeting,id,pos,{','.join(TASK_FIELDS)}) VALUES(?,?,?{',?'*len(TASK_FIELDS)}) "
+                        f"ON CONFLICT(meeting,id) DO UPDATE SET pos=excluded.pos{''.join(f',{c}=excluded.{c}' for c in TASK_FIELDS)}",
+                        [(mid,t["id"],i,*[t[c] for c in TASK_FIELDS]) for i,t in enumerate(tasks)])
+
+    def _w_jira(self, con:sqlite3.Connection, mid:str, project:str, keys:List[Tuple[str,str]])->None:
+        con.executemany("UPDATE tasks SET jira_key=?,project=? WHERE meeting=? AND id=?",[(k,project,mid,tid) for tid,k in keys])
+
+    # # history: встречи (новые сверху) — по поиску q (расшифровка, название, темы/описания/метки задач) и проекту Jira
+    def history(self, q:str="", project:str="", limit:int=50, offset:int=0)->List[Dict[str,Any]]:
+        with self.read() as con:
+            if con is None: return []
+            where=[]; args:List[Any]=[]; fq=fts_query(q)
+            if fq:
+                where.append("(m.rowid IN (SELECT rowid FROM meetings_fts WHERE meetings_fts MATCH ?) OR "
+                             "m.id IN (SELECT t.meeting FROM tasks_fts f JOIN tasks t ON t.rowid=f.rowid WHERE tasks_fts MATCH ?))")
+                args+=[fq,fq]
+            if project.strip():
+                where.append("m.id IN (SELECT meeting FROM tasks WHERE project=?)"); args.append(project.strip())
+            try:
+                rows=con.execute("SELECT m.rowid,m.id,m.created,m.name,m.source,m.language,m.duration,"
+                                 "(SELECT count(*) FROM tasks t WHERE t.meeting=m.id) AS tasks,"
+                                 "(SELECT count(*) FROM tasks t WHERE t.meeting=m.id AND t.jira_key!='') AS jira "
+                                 "FROM meetings m"+(" WHERE "+" AND ".join(where) if where else "")+
+                                 " ORDER BY m.created DESC LIMIT ? OFFSET ?",(*args,limit,offset)).fetchall()
+                out=[{k:r[k] for k in r.keys() if k!="rowid"} for r in rows]
+                if fq:
+                    # фрагмент расшифровки вокруг найденных слов (если нашлось в ней, а не только в задачах)
+                    for o,r in zip(out,rows):
+                        sn=con.execute("SELECT snippet(meetings_fts,1,'«','»','…',12) FROM meetings_fts WHERE meetings_fts MATCH ? AND rowid=?",
+                                       (fq,r["rowid"])).fetchone()
+                        o["snippet"]=sn[0] if sn else ""
+                return out
+            except sqlite3.Error as e:
+                self._failed(e); return []
+
+    # # _failed: ошибка чтения — в лог и счётчик; вызывающий получает пустой ответ, как без истории
+    def _failed(self, e:sqlite3.Error)->None:
+        metrics.count("app_store_errors_total",op="read"); metrics.log({"span":"store","error":f"{type(e).__name__}: {e}"})
+
+    # # meeting: встреча целиком — расшифровка и задачи по порядку (с ключами Jira); None — нет такой
+    def meeting(self, mid:str)->Optional[Dict[str,Any]]:
+        with self.read() as con:
+            if con is None: return None
+            try:
+                r=con.execute("SELECT * FROM meetings WHERE id=?",(mid,)).fetchone()
+                if r is None: return None
+                out={k:r[k] for k in r.keys() if k!="rowid"}
+                out["tasks"]=[{k:t[k] for k in t.keys() if k not in ("rowid","meeting","pos")}
+                              for t in con.execute("SELECT * FROM tasks WHERE meeting=? ORDER BY pos",(mid,))]
+                return out
+            except sqlite3.Error as e:
+                self._failed(e); return None
+
+    # # by_hash: последняя встреча с тем же файлом (SHA-256), кроме exclude; None — файл раньше не встречался
+    def by_hash(self, file_hash:str, exclude:str="")->Optional[Dict[str,Any]]:
+        if not file_hash: return None
+        with self.read() as con:
+            if con is None: return None
+            try:
+                r=con.execute("SELECT id,created,name,(SELECT count(*) FROM tasks t WHERE t.meeting=m.id) AS tasks FROM meetings m "
+                              "WHERE file_hash=? AND id!=? ORDER BY created DESC LIMIT 1",(file_hash,exclude)).fetchone()
+                return dict(r) if r else None
+            except sqlite3.Error as e:
+                self._failed(e); return None
+
+    # # by_jira: встреча и задача, из которой создан ключ Jira
+    def by_jira(self, key:str)->Optional[Dict[str,Any]]:
+        with self.read() as con:
+            if con is None: return None
+            try:
+                r=con.execute("SELECT meeting,id,summary,project FROM tasks WHERE jira_key=? LIMIT 1",(key,)).fetchone()
+                return dict(r) if r else None
+            except sqlite3.Error as e:
+                self._failed(e); return None
+
+# # store: база истории (одна на процесс); при выходе — дописать очередь
+_STORE:Dict[str,Any]={"lock":threading.Lock(),"db":None}
+def store()->Store:
+    with _STORE["lock"]:
+        if _STORE["db"] is None:
+            _STORE["db"]=Store(); atexit.register(_STORE["db"].flush)
+        return _STORE["db"]